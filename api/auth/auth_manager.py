@@ -2,7 +2,8 @@ from fastapi import Depends, HTTPException, Header
 from typing import Optional
 
 from api.models.user import User
-from database.database import retrieve_user_by_api_key
+from database.database import retrieve_user, retrieve_user_by_api_key
+from database.api_key_cache import api_key_cache
 
 
 async def get_api_key_from_header(
@@ -14,7 +15,18 @@ async def get_api_key_from_header(
 
 
 async def current_user(api_key: str = Depends(get_api_key_from_header)) -> User:
-    user = await retrieve_user_by_api_key(api_key)
+    found, user_id = api_key_cache.lookup(api_key)
+    if not found:
+        user = await retrieve_user_by_api_key(api_key)
+        # Invalid keys are cached as well
+        api_key_cache.store(api_key, user)
+    elif user_id is None:
+        user = None
+    else:
+        # Only the owner id is cached, so the user is never stale
+        user = await retrieve_user(user_id)
+        if not user:
+            api_key_cache.store(api_key, None)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid or expired API key")
     return user
@@ -1,14 +1,14 @@
 import os
 import asyncio
 import motor.motor_asyncio
-from beanie import init_beanie
-from uuid import uuid4
+from beanie import init_beanie, PydanticObjectId
 import argparse
 
 # Import your models
 from api.models import User, APIKey
+from api.models.api_key import generate_api_key
 
-from database.database import add_user, add_api_key
+from database.database import add_user, add_api_key, retrieve_user_by_api_key
 
 from dotenv import load_dotenv
 
@@ -27,15 +27,16 @@ async def create_user(email: str):
         document_models=[User, APIKey]
     )
 
-    # First create an API key
-    api_key = APIKey(
-        key=f"sk-{uuid4().hex}"  # Generate a random API key with prefix
-    )
+    # First create an API key, only its hash is stored
+    raw_api_key = generate_api_key()
+    user_id = PydanticObjectId()
+    api_key = APIKey.from_raw_key(raw_api_key, user_id=user_id)
     await add_api_key(api_key)  # Save the API key to the database
-    print(f"Created API key: {api_key.key}")
+    print(f"Created API key (shown only once): {raw_api_key}")
 
     # Create a new user with the API key linked
     new_user = User(
+        id=user_id,
         email=email,
         llm_api_keys={
             "openai": "sk-your-openai-key",
@@ -50,7 +51,7 @@ async def create_user(email: str):
     print(f"User ID: {new_user.id}")
 
     # Verify we can retrieve the user by API key
-    retrieved_user = await User.find(User.api_keys.key == api_key.key).first_or_none()
+    retrieved_user = await retrieve_user_by_api_key(raw_api_key)
     if retrieved_user:
         print(f"Successfully retrieved user by API key: {retrieved_user.email}")
     else:
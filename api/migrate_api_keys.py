@@ -0,0 +1,79 @@
+import os
+import asyncio
+import motor.motor_asyncio
+from beanie import init_beanie
+import argparse
+
+# Import your models
+from api.models import User, APIKey
+from api.models.api_key import hash_api_key
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+
+
+async def migrate_api_keys(dry_run: bool = False):
+    """
+    Moves API keys created before key hashing to the hashed layout:
+    stores the key hash and owner id, and removes the raw key.
+    """
+    # Connect to MongoDB
+    client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
+
+    # Initialize Beanie with the document models
+    await init_beanie(
+        database=client.imaginary_agents_api,  # Use your actual database name
+        document_models=[User, APIKey]
+    )
+
+    legacy_keys = await APIKey.find(
+        {"key": {"$ne": None}, "key_hash": None}
+    ).to_list()
+    print(f"Found {len(legacy_keys)} API keys to migrate")
+
+    # Map every linked API key to its owner
+    owners = {}
+    async for user in User.find_all():
+        for link in user.api_keys:
+            owners[link.ref.id] = user
+
+    migrated = 0
+    for api_key in legacy_keys:
+        owner = owners.get(api_key.id)
+        if not owner:
+            print(f"Skipping API key {api_key.id}: no owner found")
+            continue
+        if dry_run:
+            print(f"Would migrate API key {api_key.id} of {owner.email}")
+            continue
+        await api_key.update({
+            "$set": {
+                "key_hash": hash_api_key(api_key.key),
+                "key_prefix": api_key.key[:9],
+                "user_id": owner.id
+            },
+            "$unset": {"key": ""}
+        })
+        migrated += 1
+
+    print(f"Migrated {migrated} API keys")
+
+
+if __name__ == "__main__":
+    # Set up argument parser
+    parser = argparse.ArgumentParser(
+        description='Migrate raw API keys to hashed API keys'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Only report the keys that would be migrated'
+    )
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    asyncio.run(migrate_api_keys(dry_run=args.dry_run))
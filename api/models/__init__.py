@@ -2,6 +2,8 @@ from api.models.llm_config import LLMConfig
 from api.models.agent import Agent
 from api.models.user import User
 from api.models.api_key import APIKey
+from api.models.agent_job import AgentJob
+from api.models.agent_response import AgentResponse
 
 # Add all the models here
 
@@ -9,5 +11,7 @@ __all__ = [
     LLMConfig,
     Agent,
     User,
-    APIKey
+    APIKey,
+    AgentJob,
+    AgentResponse
 ]
@@ -1,23 +1,118 @@
+import os
+import time
+import json
+import random
+import asyncio
+import hashlib
 import logging
-from typing import Optional, Dict, List, Union, Any
+from dataclasses import dataclass
+from typing import (
+    Optional, Dict, List, Union, Any, Type, Tuple, AsyncIterator, get_args
+)
 from datetime import datetime
 
 import instructor
-import openai
 
 from config import settings
+from api.models.llm_config import LLMConfig
 
 from beanie import Document
-from pydantic import Field, ConfigDict, create_model
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
 from atomic_agents.agents.base_agent import BaseAgent, BaseAgentInputSchema
 from atomic_agents.lib.base.base_io_schema import BaseIOSchema
 
-from imaginary_agents.agents.orchestrator import OrchestratorAgent
+from imaginary_agents.agents.orchestrator import (
+    OrchestratorAgent,
+    FinalAnswerSchema,
+    ToolResultSchema
+)
 from imaginary_agents.agents.basic_agent import BasicAgent
+from imaginary_agents.agents.async_base_agent import AsyncBaseAgent
+from imaginary_agents.agents.fast_router import FastRouter, Route, router_stats
+from imaginary_agents.llm.client_registry import (
+    hash_llm_api_key,
+    llm_client_registry
+)
+from imaginary_agents.helpers.schema_compiler import schema_compiler
+from imaginary_agents.helpers.ttl_cache import TTLCache
+from imaginary_agents.helpers.single_flight import SingleFlight, canonical_hash
+from imaginary_agents.helpers.minhash import (
+    canonical_text,
+    estimated_jaccard,
+    minhash,
+    shingles
+)
+from database.response_cache import response_cache, NEAR_DUPLICATE_SAMPLE_RATE
+from imaginary_agents.tools.runtime import (
+    tool_runtime,
+    ToolContext,
+    TOOL_RUN_CONCURRENCY
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+AGENT_RUNTIME_CACHE_MAX_SIZE = int(os.getenv("AGENT_RUNTIME_CACHE_MAX_SIZE", 256))
+AGENT_RUNTIME_CACHE_TTL = float(os.getenv("AGENT_RUNTIME_CACHE_TTL", 3600))
+AGENT_RUN_BATCH_CONCURRENCY = int(os.getenv("AGENT_RUN_BATCH_CONCURRENCY", 8))
+
+# Agent fields the runtime is built from
+RUNTIME_CONFIG_FIELDS = {
+    "llm_model",
+    "type",
+    "background",
+    "steps",
+    "output_instructions",
+    "input_schema_fields",
+    "output_schema_fields",
+    "tools_available",
+    "parallel_tools",
+    "cache_policy",
+}
+
+
+class ResponseCachePolicy(BaseModel):
+    """Response cache settings of agents that are pure functions of their input"""
+    enabled: bool = Field(default=False, description="Whether to cache responses")
+    ttl: int = Field(
+        default=3600,
+        gt=0,
+        description="Seconds a cached response is served"
+    )
+    near_duplicate: bool = Field(
+        default=False,
+        description="Whether to serve responses of near-duplicate inputs"
+    )
+    similarity_threshold: float = Field(
+        default=0.9,
+        gt=0,
+        le=1,
+        description="Minimum Jaccard similarity of near-duplicate inputs"
+    )
+
+
+@dataclass
+class AgentRuntime:
+    """Ready-to-run atomic-agent instance built from an Agent document"""
+    agent: AsyncBaseAgent
+    fingerprint: str
+    input_schema: Optional[Type[BaseIOSchema]] = None
+    output_schema: Optional[Type[BaseIOSchema]] = None
+    router: Optional[FastRouter] = None
+
+
+# Identical runs in flight share a single LLM call
+agent_run_single_flight = SingleFlight()
+
+# Sampled re-runs of near-duplicate hits, referenced until they finish
+near_duplicate_checks = set()
+
+# Runtimes keyed by (agent id, agent version), shared across requests
+agent_runtime_cache = TTLCache(
+    max_size=AGENT_RUNTIME_CACHE_MAX_SIZE,
+    ttl=AGENT_RUNTIME_CACHE_TTL
+)
+
 
 class Agent(Document):
     """
@@ -68,6 +163,38 @@ class Agent(Document):
         default=None,
         description="List of tools available to the agent"
     )
+    parallel_tools: bool = Field(
+        default=False,
+        description="Whether the orchestrator can run several tools at once"
+    )
+    cache_policy: ResponseCachePolicy = Field(
+        default_factory=ResponseCachePolicy,
+        description="Response cache policy, for deterministic agents"
+    )
+    coalesce_runs: bool = Field(
+        default=True,
+        description=(
+            "Whether identical concurrent runs share a single LLM call, "
+            "disable for agents that are non-deterministic by design"
+        )
+    )
+    fast_routing: bool = Field(
+        default=False,
+        description="Whether obvious inputs are routed without the LLM"
+    )
+    tool_concurrency: Optional[int] = Field(
+        default=None,
+        description="Maximum number of tools run at the same time"
+    )
+    tool_timeout: Optional[float] = Field(
+        default=None,
+        description="Seconds all the tools of a run may take"
+    )
+    version: int = Field(
+        default=1,
+        description="Config version, incremented on every update"
+    )
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     # Non-persisted field for the agent instance (Beanie will ignore this)
     _agent: Optional[BaseAgent] = None
@@ -138,35 +265,30 @@ class Agent(Document):
         """
         # Define fields for dynamic schema
         fields = {}
-        annotations = {}
 
         for field_name, field_def in schema_fields.items():
             field_type_str = field_def.get("type", "str").lower()
-            field_desc = field_def.get("description", "")
 
             # Get Python type from mapping
-            field_type = settings.TYPE_MAPPING.get(field_type_str, str)
-            # Add field to schema definition
-            annotations[field_name] = field_type
-            fields[field_name] = (
-                field_type, Field(..., description=field_desc)
-            )
+            fields[field_name] = {
+                "type": settings.TYPE_MAPPING.get(field_type_str, str),
+                "description": field_def.get("description", "")
+            }
 
-        # Create dynamic input schema class
-        dynamic_schema = create_model(
+        # Get (cached) dynamic input schema class
+        dynamic_schema = schema_compiler.compile(
             'DynamicSchema',
-            __base__=BaseIOSchema,
-            __doc__="""
+            fields,
+            base=BaseIOSchema,
+            doc="""
                 Dynamic schema for agent input/output.
                 Fields are defined based on agent's input/output schema fields.
-            """,
-            **fields
+            """
         )
 
-        logger.info(f"Created dynamic schema with fields: {annotations}")
         return dynamic_schema
 
-    def setup_output_schema(self, tools, tools_desc):
+    def setup_output_schema(self, tools, tools_desc, parallel=False):
         tool_names = []
         tool_input_schemas = []
         for tool_name, tool_info in tools.items():
@@ -186,24 +308,51 @@ class Agent(Document):
             # If there's only one schema, use it directly
             tool_parameters_type = tool_input_schemas[0]
 
-        OrchestratorOutputSchema = create_model(
-            'OrchestratorAgentOutputSchema',
-            __base__=BaseIOSchema,
-            __doc__="""
-                Combined output schema for the Orchestrator Agent.
-                Contains the tool/s to use and its parameters.
-            """,
-            tool=(
-                str,
-                Field(..., description=f"The tool to use: {tools_desc}")
-            ),
-            tool_parameters=(
-                tool_parameters_type,  # Using Union of input schemas
-                Field(..., description="The parameters for the selected tool")
-            ),
+        tool_call_fields = {
+            "tool": {
+                "type": str,
+                "description": f"The tool to use: {tools_desc}"
+            },
+            "tool_parameters": {
+                "type": tool_parameters_type,  # Union of input schemas
+                "description": "The parameters for the selected tool"
+            },
+        }
+
+        if not parallel:
+            return schema_compiler.compile(
+                'OrchestratorAgentOutputSchema',
+                tool_call_fields,
+                base=BaseIOSchema,
+                doc="""
+                    Combined output schema for the Orchestrator Agent.
+                    Contains the tool/s to use and its parameters.
+                """
+            )
+
+        ToolCallSchema = schema_compiler.compile(
+            'OrchestratorToolCallSchema',
+            tool_call_fields,
+            base=BaseIOSchema,
+            doc="""
+                A tool call selected by the Orchestrator Agent.
+                Contains the tool to use and its parameters.
+            """
+        )
+        return schema_compiler.compile(
+            'OrchestratorAgentParallelOutputSchema',
+            {
+                "tool_calls": {
+                    "type": List[ToolCallSchema],
+                    "description": "The tools to use, run at the same time"
+                },
+            },
+            base=BaseIOSchema,
+            doc="""
+                Output schema for the Orchestrator Agent running several
+                independent tools. Contains every tool call to make.
+            """
         )
-        logger.info("schema created")
-        return OrchestratorOutputSchema
 
     def setup_orchestrator_config(self, tools):
         """
@@ -230,116 +379,566 @@ class Agent(Document):
             "When uncertain, don't choose any tool.",
             "Format the output using the appropriate schema.",
         ]
+        if self.parallel_tools:
+            output_instructions.append(
+                "List every tool call the input requires, "
+                "independent tool calls are run at the same time."
+            )
 
         return background, output_instructions, tools_desc
 
-    async def run(
+    def config_fingerprint(self) -> str:
+        """
+        Hash of every field the agent runtime is built from, used to detect
+        edits that didn't go through update_agent_data
+        """
+        config = self.model_dump(include=RUNTIME_CONFIG_FIELDS)
+        payload = json.dumps(config, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def build_runtime(self, client: instructor.Instructor) -> AgentRuntime:
+        """Builds the ready-to-run atomic-agent instance and its schemas"""
+        if self.type == "simple":
+            # Dynamically create input and output schemas
+            if self.input_schema_fields:
+                dynamic_input_schema = self.setup_dynamic_schema(
+                    self.input_schema_fields
+                )
+            else:
+                dynamic_input_schema = None
+
+            dynamic_output_schema = self.setup_dynamic_schema(
+                self.output_schema_fields
+            )
+
+            agent = BasicAgent(
+                client=client,
+                llm_model=self.llm_model,
+                background=self.background,
+                output_instructions=self.output_instructions,
+                steps=self.steps,
+                input_schema=dynamic_input_schema,
+                output_schema=dynamic_output_schema
+            )
+            return AgentRuntime(
+                agent=agent,
+                fingerprint=self.config_fingerprint(),
+                input_schema=dynamic_input_schema,
+                output_schema=dynamic_output_schema
+            )
+
+        elif self.type == "orchestrator":
+            # Setup Orchestrator Agent config with available tools
+            tools = self.tools_available
+            if not tools:
+                raise ValueError("No tools available for this agent")
+
+            (
+                background,
+                output_instructions,
+                tools_desc
+            ) = self.setup_orchestrator_config(
+                tools
+            )
+
+            # Generate Orchestrator Agent Output Schema
+            output_schema = self.setup_output_schema(
+                tools, tools_desc, parallel=self.parallel_tools
+            )
+
+            if self.background:
+                background.extend(self.background)
+            if self.output_instructions:
+                output_instructions.extend(self.output_instructions)
+
+            agent = OrchestratorAgent(
+                client=client,
+                llm_model=self.llm_model,
+                background=background,
+                output_instructions=output_instructions,
+                steps=self.steps,
+                output_schema=output_schema
+            )
+            return AgentRuntime(
+                agent=agent,
+                fingerprint=self.config_fingerprint(),
+                output_schema=output_schema,
+                router=FastRouter(tools)
+            )
+        else:
+            raise ValueError(f"Agent type '{self.type}' not supported")
+
+    def get_runtime(self, client: instructor.Instructor) -> AgentRuntime:
+        """
+        Returns the cached runtime for this agent version, building it on a
+        miss. The cache key carries the document version, so edits made by
+        any worker are picked up on the next run.
+        """
+        key = (str(self.id), self.version)
+        runtime = agent_runtime_cache.get(key)
+        if runtime is None or runtime.fingerprint != self.config_fingerprint():
+            runtime = self.build_runtime(client)
+            agent_runtime_cache.set(key, runtime)
+        return runtime
+
+    @staticmethod
+    def invalidate_runtime(agent_id) -> int:
+        """Drops every cached runtime of the given agent"""
+        return agent_runtime_cache.invalidate(
+            lambda key, _: key[0] == str(agent_id)
+        )
+
+    def prepare_run(
         self,
         llm_api_key: str,
+        llm_config: LLMConfig
+    ) -> Tuple[instructor.AsyncInstructor, AgentRuntime]:
+        """Returns the pooled client and the cached runtime to run with"""
+        client = llm_client_registry.get_client(
+            base_url=llm_config.base_url,
+            provider=llm_config.provider,
+            api_key=llm_api_key,
+            mode=instructor.Mode.MD_JSON
+        )
+        return client, self.get_runtime(client)
+
+    def build_run_input(
+        self,
+        runtime: AgentRuntime,
         input_message: Optional[str] = None,
         input_fields: Optional[Dict[str, Any]] = None
-    ) -> BaseAgent:
-        """Run an atomic-agent instance based on Agent"""
-        if not self._agent:
-            # 1. Configure the client based on the llm_model
-            from database.database import retrieve_llm_config_by_model
+    ) -> BaseIOSchema:
+        """Validates the run input and returns it as the runtime input schema"""
+        if self.type == "simple" and self.input_schema_fields:
+            try:
+                self.validate_input_fields(input_fields)
+            except ValueError as e:
+                raise ValueError(
+                    f"Validation error: {str(e)}"
+                )
 
-            llm_config = await retrieve_llm_config_by_model(model=self.llm_model)
+        if self.type == "simple":
+            return runtime.input_schema(**input_fields)
+        return BaseAgentInputSchema(chat_message=input_message)
 
-            client = instructor.from_openai(
-                openai.OpenAI(
-                    api_key=llm_api_key,
-                    base_url=llm_config.base_url
+    async def run_runtime(
+        self,
+        runtime: AgentRuntime,
+        client: instructor.AsyncInstructor,
+        input_message: Optional[str] = None,
+        input_fields: Optional[Dict[str, Any]] = None,
+        tool_context: Optional[ToolContext] = None
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Runs a fork of the given runtime on a single input.
+
+        Agents with a cache policy are served from the response cache when
+        possible, including responses of near-duplicate inputs when the
+        policy allows it. Unless the agent opts out, concurrent runs of the
+        same agent version with the same input are coalesced into one.
+
+        Returns:
+            The response and its cache status: "hit", "near_hit", "miss", or
+            None when the agent has no cache policy
+        """
+        input_schema = self.build_run_input(runtime, input_message, input_fields)
+        input_hash = canonical_hash(input_schema.model_dump())
+
+        cache_key = None
+        scope = None
+        signature = None
+        if self.cache_policy.enabled:
+            scope = f"{self.id}:{self.version}:{runtime.fingerprint}"
+            cache_key = f"{scope}:{input_hash}"
+            cached_response = await response_cache.get(cache_key)
+            if cached_response is not None:
+                return cached_response, "hit"
+
+            if self.cache_policy.near_duplicate:
+                signature = minhash(
+                    shingles(canonical_text(input_schema.model_dump()))
+                )
+            if signature is not None:
+                similar = await response_cache.get_similar(
+                    scope, signature, self.cache_policy.similarity_threshold
+                )
+                if similar is not None:
+                    cached_response, _ = similar
+                    if random.random() < NEAR_DUPLICATE_SAMPLE_RATE:
+                        self._verify_near_duplicate(
+                            runtime,
+                            client,
+                            input_schema,
+                            cached_response,
+                            tool_context
+                        )
+                    return cached_response, "near_hit"
+
+        if self.coalesce_runs:
+            response = await agent_run_single_flight.do(
+                (
+                    str(self.id),
+                    self.version,
+                    runtime.fingerprint,
+                    input_hash,
+                    *self._run_credentials(client, tool_context)
                 ),
-                mode=instructor.Mode.MD_JSON
+                lambda: self._run_input(
+                    runtime, client, input_schema, tool_context
+                )
+            )
+        else:
+            response = await self._run_input(
+                runtime, client, input_schema, tool_context
+            )
+
+        if cache_key is None:
+            return response, None
+        await response_cache.set(
+            cache_key,
+            str(self.id),
+            self.version,
+            response,
+            ttl=self.cache_policy.ttl,
+            scope=scope,
+            signature=signature
+        )
+        return response, "miss"
+
+    @staticmethod
+    def _run_credentials(
+        client: instructor.AsyncInstructor,
+        tool_context: Optional[ToolContext]
+    ) -> Tuple:
+        """
+        Identifies whose credentials a run uses, so coalesced runs are only
+        shared by callers with the same LLM client (there is one per API
+        key) and the same tool credentials
+        """
+        if tool_context is None:
+            return id(client), None
+        return id(client), (
+            hash_llm_api_key(tool_context.llm_api_key),
+            tool_context.llm_provider,
+            tool_context.llm_model
+        )
+
+    def _verify_near_duplicate(
+        self,
+        runtime: AgentRuntime,
+        client: instructor.AsyncInstructor,
+        input_schema: BaseIOSchema,
+        cached_response: Dict[str, Any],
+        tool_context: Optional[ToolContext] = None
+    ):
+        """
+        Runs the input in the background, with the caller's credentials,
+        and records whether the served near-duplicate response differs from
+        the actual one (a false hit). Free-text responses are never
+        identical, so they are compared by their MinHash similarity, with
+        the policy's threshold.
+        """
+        async def verify():
+            try:
+                response = await self._run_input(
+                    runtime, client, input_schema, tool_context
+                )
+            except Exception as e:
+                logger.error(f"Failed to verify near-duplicate hit: {e}")
+                return
+            signature = minhash(shingles(canonical_text(response)))
+            cached_signature = minhash(shingles(canonical_text(cached_response)))
+            if signature is None or cached_signature is None:
+                false_hit = signature != cached_signature
+            else:
+                false_hit = estimated_jaccard(
+                    signature, cached_signature
+                ) < self.cache_policy.similarity_threshold
+            response_cache.record_verification(false_hit=false_hit)
+
+        task = asyncio.create_task(verify())
+        near_duplicate_checks.add(task)
+        task.add_done_callback(near_duplicate_checks.discard)
+
+    async def _run_input(
+        self,
+        runtime: AgentRuntime,
+        client: instructor.AsyncInstructor,
+        input_schema: BaseIOSchema,
+        tool_context: Optional[ToolContext] = None
+    ) -> Dict[str, Any]:
+        agent = runtime.agent.fork(client=client)
+
+        if self.type == "simple":
+            agent_response = await agent.arun(input_schema)
+
+            return agent_response.dict()
+
+        return await self.run_orchestrator(
+            agent, input_schema, tool_context, router=runtime.router
+        )
+
+    async def run_orchestrator(
+        self,
+        agent: AsyncBaseAgent,
+        input_schema: BaseIOSchema,
+        tool_context: Optional[ToolContext] = None,
+        router: Optional[FastRouter] = None
+    ) -> Dict[str, Any]:
+        """
+        Runs the orchestrator pipeline: selects the tools to use, runs them
+        and answers the user input with the tool results in memory
+        """
+        timings_ms = {}
+        start = time.perf_counter()
+
+        # 1. Select the tools to use, locally when the input is obvious
+        route = None
+        selection = None
+        if router is not None and self.fast_routing:
+            route = router.route(input_schema.chat_message)
+            if route is not None:
+                selection = self.build_selection(agent.output_schema, route)
+            router_stats.record(fast_path=selection is not None)
+        fast_path = selection is not None
+        if fast_path:
+            agent.record_turn(input_schema, selection)
+        else:
+            # Run Orchestrator Agent to select Tool to use
+            selection = await agent.arun(input_schema)
+        timings_ms["routing"] = (time.perf_counter() - start) * 1000
+
+        # 2. Run the selected tools, skipping tools that aren't available
+        if self.parallel_tools:
+            selected_calls = selection.tool_calls
+        else:
+            selected_calls = [selection]
+        tools_available = self.tools_available or {}
+        tool_calls = [
+            (
+                call.tool,
+                call.tool_parameters.model_dump() if call.tool_parameters else {}
+            )
+            for call in selected_calls
+            if call.tool in tools_available
+        ]
+        tool_results = []
+        if tool_calls:
+            tools_start = time.perf_counter()
+            # tools_available entries may name the registered tool to run
+            tool_results = await tool_runtime.run_many(
+                [
+                    (tools_available[name].get("tool", name), parameters)
+                    for name, parameters in tool_calls
+                ],
+                tool_context or ToolContext(llm_model=self.llm_model),
+                concurrency=self.tool_concurrency or TOOL_RUN_CONCURRENCY,
+                timeout=self.tool_timeout
             )
-            if self.type == "simple":
-                # Dynamically create output schemas
-                if self.input_schema_fields:
-                    try:
-                        self.validate_input_fields(input_fields)
-                    except ValueError as e:
-                        raise ValueError(
-                            f"Validation error: {str(e)}"
+            timings_ms["tools"] = (time.perf_counter() - tools_start) * 1000
+            for (name, _), tool_result in zip(tool_calls, tool_results):
+                agent.memory.add_message(
+                    "system",
+                    ToolResultSchema(
+                        tool=name,
+                        result=json.dumps(
+                            tool_result.output if tool_result.success
+                            else {"error": tool_result.error},
+                            default=str
                         )
-                    dynamic_input_schema = self.setup_dynamic_schema(
-                        self.input_schema_fields
                     )
-                else:
-                    dynamic_input_schema = None
-
-                dynamic_output_schema = self.setup_dynamic_schema(
-                    self.output_schema_fields
                 )
 
-                self._agent = BasicAgent(
-                    client=client,
-                    llm_model=self.llm_model,
-                    background=self.background,
-                    output_instructions=self.output_instructions,
-                    steps=self.steps,
-                    input_schema=dynamic_input_schema,
-                    output_schema=dynamic_output_schema
+        # 3. Answer the user input with the tool results in memory
+        final_start = time.perf_counter()
+        final_answer = await agent.get_response_async(
+            response_model=FinalAnswerSchema
+        )
+        agent.memory.add_message("assistant", final_answer)
+        timings_ms["final_answer"] = (time.perf_counter() - final_start) * 1000
+        timings_ms["total"] = (time.perf_counter() - start) * 1000
+
+        response = final_answer.model_dump()
+        if self.parallel_tools:
+            response["tool_results"] = [
+                {**tool_result.to_dict(), "tool": name}
+                for (name, _), tool_result in zip(tool_calls, tool_results)
+            ]
+        else:
+            response.update({
+                "tool": selection.tool,
+                "tool_parameters": tool_calls[0][1] if tool_calls else None,
+                "tool_result": (
+                    {**tool_results[0].to_dict(), "tool": selection.tool}
+                    if tool_results else None
+                ),
+            })
+        response["metadata"] = {
+            "timings_ms": timings_ms,
+            "routing": {
+                "path": "fast" if fast_path else "llm",
+                "confidence": route.confidence if fast_path else None,
+            },
+        }
+        return response
+
+    def build_selection(
+        self,
+        output_schema: Type[BaseIOSchema],
+        route: Route
+    ) -> Optional[BaseIOSchema]:
+        """
+        Builds the orchestrator output for a fast router route, or None if
+        the extracted parameters don't validate against the tool schema
+        """
+        tool_info = self.tools_available[route.tool]
+        parameters_schema = self.setup_dynamic_schema(
+            tool_info.get("input_schema_fields") or {}
+        )
+        try:
+            tool_parameters = parameters_schema(**route.tool_parameters)
+        except ValidationError:
+            return None
+        if self.parallel_tools:
+            tool_call_schema = get_args(
+                output_schema.model_fields["tool_calls"].annotation
+            )[0]
+            return output_schema.model_construct(tool_calls=[
+                tool_call_schema.model_construct(
+                    tool=route.tool, tool_parameters=tool_parameters
                 )
-                input_schema = dynamic_input_schema(**input_fields)
-                agent_response = self._agent.run(input_schema)
+            ])
+        return output_schema.model_construct(
+            tool=route.tool, tool_parameters=tool_parameters
+        )
 
-                return agent_response.dict()
+    def tool_context(
+        self,
+        llm_api_key: str,
+        llm_config: LLMConfig
+    ) -> ToolContext:
+        """Credentials the agent's tools run with"""
+        return ToolContext(
+            llm_api_key=llm_api_key,
+            llm_provider=llm_config.provider,
+            llm_model=self.llm_model
+        )
 
-            elif self.type == "orchestrator":
-                # 2. Setup Orchestrator Agent config with available tools
-                tools = self.tools_available
-                if not tools:
-                    raise ValueError("No tools available for this agent")
+    async def stream_runtime(
+        self,
+        runtime: AgentRuntime,
+        client: instructor.AsyncInstructor,
+        input_schema: BaseIOSchema
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Runs a fork of the given (simple agent) runtime streaming its
+        structured output.
 
-                (
-                    background,
-                    output_instructions,
-                    tools_desc
-                ) = self.setup_orchestrator_config(
-                    tools
-                )
+        Yields:
+            ("partial", fields) every time the partially generated output
+            changes, then ("final", output) with the validated output
+        """
+        agent = runtime.agent.fork(client=client)
+        last_partial = None
+        async for partial in agent.run_async(input_schema):
+            partial_fields = partial.model_dump(exclude_none=True)
+            if partial_fields and partial_fields != last_partial:
+                last_partial = partial_fields
+                yield "partial", partial_fields
+
+        final_response = runtime.output_schema.model_validate(last_partial or {})
+        yield "final", final_response.model_dump()
+
+    async def run(
+        self,
+        llm_api_key: str,
+        input_message: Optional[str] = None,
+        input_fields: Optional[Dict[str, Any]] = None,
+        llm_config: Optional[LLMConfig] = None
+    ) -> Dict[str, Any]:
+        """Run an atomic-agent instance based on Agent"""
+        response, _ = await self.run_with_cache_status(
+            llm_api_key,
+            input_message=input_message,
+            input_fields=input_fields,
+            llm_config=llm_config
+        )
+        return response
 
-                # 3. Generate Orchestrator Agent Output Schema
+    async def run_with_cache_status(
+        self,
+        llm_api_key: str,
+        input_message: Optional[str] = None,
+        input_fields: Optional[Dict[str, Any]] = None,
+        llm_config: Optional[LLMConfig] = None
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        """Same as run, also returning the response cache status"""
+        # 1. Configure the client based on the llm_model
+        if llm_config is None:
+            from database.database import retrieve_llm_config_by_model
 
-                output_schema = self.setup_output_schema(tools, tools_desc)
+            llm_config = await retrieve_llm_config_by_model(model=self.llm_model)
 
-                if self.background:
-                    background.extend(self.background)
-                if self.output_instructions:
-                    output_instructions.extend(self.output_instructions)
+        # 2. Get the cached runtime and run a fork of it
+        client, runtime = self.prepare_run(llm_api_key, llm_config)
+        return await self.run_runtime(
+            runtime,
+            client,
+            input_message=input_message,
+            input_fields=input_fields,
+            tool_context=self.tool_context(llm_api_key, llm_config)
+        )
 
-                self._agent = OrchestratorAgent(
-                    client=client,
-                    llm_model=self.llm_model,
-                    background=background,
-                    output_instructions=output_instructions,
-                    steps=self.steps,
-                    output_schema=output_schema
-                )
+    async def run_batch(
+        self,
+        llm_api_key: str,
+        inputs: List[Dict[str, Any]],
+        llm_config: LLMConfig,
+        concurrency: int = AGENT_RUN_BATCH_CONCURRENCY
+    ) -> List[Dict[str, Any]]:
+        """
+        Runs the agent over many inputs, building the runtime once.
 
-                # 5. Run Orchestrator Agent to select Tool to use
-                input_schema = BaseAgentInputSchema(chat_message=input_message)
-                agent_response = self._agent.run(input_schema)
-
-                # TODO: next steps involve running the selected tool
-                # and returning the final response
-                # selected_tool_info = agent_response.dict()
-                # selected_tool_name = selected_tool_info["tool"]
-                # selected_tool_input_fields = selected_tool_info["tool_parameters"]
-                # selected_tool_response = 
-
-                # # 6. Run the selected tool
-                # selected_tool_response = await self.runTool(selected_tool_input_fields)
-                # # 7. Return the final response
-                # self._agent.output_schema = None
-                # self._agent.memory.add_message("system", selected_tool_response)
-                # final_answer = self._agent.run(input_schema)
-
-                # return final_answer.dict()
-                return agent_response.dict()
-            else:
-                raise ValueError(f"Agent type '{self.type}' not supported")
+        Args:
+            llm_api_key: API key of the LLM provider
+            inputs: List of {"input_message", "input_fields"} dicts
+            llm_config: LLMConfig of the agent's model
+            concurrency: Maximum number of items run at the same time
+
+        Returns:
+            One result per input, in order, with its output or error and
+            its duration. A failed item doesn't stop the others.
+        """
+        client, runtime = self.prepare_run(llm_api_key, llm_config)
+        tool_context = self.tool_context(llm_api_key, llm_config)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_item(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    output, cache_status = await self.run_runtime(
+                        runtime,
+                        client,
+                        input_message=item.get("input_message"),
+                        input_fields=item.get("input_fields"),
+                        tool_context=tool_context,
+                    )
+                    result = {
+                        "index": index,
+                        "status": "ok",
+                        "output": output,
+                        "cache": cache_status,
+                    }
+                except Exception as e:
+                    logger.error(f"Batch item {index} failed: {e}")
+                    result = {"index": index, "status": "error", "error": str(e)}
+                result["duration_ms"] = (time.perf_counter() - start) * 1000
+                return result
+
+        return await asyncio.gather(*[
+            run_item(index, item) for index, item in enumerate(inputs)
+        ])
 
     class Settings:
         name = "agents"
@@ -0,0 +1,128 @@
+import os
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+from beanie import Document, PydanticObjectId
+from pydantic import Field, ConfigDict
+from pymongo import IndexModel, ASCENDING
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Finished jobs are removed by MongoDB after this many seconds
+AGENT_JOB_RETENTION = int(os.getenv("AGENT_JOB_RETENTION", 7 * 24 * 3600))
+
+JOB_KINDS = ("agent_run", "browser_use")
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    FINISHED = (SUCCEEDED, FAILED)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class AgentJob(Document):
+    """
+    MongoDB document model for queued agent runs.
+    Jobs are enqueued by the API and claimed by api.worker processes.
+    """
+    kind: str = Field(..., description="Kind of job (e.g., agent_run)")
+    payload: Dict[str, Any] = Field(
+        default_factory=dict,
+        description="Request body the job runs with"
+    )
+    user_id: Optional[PydanticObjectId] = Field(
+        default=None,
+        description="User who submitted the job"
+    )
+    status: str = Field(default=JobStatus.QUEUED, description="Job status")
+    attempts: int = Field(default=0, description="Number of times claimed")
+    max_attempts: int = Field(default=3, description="Attempts before failing")
+    worker_id: Optional[str] = Field(
+        default=None,
+        description="Worker currently (or last) running the job"
+    )
+    available_at: datetime = Field(
+        default_factory=_utcnow,
+        description="Earliest time the job can be claimed"
+    )
+    locked_until: Optional[datetime] = Field(
+        default=None,
+        description="End of the visibility timeout of a running job"
+    )
+    created_at: datetime = Field(default_factory=_utcnow)
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+    result: Optional[Any] = Field(default=None, description="Job result")
+    error: Optional[str] = Field(default=None, description="Last error")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "kind": "agent_run",
+                "payload": {
+                    "id": "67e31ddb8ff9fd95480077e9",
+                    "input_fields": {"notes": "Meeting notes"}
+                },
+                "status": "queued",
+                "attempts": 0
+            }
+        }
+    )
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JobStatus.FINISHED
+
+    def timings(self) -> Dict[str, Optional[float]]:
+        """Time spent queued and running, in milliseconds"""
+        def elapsed_ms(start, end):
+            if start is None or end is None:
+                return None
+            return (end - start).total_seconds() * 1000
+
+        return {
+            "queued_ms": elapsed_ms(self.created_at, self.started_at),
+            "run_ms": elapsed_ms(self.started_at, self.finished_at),
+            "total_ms": elapsed_ms(self.created_at, self.finished_at),
+        }
+
+    def to_response(self) -> Dict[str, Any]:
+        return {
+            "id": str(self.id),
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "timings": self.timings(),
+            "result": self.result,
+            "error": self.error,
+        }
+
+    class Settings:
+        name = "agent_jobs"
+        indexes = [
+            # Claim queries: queued jobs by availability, expired leases
+            IndexModel(
+                [("status", ASCENDING), ("available_at", ASCENDING)],
+                name="status_available_at"
+            ),
+            IndexModel(
+                [("status", ASCENDING), ("locked_until", ASCENDING)],
+                name="status_locked_until"
+            ),
+            IndexModel(
+                [("finished_at", ASCENDING)],
+                expireAfterSeconds=AGENT_JOB_RETENTION,
+                name="finished_at_ttl"
+            ),
+        ]
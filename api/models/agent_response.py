@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+
+
+class AgentResponse(Document):
+    """
+    MongoDB document model for cached agent responses.
+    Documents are removed by MongoDB once expires_at has passed.
+    """
+    key: str = Field(
+        ...,
+        description="Agent id, config version and hash of the canonical input"
+    )
+    agent_id: str = Field(..., description="Agent the response belongs to")
+    version: int = Field(..., description="Agent config version")
+    response: Dict[str, Any] = Field(..., description="Cached agent response")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(..., description="End of the cache TTL")
+    scope: Optional[str] = Field(
+        default=None,
+        description="Agent id and config version, for near-duplicate lookups"
+    )
+    signature: Optional[List[int]] = Field(
+        default=None,
+        description="MinHash signature of the canonical input"
+    )
+    lsh_bands: Optional[List[str]] = Field(
+        default=None,
+        description="LSH band keys of the signature"
+    )
+
+    class Settings:
+        name = "agent_responses"
+        indexes = [
+            IndexModel([("key", ASCENDING)], unique=True, name="key_unique"),
+            IndexModel(
+                [("scope", ASCENDING), ("lsh_bands", ASCENDING)],
+                name="scope_lsh_bands"
+            ),
+            IndexModel(
+                [("expires_at", ASCENDING)],
+                expireAfterSeconds=0,
+                name="expires_at_ttl"
+            ),
+        ]
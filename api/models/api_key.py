@@ -1,21 +1,70 @@
-from beanie import Document
+import hashlib
+from uuid import uuid4
+from typing import Optional
+from beanie import Document, PydanticObjectId
 from pydantic import Field, ConfigDict
+from pymongo import IndexModel, ASCENDING
+
+
+def generate_api_key() -> str:
+    """Generates a random API key with prefix"""
+    return f"sk-{uuid4().hex}"
+
+
+def hash_api_key(api_key: str) -> str:
+    """Returns the SHA-256 hex digest used to identify an API key"""
+    return hashlib.sha256(api_key.encode()).hexdigest()
 
 
 class APIKey(Document):
     """
-    MongoDB document model for storing API keys
+    MongoDB document model for storing API keys.
+    Only the hash of the key is stored, raw keys are shown once on creation.
     """
-    key: str = Field(..., description="The model identifier")
-    # owner: Link[User] = Field(..., description="Owner of the API key")
+    key_hash: Optional[str] = Field(
+        default=None,
+        description="SHA-256 hash of the API key"
+    )
+    key_prefix: Optional[str] = Field(
+        default=None,
+        description="First characters of the API key, to tell keys apart"
+    )
+    user_id: Optional[PydanticObjectId] = Field(
+        default=None,
+        description="Owner of the API key"
+    )
+    key: Optional[str] = Field(
+        default=None,
+        description="Raw key of legacy API keys, removed by migrate_api_keys"
+    )
 
     model_config = ConfigDict(
         json_schema_extra={
             "example": {
-                "key": "some_key"
+                "key_hash": "9f86d081884c7d659a2feaa0c55ad015...",
+                "key_prefix": "sk-1a2b3c",
+                "user_id": "67e31ddb8ff9fd95480077e9"
             }
         }
     )
 
+    @classmethod
+    def from_raw_key(cls, api_key: str, user_id: PydanticObjectId) -> "APIKey":
+        return cls(
+            key_hash=hash_api_key(api_key),
+            key_prefix=api_key[:9],
+            user_id=user_id
+        )
+
     class Settings:
         name = "api_keys"
+        indexes = [
+            # Sparse so legacy keys without a hash don't collide
+            IndexModel(
+                [("key_hash", ASCENDING)],
+                unique=True,
+                sparse=True,
+                name="key_hash_unique"
+            ),
+            IndexModel([("user_id", ASCENDING)], name="user_id"),
+        ]
@@ -1,5 +1,18 @@
+from typing import List, Optional
 from beanie import Document
-from pydantic import Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict
+from pymongo import IndexModel, ASCENDING
+
+
+class LLMRateLimits(BaseModel):
+    """Client-side limits of the calls made to a model, None is unlimited"""
+    requests_per_minute: Optional[int] = Field(default=None, gt=0)
+    tokens_per_minute: Optional[int] = Field(default=None, gt=0)
+    max_concurrency: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description="Calls in flight at the same time, per worker"
+    )
 
 
 class LLMConfig(Document):
@@ -12,16 +25,33 @@ class LLMConfig(Document):
         ...,
         description="The provider name (e.g., 'openai', 'anthropic')"
     )
+    mirrors: List[str] = Field(
+        default_factory=list,
+        description="Other base URLs serving the model with the same API key, "
+                    "used by hedged and failover requests"
+    )
+    rate_limits: LLMRateLimits = Field(
+        default_factory=LLMRateLimits,
+        description="Limits applied to the calls made to this model"
+    )
 
     model_config = ConfigDict(
         json_schema_extra={
             "example": {
                 "model": "deepseek-chat",
                 "base_url": "https://api.deepseek.com",
-                "provider": "deepseek"
+                "provider": "deepseek",
+                "rate_limits": {
+                    "requests_per_minute": 600,
+                    "tokens_per_minute": 1000000,
+                    "max_concurrency": 50
+                }
             }
         }
     )
 
     class Settings:
         name = "llm_configs"
+        indexes = [
+            IndexModel([("model", ASCENDING)], unique=True, name="model_unique"),
+        ]
@@ -1,5 +1,6 @@
 from beanie import Document, Link
 from pydantic import Field, ConfigDict
+from pymongo import IndexModel, ASCENDING
 from typing import Dict, List
 
 from .api_key import APIKey
@@ -45,3 +46,6 @@ class User(Document):
 
     class Settings:
         name = "users"
+        indexes = [
+            IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        ]
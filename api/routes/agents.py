@@ -1,23 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+import os
+import json
+import time
+from fastapi import APIRouter, HTTPException, Depends, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Any
 import logging
+from beanie import Link
 from api.models import Agent, User
+from api.models.agent import AGENT_RUN_BATCH_CONCURRENCY, ResponseCachePolicy
 
 from api.auth import current_user
 
 from database.database import (
     add_agent,
-    retrieve_user_by_email,
-    retrieve_agent,
-    retrieve_llm_config_by_model,
-    update_user_data
+    add_agent_to_user,
+    retrieve_agent_run_context,
+    update_agent_data
 )
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+AGENT_RUN_BATCH_MAX_SIZE = int(os.getenv("AGENT_RUN_BATCH_MAX_SIZE", 1000))
+AGENT_RUN_BATCH_MAX_CONCURRENCY = int(
+    os.getenv("AGENT_RUN_BATCH_MAX_CONCURRENCY", 32)
+)
+
 router = APIRouter(prefix="/agents", tags=["Agents"])
 
 
@@ -49,29 +59,32 @@ class AgentRunRequest(BaseModel):
 @router.post("/run")
 async def run_agent(
     config: AgentRunRequest,
+    http_response: Response,
     user: User = Depends(current_user)
 ):
     try:
-        # Retrieve Agent from DB
-        agent = await retrieve_agent(config.id)
-        logger.info(f"Running agent: {agent.name}")
-        # fetch llm_config from db by model name
-        llm_config = await retrieve_llm_config_by_model(model=agent.llm_model)
-        # fetch user from db by email
-        logger.info(f"User: {user}")
-        user = await retrieve_user_by_email(user.email)
-        if not user:
+        # Retrieve Agent and its llm_config from DB in a single round-trip,
+        # the authenticated user is reused as is
+        agent, llm_config = await retrieve_agent_run_context(config.id)
+        if not agent:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found"
+            )
+        if not llm_config:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"LLM config not found for model '{agent.llm_model}'"
             )
+        logger.info(f"Running agent: {agent.name}")
 
         llm_api_key = user.llm_api_keys[llm_config.provider]
 
         try:
-            response = await agent.run(
+            response, cache_status = await agent.run_with_cache_status(
                 llm_api_key=llm_api_key,
                 input_message=config.input_message,
                 input_fields=config.input_fields,
+                llm_config=llm_config,
             )
         except Exception as e:
             if isinstance(e, ValueError):
@@ -82,6 +95,8 @@ async def run_agent(
                 status_code=status_code,
                 detail=f"Error running agent: {str(e)}"
             )
+        if cache_status:
+            http_response.headers["X-Agent-Cache"] = cache_status
         return response
 
     except Exception as e:
@@ -93,6 +108,170 @@ async def run_agent(
             raise HTTPException(status_code=500, detail=str(e))
 
 
+def format_sse(event: str, data: Any) -> str:
+    """Formats a server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/run/stream")
+async def run_agent_stream(
+    config: AgentRunRequest,
+    user: User = Depends(current_user)
+):
+    """
+    Run a simple Agent streaming its structured output as server-sent
+    events: "partial" events as output fields fill in, then a "final" event
+    with the validated output (or an "error" event). Orchestrator agents
+    run tools, so they are only run through /run.
+    """
+    agent, llm_config = await retrieve_agent_run_context(config.id)
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found"
+        )
+    if agent.type != "simple":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Streaming is not supported for '{agent.type}' agents"
+        )
+    if not llm_config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"LLM config not found for model '{agent.llm_model}'"
+        )
+    if llm_config.provider not in user.llm_api_keys:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"No LLM API key for provider '{llm_config.provider}'"
+        )
+    logger.info(f"Streaming agent: {agent.name}")
+
+    try:
+        client, runtime = agent.prepare_run(
+            user.llm_api_keys[llm_config.provider], llm_config
+        )
+        input_schema = agent.build_run_input(
+            runtime,
+            input_message=config.input_message,
+            input_fields=config.input_fields
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Error running agent: {str(e)}"
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_stream():
+        try:
+            async for event, data in agent.stream_runtime(
+                runtime, client, input_schema
+            ):
+                yield format_sse(event, data)
+        except Exception as e:
+            logger.error(f"Error streaming agent: {str(e)}")
+            yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+class AgentBatchItem(BaseModel):
+    """Single input of a batch run"""
+    input_message: Optional[str] = Field(
+        default=None,
+        description="The user's input message to be analyzed and responded to."
+    )
+    input_fields: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Input fields for the agent"
+    )
+
+
+class AgentRunBatchRequest(BaseModel):
+    """Request model for running an Agent over many inputs"""
+    id: str = Field(..., description="Agent ID")
+    inputs: List[AgentBatchItem] = Field(
+        ...,
+        min_length=1,
+        max_length=AGENT_RUN_BATCH_MAX_SIZE,
+        description="Inputs to run the agent with, results keep their order"
+    )
+    concurrency: int = Field(
+        default=AGENT_RUN_BATCH_CONCURRENCY,
+        ge=1,
+        le=AGENT_RUN_BATCH_MAX_CONCURRENCY,
+        description="Maximum number of inputs run at the same time"
+    )
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "id": "67e31ddb8ff9fd95480077e9",
+                "inputs": [
+                    {"input_fields": {"notes": "Notes of the first meeting"}},
+                    {"input_fields": {"notes": "Notes of the second meeting"}}
+                ],
+                "concurrency": 8
+            }
+        }
+    )
+
+
+@router.post("/run_batch")
+async def run_agent_batch(
+    config: AgentRunBatchRequest,
+    user: User = Depends(current_user)
+):
+    """
+    Run an Agent over a list of inputs with bounded concurrency
+    :return: Per-input results in order, with errors and timings
+    """
+    start = time.perf_counter()
+    agent, llm_config = await retrieve_agent_run_context(config.id)
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found"
+        )
+    if not llm_config:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"LLM config not found for model '{agent.llm_model}'"
+        )
+    if llm_config.provider not in user.llm_api_keys:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"No LLM API key for provider '{llm_config.provider}'"
+        )
+    logger.info(f"Running agent {agent.name} over {len(config.inputs)} inputs")
+
+    try:
+        results = await agent.run_batch(
+            llm_api_key=user.llm_api_keys[llm_config.provider],
+            inputs=[item.model_dump() for item in config.inputs],
+            llm_config=llm_config,
+            concurrency=config.concurrency,
+        )
+    except Exception as e:
+        # Errors building the runtime affect every input
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    failed = sum(1 for result in results if result["status"] == "error")
+    return {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "duration_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
 class CreateAgentRequest(BaseModel):
     """Request model for creating an Agent"""
 
@@ -126,6 +305,36 @@ class CreateAgentRequest(BaseModel):
         default=None,
         description="Output schema field definitions"
     )
+    tools_available: Optional[Dict[str, Dict[str, Any]]] = Field(
+        default=None,
+        description="List of tools available to the agent"
+    )
+    parallel_tools: bool = Field(
+        default=False,
+        description="Whether the orchestrator can run several tools at once"
+    )
+    cache_policy: ResponseCachePolicy = Field(
+        default_factory=ResponseCachePolicy,
+        description="Response cache policy, for deterministic agents"
+    )
+    coalesce_runs: bool = Field(
+        default=True,
+        description="Whether identical concurrent runs share a single LLM call"
+    )
+    fast_routing: bool = Field(
+        default=False,
+        description="Whether obvious inputs are routed without the LLM"
+    )
+    tool_concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Maximum number of tools run at the same time"
+    )
+    tool_timeout: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Seconds all the tools of a run may take"
+    )
     tg_bot_token: Optional[str] = Field(
         default=None,
         description="Telegram bot token if applicable"
@@ -183,11 +392,116 @@ async def create_agent(config: CreateAgentRequest, user: User = Depends(current_
         res = await add_agent(new_agent)
 
         # Add agent to user
-        current_user_agents = user.agents
-        new_agents = current_user_agents + [new_agent]
-        await update_user_data(id=user.id, data={"agents": new_agents})
+        await add_agent_to_user(user_id=user.id, agent=new_agent)
 
         return res
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+class UpdateAgentRequest(BaseModel):
+    """Request model for updating an Agent, only provided fields are updated"""
+
+    name: Optional[str] = Field(default=None, description="Name of the agent")
+    llm_model: Optional[str] = Field(
+        default=None,
+        description="The identifier of the model to use"
+    )
+    type: Optional[str] = Field(
+        default=None,
+        description="Type of agent (e.g., orchestrator, simple)"
+    )
+    description: Optional[str] = Field(
+        default=None,
+        description="Description of the agent"
+    )
+    background: Optional[List[str]] = Field(
+        default=None,
+        description="Background context for the agent"
+    )
+    steps: Optional[List[str]] = Field(
+        default=None,
+        description="Steps the agent follows"
+    )
+    output_instructions: Optional[List[str]] = Field(
+        default=None,
+        description="Instructions for output formatting"
+    )
+    input_schema_fields: Optional[Dict[str, Dict[str, str]]] = Field(
+        default=None,
+        description="Input schema field definitions"
+    )
+    output_schema_fields: Optional[Dict[str, Dict[str, str]]] = Field(
+        default=None,
+        description="Output schema field definitions"
+    )
+    tools_available: Optional[Dict[str, Dict[str, Any]]] = Field(
+        default=None,
+        description="List of tools available to the agent"
+    )
+    parallel_tools: Optional[bool] = Field(
+        default=None,
+        description="Whether the orchestrator can run several tools at once"
+    )
+    cache_policy: Optional[ResponseCachePolicy] = Field(
+        default=None,
+        description="Response cache policy, for deterministic agents"
+    )
+    coalesce_runs: Optional[bool] = Field(
+        default=None,
+        description="Whether identical concurrent runs share a single LLM call"
+    )
+    fast_routing: Optional[bool] = Field(
+        default=None,
+        description="Whether obvious inputs are routed without the LLM"
+    )
+    tool_concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Maximum number of tools run at the same time"
+    )
+    tool_timeout: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Seconds all the tools of a run may take"
+    )
+    tg_bot_token: Optional[str] = Field(
+        default=None,
+        description="Telegram bot token if applicable"
+    )
+
+
+def user_owns_agent(user: User, agent_id: str) -> bool:
+    for agent in user.agents:
+        linked_id = agent.ref.id if isinstance(agent, Link) else agent.id
+        if str(linked_id) == str(agent_id):
+            return True
+    return False
+
+
+@router.post("/update/{id}")
+async def update_agent(
+    id: str,
+    config: UpdateAgentRequest,
+    user: User = Depends(current_user)
+):
+    """
+    Update an existing Agent, bumping its config version
+    :return: The updated Agent
+    """
+    if not user.is_admin and not user_owns_agent(user, id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to update this agent"
+        )
+    try:
+        agent = await update_agent_data(id=id, data=config.model_dump())
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found"
+        )
+    return agent
@@ -29,27 +29,30 @@ class ToolRunRequest(BaseModel):
     STEEL_API_KEY: Optional[str] = None
 
 
+def build_browser_use_tool(config: ToolRunRequest) -> BrowserUseTool:
+    if config.local_browser:
+        return BrowserUseTool(config=BrowserUseToolConfig(
+            llm_api_key=config.llm_api_key,
+            llm_provider=config.llm_provider,
+            llm_model=config.llm_model,
+        ))
+    return BrowserUseTool(
+        config=BrowserUseToolConfig(
+            STEEL_API_KEY=STEEL_API_KEY,
+            STEEL_BASE_URL=STEEL_BASE_URL,
+            llm_api_key=config.llm_api_key,
+            llm_provider=config.llm_provider,
+            llm_model=config.llm_model,
+        )
+    )
+
+
 @router.post("/run")
 async def run_tool(config: ToolRunRequest):
     try:
         logger.info("Running browser-use tool")
 
-        if config.local_browser:
-            browser_use_tool = BrowserUseTool(config=BrowserUseToolConfig(
-                llm_api_key=config.llm_api_key,
-                llm_provider=config.llm_provider,
-                llm_model=config.llm_model,
-            ))
-        else:
-            browser_use_tool = BrowserUseTool(
-                config=BrowserUseToolConfig(
-                    STEEL_API_KEY=STEEL_API_KEY,
-                    STEEL_BASE_URL=STEEL_BASE_URL,
-                    llm_api_key=config.llm_api_key,
-                    llm_provider=config.llm_provider,
-                    llm_model=config.llm_model,
-                )
-            )
+        browser_use_tool = build_browser_use_tool(config)
 
         try:
             browser_use_input = BrowserUseTool.input_schema(task=config.task)
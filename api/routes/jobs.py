@@ -0,0 +1,115 @@
+import os
+import asyncio
+import logging
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from pydantic import BaseModel, ConfigDict
+from beanie import PydanticObjectId
+
+from api.auth import current_user
+from api.models import User, AgentJob
+from api.routes.agents import AgentRunRequest
+from database.job_queue import enqueue_job, retrieve_job
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Longest a GET /jobs/{id} request waits for the job to finish, in seconds
+AGENT_JOB_MAX_WAIT = float(os.getenv("AGENT_JOB_MAX_WAIT", 60))
+AGENT_JOB_POLL_INTERVAL = float(os.getenv("AGENT_JOB_POLL_INTERVAL", 0.5))
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+class BrowserUseJobRequest(BaseModel):
+    """
+    Request model for queueing a browser-use run.
+    The LLM API key is taken from the user's llm_api_keys when the job runs.
+    """
+    task: str
+    llm_provider: str
+    llm_model: str
+    local_browser: Optional[bool] = False
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "task": "Go to duckduck.go and search for 'how to make a cake'",
+                "llm_provider": "openai",
+                "llm_model": "gpt-4o-mini",
+                "local_browser": False
+            }
+        }
+    )
+
+
+@router.post("/agents/run", status_code=status.HTTP_202_ACCEPTED)
+async def submit_agent_run(
+    config: AgentRunRequest,
+    user: User = Depends(current_user)
+):
+    """
+    Queue an Agent run, run by api.worker processes
+    :return: The job id and status
+    """
+    job = await enqueue_job("agent_run", config.model_dump(), user_id=user.id)
+    return {"id": str(job.id), "status": job.status}
+
+
+@router.post("/browser-use/run", status_code=status.HTTP_202_ACCEPTED)
+async def submit_browser_use_run(
+    config: BrowserUseJobRequest,
+    user: User = Depends(current_user)
+):
+    """
+    Queue a browser-use run, run by api.worker processes
+    :return: The job id and status
+    """
+    if config.llm_provider not in user.llm_api_keys:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"No LLM API key for provider '{config.llm_provider}'"
+        )
+    job = await enqueue_job("browser_use", config.model_dump(), user_id=user.id)
+    return {"id": str(job.id), "status": job.status}
+
+
+async def wait_for_job(id: PydanticObjectId, wait: float) -> Optional[AgentJob]:
+    """Polls the job until it finishes or wait seconds have passed"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    job = await retrieve_job(id)
+    while job and not job.finished and loop.time() < deadline:
+        await asyncio.sleep(
+            min(AGENT_JOB_POLL_INTERVAL, max(deadline - loop.time(), 0))
+        )
+        job = await retrieve_job(id)
+    return job
+
+
+@router.get("/{id}")
+async def get_job(
+    id: PydanticObjectId,
+    wait: float = Query(
+        default=0,
+        ge=0,
+        le=AGENT_JOB_MAX_WAIT,
+        description="Seconds to wait for the job to finish (long-poll)"
+    ),
+    user: User = Depends(current_user)
+):
+    """
+    Retrieve a job, optionally waiting for it to finish
+    :return: The job status, timings and result
+    """
+    job = await wait_for_job(id, wait)
+    if not job or (not user.is_admin and job.user_id != user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+    return job.to_response()
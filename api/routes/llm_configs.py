@@ -1,10 +1,12 @@
 import logging
 from fastapi import APIRouter, HTTPException
+from typing import List
 from pydantic import BaseModel, Field, ConfigDict
 
 from database.database import retrieve_llm_configs, add_llm_config
 
 from api.models import LLMConfig
+from api.models.llm_config import LLMRateLimits
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,6 +23,14 @@ class CreateLLMConfigRequest(BaseModel):
         ...,
         description="The provider name (e.g., 'openai', 'anthropic')"
     )
+    mirrors: List[str] = Field(
+        default_factory=list,
+        description="Other base URLs serving the model with the same API key"
+    )
+    rate_limits: LLMRateLimits = Field(
+        default_factory=LLMRateLimits,
+        description="Limits applied to the calls made to this model"
+    )
 
     # Reuse the same example schema
     model_config = ConfigDict(
@@ -28,7 +38,12 @@ class CreateLLMConfigRequest(BaseModel):
             "example": {
                 "model": "deepseek-chat",
                 "base_url": "https://api.deepseek.com",
-                "provider": "deepseek"
+                "provider": "deepseek",
+                "rate_limits": {
+                    "requests_per_minute": 600,
+                    "tokens_per_minute": 1000000,
+                    "max_concurrency": 50
+                }
             }
         }
     )
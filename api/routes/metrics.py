@@ -0,0 +1,42 @@
+import logging
+from fastapi import APIRouter, Depends
+
+from api.auth import admin_user
+from api.models import User
+from api.models.agent import agent_runtime_cache, agent_run_single_flight
+from database.api_key_cache import api_key_cache
+from database.response_cache import response_cache
+from imaginary_agents.agents.fast_router import router_stats
+from imaginary_agents.helpers.schema_compiler import schema_compiler
+from imaginary_agents.llm.client_registry import llm_client_registry
+from imaginary_agents.tg_bots.bot_manager import bot_manager
+from imaginary_agents.tg_bots.memory_cache import chat_memory_cache
+from imaginary_agents.llm.endpoints import llm_endpoint_pool
+from imaginary_agents.llm.rate_limiter import llm_rate_limiter
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("")
+async def get_metrics(user: User = Depends(admin_user)):
+    """
+    Retrieve in-process cache and pool statistics of this worker
+    :return: statistics grouped by component
+    """
+    return {
+        "api_key_cache": api_key_cache.stats(),
+        "agent_runtime_cache": agent_runtime_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "schema_cache": schema_compiler.stats(),
+        "llm_clients": llm_client_registry.stats(),
+        "llm_rate_limits": llm_rate_limiter.stats(),
+        "llm_endpoints": llm_endpoint_pool.stats(),
+        "telegram_updates": bot_manager.dispatcher.stats(),
+        "telegram_memory": chat_memory_cache.stats(),
+        "fast_router": router_stats.stats(),
+        "agent_run_single_flight": agent_run_single_flight.stats(),
+    }
@@ -3,7 +3,6 @@ from pydantic import BaseModel
 from typing import List
 import logging
 from imaginary_agents.tg_bots.bot_manager import bot_manager
-from imaginary_agents.helpers.encription_helper import generate_user_encryption_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,8 +24,8 @@ class BotStartRequest(BaseModel):
 
 
 @router.post("/start_bot/{agent_id}")
-def start_bot(agent_id: str, req: BotStartRequest):
-    return bot_manager.start_bot(
+async def start_bot(agent_id: str, req: BotStartRequest):
+    return await bot_manager.start_bot(
         agent_id,
         token=req.token,
         agent_name=req.agent_name,
@@ -40,8 +39,8 @@ def start_bot(agent_id: str, req: BotStartRequest):
 
 
 @router.post("/stop_bot/{agent_id}")
-def stop_bot(agent_id: str):
-    return bot_manager.stop_bot(agent_id)
+async def stop_bot(agent_id: str):
+    return await bot_manager.stop_bot(agent_id)
 
 
 @router.get("/list_bots")
@@ -56,32 +55,21 @@ def bot_status(agent_id: str):
 
 @router.post("/webhook/{token}")
 async def telegram_webhook(token: str, request: Request):
+    """
+    Queues the update and acknowledges it right away, updates are processed
+    in the background in the order they were received within each chat
+    """
     if token not in bot_manager.bot_configs:
         raise HTTPException(status_code=404, detail="Bot not found.")
-    update = await request.json()
-    chat_id = update.get("message", {}).get("chat", {}).get("id")
-    if chat_id:
-        bot_id = bot_manager.bot_configs[token].get("bot_id")
-        if bot_id:
-            data = {
-                "bot_id": bot_id,
-                "telegram_user_id": chat_id,
-            }
-            user = bot_manager.users_collection.find_one(
-                {
-                    "bot_id": bot_id,
-                    "telegram_user_id": chat_id
-                }
-            )
-            if user is None or "telegram_user_id" not in user:
-                data["encryption_key"] = generate_user_encryption_key().decode()
-            bot_manager.users_collection.update_one(
-                {"bot_id": bot_id, "telegram_user_id": chat_id},
-                {"$set": data},
-                upsert=True
-            )
-    bot_instance = bot_manager.get_bot_instance(token)
-    bot_instance.process_webhook(update)
+    try:
+        update = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid update.")
+    if not isinstance(update, dict) or "update_id" not in update:
+        raise HTTPException(status_code=400, detail="Invalid update.")
+    if not bot_manager.dispatcher.submit(token, update):
+        # Telegram retries the update later
+        raise HTTPException(status_code=503, detail="Too many pending updates.")
     return {"status": "ok"}
 
 
@@ -2,11 +2,11 @@ import logging
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Dict
 from fastapi import APIRouter, Depends, HTTPException, status
-from uuid import uuid4
+from beanie import PydanticObjectId
 
 from api.auth import current_user, admin_user
 from api.models.user import User
-from api.models.api_key import APIKey
+from api.models.api_key import APIKey, generate_api_key
 
 from database.database import add_user, add_api_key
 
@@ -53,11 +53,13 @@ async def get_user(user: User = Depends(current_user)):
 
 @router.post("/create")
 async def create_user(config: CreateUserRequest, user: User = Depends(admin_user)):
-    api_key = APIKey(
-        key=f"sk-{uuid4().hex}"  # Generate a random API key with prefix
-    )
+    # Only the hash is stored, the raw key is returned once
+    raw_api_key = generate_api_key()
+    user_id = PydanticObjectId()
+    api_key = APIKey.from_raw_key(raw_api_key, user_id=user_id)
     await add_api_key(api_key)  # Save the API key to the database
     new_user = User(
+        id=user_id,
         email=config.email,
         llm_api_keys=config.llm_api_keys,
         api_keys=[api_key]
@@ -65,5 +67,5 @@ async def create_user(config: CreateUserRequest, user: User = Depends(admin_user
     await add_user(new_user)
     return {
         "email": new_user.email,
-        "apiKey": api_key.key,
+        "apiKey": raw_api_key,
     }
@@ -11,12 +11,29 @@ from api.routes import (
     tg_bots,
     crawler_agent,
     browser_use,
-    llm_configs
+    llm_configs,
+    metrics,
+    jobs
 )
 from imaginary_agents.tg_bots.bot_manager import bot_manager
+from imaginary_agents.tg_bots.memory_cache import chat_memory_cache
+from imaginary_agents.llm.client_registry import llm_client_registry
+from imaginary_agents.llm.rate_limiter import llm_rate_limiter
 
 from config import init_db, close_db_connection
-from api.models import LLMConfig, Agent, User, APIKey
+from database.llm_config_catalog import llm_config_catalog
+from database.llm_rate_limit_store import (
+    LLM_RATE_LIMIT_SHARED,
+    MongoRateLimitStore
+)
+from api.models import (
+    LLMConfig,
+    Agent,
+    User,
+    APIKey,
+    AgentJob,
+    AgentResponse
+)
 
 from dotenv import load_dotenv
 
@@ -38,14 +55,33 @@ async def lifespan(app: FastAPI):
     logger.info("Bot Manager initialized and ready to serve requests")
 
     # Initialize the database
-    await init_db([LLMConfig, Agent, User, APIKey])
+    await init_db(
+        [LLMConfig, Agent, User, APIKey, AgentJob, AgentResponse]
+    )
     logger.info("Database initialized successfully")
 
+    # Load LLM configs in memory and keep them fresh
+    await llm_config_catalog.load()
+    llm_config_catalog.start()
+    if LLM_RATE_LIMIT_SHARED:
+        llm_rate_limiter.store = MongoRateLimitStore()
+
+    # Start processing Telegram updates acknowledged by the webhook
+    bot_manager.dispatcher.start()
+    chat_memory_cache.start()
+
     yield
     # Add any cleanup code here, if needed
     logger.info("Shutting down Bot Manager")
+    await bot_manager.dispatcher.stop()
+    # Write the chat memories updated by the drained updates
+    await chat_memory_cache.stop()
+    await bot_manager.aclose()
+    await llm_config_catalog.stop()
     await close_db_connection()
     logger.info("Database connection closed")
+    await llm_client_registry.aclose()
+    logger.info("LLM client pools closed")
 
 app = FastAPI(
     title="Imaginary Agents API",
@@ -70,6 +106,8 @@ app.include_router(tg_bots.router, prefix="/api/v1")
 app.include_router(crawler_agent.router, prefix="/api/v1")
 app.include_router(browser_use.router, prefix="/api/v1")
 app.include_router(llm_configs.router, prefix="/api/v1")
+app.include_router(metrics.router, prefix="/api/v1")
+app.include_router(jobs.router, prefix="/api/v1")
 
 
 if __name__ == "__main__":
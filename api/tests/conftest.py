@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from asgi_lifespan import LifespanManager
 from httpx import ASGITransport, AsyncClient
@@ -7,8 +8,45 @@ from beanie import init_beanie
 from api.server import app
 from api.auth import current_user
 
-from api.models import LLMConfig, Agent, User
+from api.models import (
+    LLMConfig,
+    Agent,
+    User,
+    APIKey,
+    AgentJob,
+    AgentResponse
+)
 from config.db import _client, _db
+from database.database import add_llm_config
+from database.api_key_cache import api_key_cache
+from database.response_cache import response_cache
+from imaginary_agents.llm.endpoints import llm_endpoint_pool
+from imaginary_agents.llm.rate_limiter import llm_rate_limiter
+from imaginary_agents.agents.async_base_agent import AsyncBaseAgent
+from imaginary_agents.tg_bots.memory_cache import chat_memory_cache
+
+# Simulated LLM round-trip used by tests that mock the LLM call
+LLM_LATENCY = 0.3
+
+
+@pytest.fixture
+def mock_llm_response(monkeypatch):
+    """Replace the async LLM call with a non-blocking sleep."""
+
+    async def get_response_async(self, response_model=None):
+        await asyncio.sleep(LLM_LATENCY)
+        response_model = response_model or self.output_schema
+        return response_model(**{
+            field_name: "mocked"
+            for field_name in response_model.model_fields
+        })
+
+    monkeypatch.setattr(
+        AsyncBaseAgent,
+        "get_response_async",
+        get_response_async
+    )
+
 
 # Mock user to override auth
 mock_user = {
@@ -76,11 +114,21 @@ async def mock_db_connection(scope="function"):
     document_models = [
         LLMConfig,
         Agent,
-        User
+        User,
+        APIKey,
+        AgentJob,
+        AgentResponse
         # Add other document models here
     ]
     await init_beanie(document_models=document_models, database=mock_db)
 
+    # Cached users belong to the previous test database
+    api_key_cache.clear()
+    response_cache.clear()
+    llm_rate_limiter.clear()
+    llm_endpoint_pool.clear()
+    chat_memory_cache.clear()
+
     yield mock_db
 
     # Restore original globals after test
@@ -88,6 +136,50 @@ async def mock_db_connection(scope="function"):
     config.db._db = original_db
 
 
+# Collection methods that cost a MongoDB round-trip
+QUERY_METHODS = [
+    "find",
+    "find_one",
+    "aggregate",
+    "count_documents",
+    "insert_one",
+    "insert_many",
+    "update_one",
+    "update_many",
+    "replace_one",
+    "delete_one",
+    "delete_many",
+    "find_one_and_update",
+    "bulk_write",
+]
+
+
+@pytest.fixture
+def db_queries(mock_db_connection, monkeypatch):
+    """
+    Record every MongoDB round-trip made through the mock database
+    as (collection name, method name) tuples.
+    """
+    queries = []
+    collection_class = type(mock_db_connection.get_collection("queries"))
+
+    def make_wrapper(method_name, method):
+        def wrapper(self, *args, **kwargs):
+            queries.append((self.name, method_name))
+            return method(self, *args, **kwargs)
+        return wrapper
+
+    for method_name in QUERY_METHODS:
+        method = getattr(collection_class, method_name)
+        monkeypatch.setattr(
+            collection_class,
+            method_name,
+            make_wrapper(method_name, method)
+        )
+
+    yield queries
+
+
 @pytest.fixture
 async def sample_llm_configs():
     """Add sample LLM configs to the mock database."""
@@ -107,7 +199,7 @@ async def sample_llm_configs():
 
     created_configs = []
     for config in sample_configs:
-        created = await config.create()
+        created = await add_llm_config(config)
         created_configs.append(created)
 
     yield created_configs
@@ -1,8 +1,21 @@
+import time
+import json
+import asyncio
 import pytest
 from fastapi import status
 from httpx import AsyncClient
 
-from database.database import retrieve_agent
+from database.database import add_agent_to_user, retrieve_agent
+from api.models import Agent, AgentResponse, APIKey, User
+from database.response_cache import response_cache
+from imaginary_agents.agents.async_base_agent import AsyncBaseAgent
+from imaginary_agents.agents.orchestrator import FinalAnswerSchema
+from imaginary_agents.agents.fast_router import evaluate_file, LABELLED_SET_PATH
+from imaginary_agents.tools.crawler_tool import CrawlerTool
+from imaginary_agents.tools.runtime import ToolContext, tool_runtime
+from imaginary_agents.helpers.schema_compiler import schema_compiler
+from api.models import agent as agent_model
+from api.tests.conftest import LLM_LATENCY
 
 import logging
 
@@ -66,6 +79,38 @@ async def test_create_agent_succesfully(
     # TODO: Check if Agent was successfully linked to User
 
 
+async def test_create_agent_keeps_agents_linked_by_other_workers(
+    client_test: AsyncClient,
+    sample_user
+):
+    """Test agents are linked atomically, not from a cached user"""
+    api_key = "sk-agent-owner"
+    await APIKey.from_raw_key(api_key, sample_user.id).create()
+    headers = {"X-API-Key": api_key}
+    new_agent = {"name": "Linked", "llm_model": "deepseek-chat", "type": "simple"}
+
+    response = await client_test.post(
+        "api/v1/agents/create", json=new_agent, headers=headers
+    )
+    assert response.status_code == 200
+    first_id = response.json()["_id"]
+
+    # Another worker links an agent to the same user
+    other_agent = await Agent(**new_agent).create()
+    await add_agent_to_user(sample_user.id, other_agent)
+
+    response = await client_test.post(
+        "api/v1/agents/create", json=new_agent, headers=headers
+    )
+    assert response.status_code == 200
+    second_id = response.json()["_id"]
+
+    user = await User.get(sample_user.id)
+    assert [str(agent.ref.id) for agent in user.agents] == [
+        first_id, str(other_agent.id), second_id
+    ]
+
+
 async def test_run_agent_with_wrong_input_fields(
     client_test: AsyncClient,
     override_dependencies,
@@ -84,3 +129,687 @@ async def test_run_agent_with_wrong_input_fields(
         }
     )
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_run_agent_concurrent_runs_overlap(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_user,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_response
+):
+    """Test concurrent Agent runs don't block each other"""
+    concurrent_runs = 5
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[
+        client_test.post(
+            "api/v1/agents/run",
+            json={
+                "id": str(sample_agent.id),
+                "input_fields": {
+                    "notes": f"Meeting notes #{i}"
+                }
+            }
+        )
+        for i in range(concurrent_runs)
+    ])
+    elapsed = time.perf_counter() - start
+
+    for response in responses:
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"summary": "mocked"}
+
+    # Sequential runs would take concurrent_runs * LLM_LATENCY
+    assert elapsed < 2 * LLM_LATENCY
+
+
+async def test_setup_dynamic_schema_is_cached(sample_agent):
+    """Test identical schema definitions compile to the same model"""
+    hits = schema_compiler.hits
+
+    first = sample_agent.setup_dynamic_schema(sample_agent.output_schema_fields)
+    second = sample_agent.setup_dynamic_schema(
+        dict(sample_agent.output_schema_fields)
+    )
+    other = sample_agent.setup_dynamic_schema(sample_agent.input_schema_fields)
+
+    assert first is second
+    assert first is not other
+    assert schema_compiler.hits >= hits + 1
+
+
+async def test_update_agent_invalidates_runtime(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_user,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_response
+):
+    """Test runs pick up agent edits instead of the cached runtime"""
+    run_request = {
+        "id": str(sample_agent.id),
+        "input_fields": {"notes": "Meeting notes"}
+    }
+    response = await client_test.post("api/v1/agents/run", json=run_request)
+    assert response.json() == {"summary": "mocked"}
+
+    response = await client_test.post(
+        f"api/v1/agents/update/{sample_agent.id}",
+        json={
+            "output_schema_fields": {
+                "decisions": {
+                    "type": "str",
+                    "description": "The decisions made in the meeting"
+                }
+            }
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["version"] == sample_agent.version + 1
+
+    response = await client_test.post("api/v1/agents/run", json=run_request)
+    assert response.json() == {"decisions": "mocked"}
+
+
+async def test_run_agent_db_round_trips(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_user,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_response,
+    db_queries
+):
+    """Test running an Agent loads everything it needs in one query"""
+    db_queries.clear()
+    response = await client_test.post(
+        "api/v1/agents/run",
+        json={
+            "id": str(sample_agent.id),
+            "input_fields": {"notes": "Meeting notes"}
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert db_queries == [("agents", "find_one")]
+
+
+async def test_run_missing_agent(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_llm_configs
+):
+    """Test running an Agent that doesn't exist"""
+    response = await client_test.post(
+        "api/v1/agents/run",
+        json={"id": "67e31ddb8ff9fd95480077e9", "input_fields": {}}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_run_agent_batch(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_user,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_response
+):
+    """Test batch runs keep input order, isolate errors and cap concurrency"""
+    inputs = [{"input_fields": {"notes": f"Meeting notes #{i}"}} for i in range(6)]
+    inputs[2] = {"input_fields": {"some_field": "Wrong data"}}
+
+    start = time.perf_counter()
+    response = await client_test.post(
+        "api/v1/agents/run_batch",
+        json={"id": str(sample_agent.id), "inputs": inputs, "concurrency": 3}
+    )
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == status.HTTP_200_OK
+    batch = response.json()
+    assert batch["succeeded"] == 5
+    assert batch["failed"] == 1
+    assert [result["index"] for result in batch["results"]] == list(range(6))
+    assert batch["results"][0]["output"] == {"summary": "mocked"}
+    assert batch["results"][2]["status"] == "error"
+    assert "notes" in batch["results"][2]["error"]
+
+    # 5 valid items with 3 at a time take two LLM round-trips
+    assert 2 * LLM_LATENCY <= elapsed < 3 * LLM_LATENCY
+
+
+@pytest.fixture
+def mock_llm_stream(monkeypatch):
+    """Replace the streaming LLM call with a partial output per word."""
+
+    async def run_async(self, user_input=None):
+        words = ["The", "meeting", "was", "mocked"]
+        for i in range(1, len(words) + 1):
+            await asyncio.sleep(LLM_LATENCY / len(words))
+            yield self.output_schema.model_construct(
+                summary=" ".join(words[:i])
+            )
+
+    monkeypatch.setattr(AsyncBaseAgent, "run_async", run_async)
+
+
+async def test_run_agent_stream(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_user,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_stream
+):
+    """Test streamed runs send partial outputs, then the validated output"""
+    events = []
+    async with client_test.stream(
+        "POST",
+        "api/v1/agents/run/stream",
+        json={
+            "id": str(sample_agent.id),
+            "input_fields": {"notes": "Meeting notes"}
+        }
+    ) as response:
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/event-stream")
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):])))
+
+    assert events[0] == ("partial", {"summary": "The"})
+    assert [event for event, _ in events].count("partial") == 4
+    assert events[-1] == ("final", {"summary": "The meeting was mocked"})
+
+
+async def test_run_agent_stream_with_wrong_input_fields(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_user,
+    sample_agent,
+    sample_llm_configs
+):
+    """Test streamed runs validate their input before streaming"""
+    response = await client_test.post(
+        "api/v1/agents/run/stream",
+        json={
+            "id": str(sample_agent.id),
+            "input_fields": {"some_field": "Wrong data"}
+        }
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.fixture
+async def orchestrator_agent():
+    """Add an orchestrator Agent with an echo tool to the mock database."""
+
+    async def echo(parameters, context):
+        await asyncio.sleep(LLM_LATENCY)
+        return {"echo": parameters["text"]}
+
+    tool_runtime.register("echo", echo)
+
+    agent = await Agent(
+        name="Test Orchestrator",
+        llm_model="test_model",
+        type="orchestrator",
+        tools_available={
+            "echo": {
+                "description": "Repeats the given text",
+                "input_schema_fields": {
+                    "text": {"type": "str", "description": "Text to repeat"}
+                }
+            }
+        }
+    ).create()
+
+    yield agent
+
+    tool_runtime.unregister("echo")
+
+
+@pytest.fixture
+def mock_orchestrator_llm(monkeypatch):
+    """Select the echo tool, then answer with the tool result in memory."""
+    histories = []
+
+    async def get_response_async(self, response_model=None):
+        await asyncio.sleep(LLM_LATENCY)
+        if response_model is FinalAnswerSchema:
+            histories.append(self.memory.get_history())
+            return FinalAnswerSchema(final_answer="mocked answer")
+        if "tool_calls" in self.output_schema.model_fields:
+            return self.output_schema(tool_calls=[
+                {"tool": "echo", "tool_parameters": {"text": text}}
+                for text in ("hi", "hello", "hey")
+            ])
+        return self.output_schema(tool="echo", tool_parameters={"text": "hi"})
+
+    monkeypatch.setattr(
+        AsyncBaseAgent,
+        "get_response_async",
+        get_response_async
+    )
+    return histories
+
+
+async def test_run_orchestrator_agent(
+    client_test: AsyncClient,
+    override_dependencies,
+    orchestrator_agent,
+    sample_llm_configs,
+    mock_orchestrator_llm
+):
+    """Test orchestrator runs execute the selected tool and answer"""
+    response = await client_test.post(
+        "api/v1/agents/run",
+        json={"id": str(orchestrator_agent.id), "input_message": "Say hi"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert result["final_answer"] == "mocked answer"
+    assert result["tool"] == "echo"
+    assert result["tool_result"]["output"] == {"echo": "hi"}
+
+    timings_ms = result["metadata"]["timings_ms"]
+    for stage in ("routing", "tools", "final_answer"):
+        assert timings_ms[stage] >= LLM_LATENCY * 1000 * 0.9
+    assert timings_ms["total"] >= sum(
+        timings_ms[stage] for stage in ("routing", "tools", "final_answer")
+    )
+
+    # The final answer is generated with the tool result in memory
+    history = mock_orchestrator_llm[0]
+    assert history[-1]["role"] == "system"
+    tool_message = json.loads(history[-1]["content"])
+    assert json.loads(tool_message["result"]) == {"echo": "hi"}
+
+
+async def test_run_orchestrator_agent_stream_is_rejected(
+    client_test: AsyncClient,
+    override_dependencies,
+    orchestrator_agent,
+    sample_llm_configs
+):
+    """Test orchestrator agents can't be streamed, as that runs no tools"""
+    response = await client_test.post(
+        "api/v1/agents/run/stream",
+        json={"id": str(orchestrator_agent.id), "input_message": "Say hi"}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_run_orchestrator_agent_parallel_tools(
+    client_test: AsyncClient,
+    override_dependencies,
+    orchestrator_agent,
+    sample_llm_configs,
+    mock_orchestrator_llm
+):
+    """Test orchestrators run independent tool calls concurrently"""
+    await orchestrator_agent.set({"parallel_tools": True, "tool_concurrency": 3})
+
+    response = await client_test.post(
+        "api/v1/agents/run",
+        json={"id": str(orchestrator_agent.id), "input_message": "Greet me"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert [
+        tool_result["output"] for tool_result in result["tool_results"]
+    ] == [{"echo": "hi"}, {"echo": "hello"}, {"echo": "hey"}]
+
+    # Three tool calls at once take a single tool latency
+    assert result["metadata"]["timings_ms"]["tools"] < 2 * LLM_LATENCY * 1000
+    history = mock_orchestrator_llm[0]
+    assert [message["role"] for message in history[-3:]] == ["system"] * 3
+
+
+async def test_run_orchestrator_agent_tool_timeout(
+    client_test: AsyncClient,
+    override_dependencies,
+    orchestrator_agent,
+    sample_llm_configs,
+    mock_orchestrator_llm
+):
+    """Test tool calls over the run's tool budget time out"""
+    await orchestrator_agent.set({
+        "parallel_tools": True,
+        "tool_concurrency": 2,
+        "tool_timeout": 1.5 * LLM_LATENCY
+    })
+
+    response = await client_test.post(
+        "api/v1/agents/run",
+        json={"id": str(orchestrator_agent.id), "input_message": "Greet me"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    tool_results = response.json()["tool_results"]
+    assert [tool_result["error"] for tool_result in tool_results] == [
+        None, None, "Tool 'echo' timed out"
+    ]
+
+
+async def test_run_orchestrator_agent_fast_path(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_llm_configs,
+    monkeypatch
+):
+    """Test obvious inputs are routed without the LLM routing call"""
+    async def fetch(parameters, context):
+        return {"fetched": parameters["website_url"]}
+
+    tool_runtime.register("fetch", fetch)
+    response_models = []
+
+    async def get_response_async(self, response_model=None):
+        response_models.append(response_model)
+        return FinalAnswerSchema(final_answer="mocked answer")
+
+    monkeypatch.setattr(
+        AsyncBaseAgent,
+        "get_response_async",
+        get_response_async
+    )
+    agent = await Agent(
+        name="Test Fetcher",
+        llm_model="test_model",
+        type="orchestrator",
+        fast_routing=True,
+        tools_available={
+            "fetch": {
+                "description": "Fetches a website and extracts its content",
+                "input_schema_fields": {
+                    "website_url": {"type": "str", "description": "Website URL"}
+                }
+            },
+            "pump_fun_trends": {
+                "description": "Retrieves the trending memecoin metas",
+                "input_schema_fields": {}
+            }
+        }
+    ).create()
+
+    response = await client_test.post(
+        "api/v1/agents/run",
+        json={"id": str(agent.id), "input_message": "https://example.com"}
+    )
+    tool_runtime.unregister("fetch")
+
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert result["metadata"]["routing"]["path"] == "fast"
+    assert result["tool_result"]["output"] == {"fetched": "https://example.com"}
+    # Only the final answer needed the LLM
+    assert response_models == [FinalAnswerSchema]
+
+
+async def test_crawler_tool_uses_run_credentials(monkeypatch):
+    """Test tool parameters can't replace the credentials of the run"""
+    crawls = []
+
+    async def run_crawler(self, params):
+        crawls.append(params)
+        return "crawled"
+
+    monkeypatch.setattr(CrawlerTool, "run_crawler", run_crawler)
+    context = ToolContext(
+        llm_api_key="sk-user", llm_provider="openai", llm_model="gpt-4o-mini"
+    )
+    result = await tool_runtime.run(
+        "crawler",
+        {
+            "website_url": "https://example.com",
+            "crawl_instruction": "Get the title",
+            "api_key": "sk-injected",
+            "llm_provider": "injected",
+        },
+        context
+    )
+
+    assert result.success
+    assert crawls[0].api_key == "sk-user"
+    assert crawls[0].llm_provider == "openai"
+    assert crawls[0].llm_model == "gpt-4o-mini"
+
+
+async def test_fast_router_labelled_set():
+    """Test the fast router's tools and parameters on the offline labelled set"""
+    report = evaluate_file(LABELLED_SET_PATH)
+    assert report["accuracy"] == 1.0
+    assert report["coverage"] >= 0.6
+
+
+@pytest.mark.parametrize("coalesce_runs, expected_llm_calls", [(True, 1), (False, 5)])
+async def test_identical_concurrent_runs_are_coalesced(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_user,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_response,
+    monkeypatch,
+    coalesce_runs,
+    expected_llm_calls
+):
+    """Test identical runs in flight share one LLM call unless opted out"""
+    await sample_agent.set({"coalesce_runs": coalesce_runs})
+    llm_calls = []
+    mocked_response = AsyncBaseAgent.get_response_async
+
+    async def get_response_async(self, response_model=None):
+        llm_calls.append(response_model)
+        return await mocked_response(self, response_model)
+
+    monkeypatch.setattr(
+        AsyncBaseAgent,
+        "get_response_async",
+        get_response_async
+    )
+
+    responses = await asyncio.gather(*[
+        client_test.post(
+            "api/v1/agents/run",
+            json={
+                "id": str(sample_agent.id),
+                "input_fields": {"notes": "Meeting notes"}
+            }
+        )
+        for _ in range(5)
+    ])
+
+    for response in responses:
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"summary": "mocked"}
+    assert len(llm_calls) == expected_llm_calls
+
+
+async def test_concurrent_runs_of_different_keys_are_not_coalesced(
+    override_dependencies,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_response,
+    monkeypatch
+):
+    """Test identical runs are only coalesced within one LLM API key"""
+    llm_calls = []
+    mocked_response = AsyncBaseAgent.get_response_async
+
+    async def get_response_async(self, response_model=None):
+        llm_calls.append(response_model)
+        return await mocked_response(self, response_model)
+
+    monkeypatch.setattr(
+        AsyncBaseAgent,
+        "get_response_async",
+        get_response_async
+    )
+
+    llm_config = sample_llm_configs[1]
+    responses = await asyncio.gather(*[
+        sample_agent.run(
+            llm_api_key,
+            input_fields={"notes": "Meeting notes"},
+            llm_config=llm_config
+        )
+        for llm_api_key in ("sk-tenant-a", "sk-tenant-b", "sk-tenant-a")
+    ])
+
+    assert responses == [{"summary": "mocked"}] * 3
+    assert len(llm_calls) == 2
+
+
+async def test_run_agent_response_cache(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_user,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_response,
+    db_queries
+):
+    """Test agents with a cache policy serve repeated inputs from the cache"""
+    await sample_agent.set({"cache_policy": {"enabled": True, "ttl": 60}})
+    run_request = {
+        "id": str(sample_agent.id),
+        "input_fields": {"notes": "Meeting notes"}
+    }
+
+    response = await client_test.post("api/v1/agents/run", json=run_request)
+    assert response.headers["X-Agent-Cache"] == "miss"
+    assert await AgentResponse.find_all().count() == 1
+
+    start = time.perf_counter()
+    response = await client_test.post("api/v1/agents/run", json=run_request)
+    assert time.perf_counter() - start < LLM_LATENCY
+    assert response.headers["X-Agent-Cache"] == "hit"
+    assert response.json() == {"summary": "mocked"}
+
+    # Other workers read the response from MongoDB
+    response_cache.clear()
+    db_queries.clear()
+    response = await client_test.post("api/v1/agents/run", json=run_request)
+    assert response.headers["X-Agent-Cache"] == "hit"
+    assert ("agent_responses", "find_one") in db_queries
+
+    # Edits bump the version, so cached responses aren't served anymore
+    await client_test.post(
+        f"api/v1/agents/update/{sample_agent.id}",
+        json={"background": ["You are an updated test agent"]}
+    )
+    response = await client_test.post("api/v1/agents/run", json=run_request)
+    assert response.headers["X-Agent-Cache"] == "miss"
+
+
+async def test_run_agent_without_cache_policy(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_user,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_response
+):
+    """Test agents without a cache policy always run"""
+    response = await client_test.post(
+        "api/v1/agents/run",
+        json={
+            "id": str(sample_agent.id),
+            "input_fields": {"notes": "Meeting notes"}
+        }
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert "X-Agent-Cache" not in response.headers
+
+
+async def test_run_agent_near_duplicate_cache(
+    client_test: AsyncClient,
+    override_dependencies,
+    sample_user,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_response,
+    monkeypatch
+):
+    """Test near-duplicate inputs are served the cached response"""
+    monkeypatch.setattr(agent_model, "NEAR_DUPLICATE_SAMPLE_RATE", 1.0)
+    before = response_cache.stats()["near_duplicate"]
+    await sample_agent.set({
+        "cache_policy": {
+            "enabled": True,
+            "ttl": 60,
+            "near_duplicate": True,
+            "similarity_threshold": 0.8
+        }
+    })
+
+    async def run(notes):
+        return await client_test.post(
+            "api/v1/agents/run",
+            json={"id": str(sample_agent.id), "input_fields": {"notes": notes}}
+        )
+
+    notes = (
+        "Weekly sync notes: launch plan and hiring for the mobile app team "
+        "this quarter"
+    )
+    response = await run(notes)
+    assert response.headers["X-Agent-Cache"] == "miss"
+
+    # Whitespace, case, emoji and small additions don't matter
+    for near_duplicate in [
+        f"  weekly SYNC {notes[12:].upper()}   🚀",
+        f"{notes}, thanks!",
+    ]:
+        response = await run(near_duplicate)
+        assert response.headers["X-Agent-Cache"] == "near_hit"
+        assert response.json() == {"summary": "mocked"}
+
+    # Other workers find the signature in MongoDB
+    response_cache.clear()
+    response = await run(notes.replace(":", " --").replace("and", "AND") + "!")
+    assert response.headers["X-Agent-Cache"] == "near_hit"
+
+    # Word order and negations do matter
+    for different in [
+        "Hiring for the mobile app team this quarter and launch plan, "
+        "weekly sync notes",
+        notes.replace("launch plan", "do not launch plan"),
+        "Quarterly budget review",
+    ]:
+        response = await run(different)
+        assert response.headers["X-Agent-Cache"] == "miss"
+
+    # Sampled hits are re-run to measure false hits
+    await asyncio.gather(*agent_model.near_duplicate_checks)
+    stats = response_cache.stats()["near_duplicate"]
+    assert stats["hits"] - before["hits"] == 3
+    assert stats["verified"] - before["verified"] == 3
+    assert stats["false_hits"] == before["false_hits"]
+
+
+async def test_near_duplicate_verification_uses_run_credentials(monkeypatch):
+    """Test sampled near-duplicate hits are re-run with the tool credentials"""
+    runs = []
+
+    async def run_input(self, runtime, client, input_schema, tool_context=None):
+        runs.append(tool_context)
+        return {"final_answer": "cached"}
+
+    monkeypatch.setattr(Agent, "_run_input", run_input)
+    agent = Agent(name="Verified", llm_model="test_model", type="orchestrator")
+    tool_context = ToolContext(llm_api_key="sk-user", llm_provider="openai")
+
+    agent._verify_near_duplicate(
+        None, None, None, {"final_answer": "cached"}, tool_context
+    )
+    await asyncio.gather(*agent_model.near_duplicate_checks)
+
+    assert runs == [tool_context]
@@ -0,0 +1,55 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import config.db
+from config.db import init_db, report_collection_scans, HOT_QUERY_SHAPES
+from api.models import LLMConfig, User
+
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_init_db_survives_duplicates_under_unique_indexes(monkeypatch):
+    """Test indexes are created and one that can't be built is only logged"""
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(config.db, "_client", client)
+    db = client["imaginary_agents_api"]
+    await db.users.insert_many([
+        {"email": "twice@example.com"},
+        {"email": "twice@example.com"},
+    ])
+
+    await init_db([User, LLMConfig])
+
+    assert "email_unique" not in await db.users.index_information()
+    assert "model_unique" in await db.llm_configs.index_information()
+    assert "token_unique" in await db.bot_registry.index_information()
+    assert "bot_id_telegram_user_id_unique" in (
+        await db.bot_users.index_information()
+    )
+
+
+async def test_report_collection_scans(mock_db_connection, monkeypatch):
+    """Test hot query shapes resolved by a collection scan are reported"""
+    db = mock_db_connection
+
+    async def command(name, spec, verbosity=None):
+        if spec["find"] == "bot_users":
+            stage = {"stage": "FETCH", "inputStage": {"stage": "COLLSCAN"}}
+        else:
+            stage = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+        return {"queryPlanner": {"winningPlan": stage}}
+
+    monkeypatch.setattr(db, "command", command)
+
+    collection_scans = await report_collection_scans(db)
+    assert collection_scans == [
+        (collection_name, query_filter)
+        for collection_name, query_filter in HOT_QUERY_SHAPES
+        if collection_name == "bot_users"
+    ]
@@ -0,0 +1,99 @@
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from api.server import app
+from api.auth import current_user
+from api.models import AgentJob
+from api.worker import JobWorker, JOB_HANDLERS
+from database.job_queue import claim_job
+
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def override_with_sample_user(sample_user):
+    """Authenticate as the stored sample user, workers load it by id"""
+    app.dependency_overrides[current_user] = lambda: sample_user
+    yield
+    app.dependency_overrides = {}
+
+
+async def test_agent_run_job(
+    client_test: AsyncClient,
+    override_with_sample_user,
+    sample_agent,
+    sample_llm_configs,
+    mock_llm_response
+):
+    """Test a queued Agent run is run by a worker and can be retrieved"""
+    response = await client_test.post(
+        "api/v1/jobs/agents/run",
+        json={
+            "id": str(sample_agent.id),
+            "input_fields": {"notes": "Meeting notes"}
+        }
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["id"]
+    assert response.json()["status"] == "queued"
+
+    job = await JobWorker(worker_id="test").process_next_job()
+    assert str(job.id) == job_id
+
+    response = await client_test.get(f"api/v1/jobs/{job_id}", params={"wait": 1})
+    assert response.status_code == status.HTTP_200_OK
+    job = response.json()
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 1
+    assert job["result"] == {"summary": "mocked"}
+    assert job["timings"]["run_ms"] is not None
+
+
+async def test_failed_job_is_retried(
+    client_test: AsyncClient,
+    override_with_sample_user,
+    sample_agent,
+    sample_llm_configs,
+    monkeypatch
+):
+    """Test failed attempts are retried until max_attempts"""
+    async def failing_handler(job):
+        raise RuntimeError("LLM provider unavailable")
+
+    monkeypatch.setitem(JOB_HANDLERS, "agent_run", failing_handler)
+    monkeypatch.setattr("database.job_queue.AGENT_JOB_RETRY_DELAY", 0)
+
+    response = await client_test.post(
+        "api/v1/jobs/agents/run",
+        json={"id": str(sample_agent.id), "input_fields": {"notes": "Notes"}}
+    )
+    job_id = response.json()["id"]
+
+    worker = JobWorker(worker_id="test")
+    for attempt in range(1, 4):
+        await worker.process_next_job()
+        job = await AgentJob.get(job_id)
+        assert job.attempts == attempt
+        assert job.error == "LLM provider unavailable"
+    assert job.status == "failed"
+    assert await claim_job("test") is None
+
+
+async def test_expired_lease_is_reclaimed(sample_agent):
+    """Test jobs held by a dead worker are claimed again"""
+    await AgentJob(kind="agent_run", payload={}).create()
+
+    job = await claim_job("dead-worker", visibility_timeout=-1)
+    assert job.worker_id == "dead-worker"
+
+    job = await claim_job("live-worker")
+    assert job.worker_id == "live-worker"
+    assert job.attempts == 2
+    assert await claim_job("other-worker") is None
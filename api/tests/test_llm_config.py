@@ -1,6 +1,25 @@
+import json
+import time
+import asyncio
 import pytest
+import httpx
 from httpx import AsyncClient
 
+from database.database import retrieve_llm_config_by_model
+from database.llm_rate_limit_store import MongoRateLimitStore
+from imaginary_agents.llm.client_registry import LLMClientRegistry
+from imaginary_agents.llm.endpoints import (
+    HedgingAsyncTransport,
+    LLM_CIRCUIT_FAILURE_THRESHOLD,
+    llm_endpoint_pool
+)
+from imaginary_agents.llm.rate_limiter import (
+    RateLimits,
+    RateLimitedAsyncTransport,
+    TokenBucket,
+    llm_rate_limiter
+)
+
 import logging
 
 
@@ -67,3 +86,262 @@ async def test_create_llm_config_succesfully(client_test: AsyncClient):
             break
 
     assert new_config_exists, "Newly created config not found in the list"
+
+
+async def test_created_llm_config_is_served_from_catalog(
+    client_test: AsyncClient,
+    db_queries
+):
+    """Test LLM configs created through the API are looked up in memory"""
+    new_config = {
+        "model": "deepseek-reasoner",
+        "base_url": "https://api.deepseek.com",
+        "provider": "deepseek"
+    }
+    response = await client_test.post("api/v1/llm/config/create", json=new_config)
+    assert response.status_code == 200
+
+    db_queries.clear()
+    llm_config = await retrieve_llm_config_by_model("deepseek-reasoner")
+    assert llm_config.base_url == "https://api.deepseek.com"
+    assert db_queries == []
+
+
+async def test_llm_calls_are_rate_limited(client_test: AsyncClient):
+    """Test calls to a model with rate limits wait in line for a slot"""
+    new_config = {
+        "model": "limited-model",
+        "base_url": "https://api.test.com",
+        "provider": "test_llm_provider",
+        "rate_limits": {"requests_per_minute": 600, "max_concurrency": 2}
+    }
+    response = await client_test.post("api/v1/llm/config/create", json=new_config)
+    assert response.status_code == 200
+
+    in_flight = 0
+    max_in_flight = 0
+    arrivals = []
+
+    async def provider(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, max_in_flight
+        arrivals.append(json.loads(request.content)["user"])
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return httpx.Response(200, json={"usage": {"total_tokens": 10}})
+
+    transport = RateLimitedAsyncTransport(
+        httpx.MockTransport(provider), "test_llm_provider"
+    )
+    async with httpx.AsyncClient(
+        transport=transport, base_url="https://api.test.com"
+    ) as client:
+        responses = await asyncio.gather(*[
+            client.post(
+                "/chat/completions",
+                content=json.dumps({
+                    "model": "limited-model",
+                    "messages": [],
+                    "user": str(n)
+                })
+            )
+            for n in range(6)
+        ])
+
+    assert all(response.status_code == 200 for response in responses)
+    # Requests are admitted in arrival order, two at a time
+    assert arrivals == [str(n) for n in range(6)]
+    assert max_in_flight == 2
+    stats = llm_rate_limiter.stats()["test_llm_provider:limited-model"]
+    assert stats["admitted"] == 6
+    # The last four waited for a concurrency slot
+    assert stats["delayed"] >= 4
+    assert stats["in_flight"] == 0
+    assert stats["queue_depth"] == 0
+
+
+async def test_token_bucket_queues_callers_past_the_budget():
+    """Test callers past the requests/minute budget wait in arrival order"""
+    bucket = TokenBucket(600)
+    now = bucket.updated
+    waits = [bucket.reserve(1, now) for _ in range(602)]
+    assert waits[:600] == [0.0] * 600
+    # The bucket refills at 10 requests per second
+    assert waits[600:] == [pytest.approx(0.1), pytest.approx(0.2)]
+
+
+async def test_llm_rate_limits_are_shared_through_mongo():
+    """Test workers sharing the store can't exceed the per-minute limits"""
+    store = MongoRateLimitStore()
+    limits = RateLimits(requests_per_minute=2)
+    waits = [
+        await store.reserve("test_llm_provider:limited-model", 1, 100, limits)
+        for _ in range(3)
+    ]
+    assert waits[:2] == [0.0, 0.0]
+    assert 0 < waits[2] <= 60
+
+
+async def create_mirrored_config(client_test: AsyncClient):
+    response = await client_test.post(
+        "api/v1/llm/config/create",
+        json={
+            "model": "mirrored-model",
+            "base_url": "https://api.test.com",
+            "provider": "test_llm_provider",
+            "mirrors": ["https://mirror.test.com/"]
+        }
+    )
+    assert response.status_code == 200
+    return llm_endpoint_pool.get("test_llm_provider", "mirrored-model")
+
+
+async def post_completion(handler) -> httpx.Response:
+    transport = HedgingAsyncTransport(
+        httpx.MockTransport(handler), "test_llm_provider"
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        return await client.post(
+            "https://api.test.com/chat/completions",
+            content=json.dumps({"model": "mirrored-model", "messages": []})
+        )
+
+
+async def test_slow_llm_requests_are_hedged(client_test: AsyncClient):
+    """Test a request slower than the hedge delay is answered by a mirror"""
+    endpoints = await create_mirrored_config(client_test)
+    endpoints.default_hedge_delay = 0.05
+    primary_cancelled = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "api.test.com":
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                primary_cancelled.set()
+                raise
+        return httpx.Response(200, json={"endpoint": request.url.host})
+
+    start = time.perf_counter()
+    response = await post_completion(handler)
+    assert time.perf_counter() - start < 0.5
+    assert response.json() == {"endpoint": "mirror.test.com"}
+    await asyncio.wait_for(primary_cancelled.wait(), 1)
+
+    stats = llm_endpoint_pool.stats()["test_llm_provider:mirrored-model"]
+    assert stats["hedges"] == 1
+    assert stats["endpoints"]["https://mirror.test.com"]["wins"] == 1
+
+
+async def test_failing_llm_endpoint_is_taken_out_of_rotation(
+    client_test: AsyncClient
+):
+    """Test failed requests fail over and open the endpoint's circuit"""
+    await create_mirrored_config(client_test)
+    primary_calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal primary_calls
+        if request.url.host == "api.test.com":
+            primary_calls += 1
+            return httpx.Response(503)
+        return httpx.Response(200, json={"endpoint": request.url.host})
+
+    for _ in range(LLM_CIRCUIT_FAILURE_THRESHOLD):
+        response = await post_completion(handler)
+        assert response.json() == {"endpoint": "mirror.test.com"}
+    assert primary_calls == LLM_CIRCUIT_FAILURE_THRESHOLD
+
+    # The open circuit sends requests straight to the mirror
+    response = await post_completion(handler)
+    assert response.status_code == 200
+    assert primary_calls == LLM_CIRCUIT_FAILURE_THRESHOLD
+    stats = llm_endpoint_pool.stats()["test_llm_provider:mirrored-model"]
+    assert stats["endpoints"]["https://api.test.com"]["state"] == "open"
+
+
+async def test_hedged_llm_requests_are_rate_limited(client_test: AsyncClient):
+    """Test hedges are admitted by the limiter and 429s don't fail over"""
+    endpoints = await create_mirrored_config(client_test)
+    endpoints.default_hedge_delay = 0.05
+    llm_rate_limiter.configure(
+        "test_llm_provider", "mirrored-model", RateLimits(requests_per_minute=600)
+    )
+    hosts = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        if request.url.host == "api.test.com":
+            await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"endpoint": request.url.host})
+
+    transport = HedgingAsyncTransport(
+        RateLimitedAsyncTransport(
+            httpx.MockTransport(handler), "test_llm_provider"
+        ),
+        "test_llm_provider"
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.post(
+            "https://api.test.com/chat/completions",
+            content=json.dumps({"model": "mirrored-model", "messages": []})
+        )
+    assert response.json() == {"endpoint": "mirror.test.com"}
+    stats = llm_rate_limiter.stats()["test_llm_provider:mirrored-model"]
+    assert stats["admitted"] == 2
+
+    async def rate_limited(request: httpx.Request) -> httpx.Response:
+        hosts.append(request.url.host)
+        return httpx.Response(429, headers={"retry-after": "0"})
+
+    hosts.clear()
+    response = await post_completion(rate_limited)
+    assert response.status_code == 429
+    assert hosts == ["api.test.com"]
+
+
+async def test_evicted_llm_client_pool_is_closed_after_its_requests(
+    monkeypatch
+):
+    """Test an evicted client's pool is closed once its requests finish"""
+    registry = LLMClientRegistry(max_size=1)
+    requested = asyncio.Event()
+    respond = asyncio.Event()
+    closed = []
+
+    async def handle_async_request(self, request: httpx.Request):
+        requested.set()
+        await respond.wait()
+        return httpx.Response(200, json={"usage": {"total_tokens": 10}})
+
+    async def aclose(self):
+        closed.append(self)
+
+    monkeypatch.setattr(
+        httpx.AsyncHTTPTransport, "handle_async_request", handle_async_request
+    )
+    monkeypatch.setattr(httpx.AsyncHTTPTransport, "aclose", aclose)
+
+    client = registry.get_client("https://api.test.com", "test", "sk-first")
+    request = asyncio.create_task(
+        client.client.post("/chat/completions", cast_to=httpx.Response, body={})
+    )
+    await requested.wait()
+
+    # Evicted while its request is in flight
+    registry.get_client("https://api.test.com", "test", "sk-second")
+    assert registry.stats()["evictions"] == 1
+    assert closed == []
+
+    respond.set()
+    response = await request
+    await response.aclose()
+    assert len(closed) == 1
+
+    # Agents still holding the client keep working
+    response = await client.client.post(
+        "/chat/completions", cast_to=httpx.Response, body={}
+    )
+    assert response.status_code == 200
+    await registry.aclose()
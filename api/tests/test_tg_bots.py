@@ -0,0 +1,420 @@
+import json
+import time
+import asyncio
+import httpx
+import mongomock
+import pytest
+from collections import Counter
+from httpx import AsyncClient
+
+from atomic_agents.agents.base_agent import (
+    BaseAgent,
+    BaseAgentInputSchema,
+    BaseAgentOutputSchema
+)
+from atomic_agents.lib.components.agent_memory import AgentMemory
+from telebot import asyncio_helper
+
+from imaginary_agents.agents.chatbot_agent import ChatbotAgent
+from imaginary_agents.llm.client_registry import llm_client_registry
+from imaginary_agents.helpers.encription_helper import (
+    decrypt_secret,
+    generate_user_encryption_key
+)
+from imaginary_agents.tg_bots import bot as bot_module
+from imaginary_agents.tg_bots.bot import TelegramAgentBot
+from imaginary_agents.tg_bots.bot_manager import bot_manager
+from imaginary_agents.tg_bots import memory_cache
+from imaginary_agents.tg_bots.memory_cache import ChatMemoryCache, chat_memory_cache
+from imaginary_agents.tg_bots.utils import (
+    process_AI_agent_response as response_module
+)
+
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+pytestmark = pytest.mark.asyncio
+
+TOKEN = "123456:test-token"
+
+
+def chat_update(update_id: int, chat_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "text": f"Message {update_id}"
+        }
+    }
+
+
+class CountingCollection:
+    """Mongo collection recording the operations run on it"""
+
+    def __init__(self, name: str):
+        self.collection = mongomock.MongoClient().db[name]
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        self.calls[name] += 1
+        return getattr(self.collection, name)
+
+    def bulk_write(self, requests, ordered=True):
+        # mongomock's bulk API predates the UpdateOne options of this pymongo
+        self.calls["bulk_write"] += 1
+        for request in requests:
+            self.collection.update_one(
+                request._filter, request._doc, upsert=request._upsert
+            )
+
+
+async def telegram_request(token, url, method="get", params=None, **kwargs):
+    if url == "sendMessage":
+        return {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": params["chat_id"], "type": "private"},
+            "text": params["text"]
+        }
+    return True
+
+
+@pytest.fixture
+def processed_updates(monkeypatch):
+    """Registers a bot whose updates take a while to process"""
+    processed = []
+
+    async def process_update(token, update):
+        await asyncio.sleep(0.2)
+        processed.append((update["message"]["chat"]["id"], update["update_id"]))
+
+    monkeypatch.setitem(bot_manager.bot_configs, TOKEN, {"bot_id": "bot"})
+    monkeypatch.setattr(bot_manager.dispatcher, "handler", process_update)
+    return processed
+
+
+async def test_telegram_webhook_acknowledges_first(
+    client_test: AsyncClient,
+    processed_updates
+):
+    """Test updates are queued and processed in order within each chat"""
+    updates = [chat_update(1, 100), chat_update(2, 100), chat_update(3, 200)]
+    start = time.perf_counter()
+    for update in updates:
+        response = await client_test.post(
+            f"api/v1/bots/telegram/webhook/{TOKEN}", json=update
+        )
+        assert response.status_code == 200
+    assert time.perf_counter() - start < 0.2
+    stats = bot_manager.dispatcher.stats()
+    assert stats["queue_depth"] + stats["in_flight"] == 3
+
+    await bot_manager.dispatcher.join()
+    # Chats run in parallel, each chat in order
+    assert processed_updates.index((100, 1)) < processed_updates.index((100, 2))
+    assert processed_updates.index((200, 3)) < processed_updates.index((100, 2))
+    assert bot_manager.dispatcher.stats()["processed"] >= 3
+
+
+async def test_telegram_webhook_rejects_invalid_updates(
+    client_test: AsyncClient,
+    processed_updates
+):
+    """Test malformed updates and unknown bots are rejected"""
+    response = await client_test.post(
+        f"api/v1/bots/telegram/webhook/{TOKEN}", json={"message": {}}
+    )
+    assert response.status_code == 400
+
+    response = await client_test.post(
+        "api/v1/bots/telegram/webhook/unknown", json=chat_update(1, 100)
+    )
+    assert response.status_code == 404
+
+
+async def test_telegram_bot_replies_asynchronously(
+    client_test: AsyncClient,
+    monkeypatch
+):
+    """Test messages are answered through the async Telegram client"""
+    telegram_calls = []
+
+    async def process_request(token, url, method="get", params=None, **kwargs):
+        telegram_calls.append((url, params))
+        return await telegram_request(token, url, method, params, **kwargs)
+
+    async def reply(self, chat_id, user_message):
+        return {"reply": f"Echo: {user_message}", "user_agent": None, "bot_id": None}
+
+    monkeypatch.setattr(asyncio_helper, "_process_request", process_request)
+    monkeypatch.setattr(TelegramAgentBot, "reply", reply)
+    monkeypatch.setattr(bot_module, "agent_memory_update", lambda *args: None)
+    monkeypatch.setitem(bot_manager.bot_configs, TOKEN, {})
+    monkeypatch.setitem(
+        bot_manager.bot_registry,
+        TOKEN,
+        TelegramAgentBot(
+            TOKEN, "Test bot", [], [], [], "sk-test", "deepseek", "deepseek-chat"
+        )
+    )
+
+    response = await client_test.post(
+        f"api/v1/bots/telegram/webhook/{TOKEN}", json=chat_update(1, 100)
+    )
+    assert response.status_code == 200
+    await bot_manager.dispatcher.join()
+
+    assert [url for url, _ in telegram_calls] == ["sendChatAction", "sendMessage"]
+    assert telegram_calls[1][1]["text"] == "Echo: Message 1"
+
+
+@pytest.fixture
+def message_bot(monkeypatch):
+    """
+    Registers a bot answering "Hi!" to every message, with its registry
+    and users collections counting the queries made
+    """
+    registry = CountingCollection("bot_registry")
+    users = CountingCollection("bot_users")
+    bot_id = registry.collection.insert_one({"token": TOKEN}).inserted_id
+
+    def run(self, user_input):
+        self.memory.add_message("user", user_input)
+        response = BaseAgentOutputSchema(chat_message="Hi!")
+        self.memory.add_message("assistant", response)
+        return response
+
+    monkeypatch.setattr(asyncio_helper, "_process_request", telegram_request)
+    monkeypatch.setattr(ChatbotAgent, "run", run)
+    monkeypatch.setattr(bot_manager, "collection", registry)
+    monkeypatch.setattr(bot_module, "bot_users_collection", users)
+    monkeypatch.setattr(response_module, "bot_users_collection", users)
+    monkeypatch.setattr(chat_memory_cache, "collection", users)
+    monkeypatch.setitem(bot_manager.bot_configs, TOKEN, {"bot_id": bot_id})
+    monkeypatch.setitem(
+        bot_manager.bot_registry,
+        TOKEN,
+        TelegramAgentBot(
+            TOKEN, "Test bot", [], [], [], "sk-test", "openai", "gpt-4o-mini",
+            bot_id=bot_id
+        )
+    )
+    return registry, users, bot_id
+
+
+async def test_telegram_message_skips_bot_registry(
+    client_test: AsyncClient,
+    message_bot
+):
+    """Test messages of active chats make no registry nor bot_users queries"""
+    registry, users, bot_id = message_bot
+
+    for update_id in (1, 2, 3):
+        users.calls.clear()
+        response = await client_test.post(
+            f"api/v1/bots/telegram/webhook/{TOKEN}",
+            json=chat_update(update_id, 100)
+        )
+        assert response.status_code == 200
+        await bot_manager.dispatcher.join()
+        if update_id == 1:
+            # The chat is registered and its memory loaded once
+            assert users.calls["find_one_and_update"] == 1
+            assert users.calls["find_one"] == 1
+        else:
+            # Memories are written behind, in bulk
+            assert set(users.calls) <= {"bulk_write"}
+
+    assert sum(registry.calls.values()) == 0
+    await asyncio.to_thread(chat_memory_cache.flush)
+    user = users.collection.find_one({"bot_id": bot_id, "telegram_user_id": 100})
+    assert user["encryption_key"] is not None
+    assert user["bot_memory"] is not None
+
+
+async def test_telegram_chats_share_bot_agent(
+    client_test: AsyncClient,
+    message_bot,
+    monkeypatch
+):
+    """Test the bot's agent is built once and each chat keeps its own memory"""
+    _, _, bot_id = message_bot
+    builds = []
+    init = ChatbotAgent.__init__
+
+    def counting_init(self, *args, **kwargs):
+        builds.append(self)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(ChatbotAgent, "__init__", counting_init)
+
+    updates = [chat_update(1, 100), chat_update(2, 200), chat_update(3, 100)]
+    for update in updates:
+        response = await client_test.post(
+            f"api/v1/bots/telegram/webhook/{TOKEN}", json=update
+        )
+        assert response.status_code == 200
+    await bot_manager.dispatcher.join()
+
+    assert len(builds) == 1
+    await asyncio.to_thread(chat_memory_cache.flush)
+    chat_memory_cache.clear()
+    chat_messages = {100: ["Message 1", "Message 3"], 200: ["Message 2"]}
+    for chat_id, messages in chat_messages.items():
+        memory = json.loads(
+            response_module.retrieve_agent_memory(None, chat_id, bot_id).dump()
+        )
+        assert [
+            message["content"]["data"]["chat_message"]
+            for message in memory["history"]
+            if message["role"] == "user"
+        ] == messages
+
+
+async def test_telegram_post_replies_are_not_saved(
+    client_test: AsyncClient,
+    message_bot
+):
+    """Test /post replies don't end up in the chat's memory"""
+    _, users, bot_id = message_bot
+    post = chat_update(1, 100)
+    post["message"]["text"] = "/post"
+    for update in (post, chat_update(2, 100)):
+        response = await client_test.post(
+            f"api/v1/bots/telegram/webhook/{TOKEN}", json=update
+        )
+        assert response.status_code == 200
+    await bot_manager.dispatcher.join()
+
+    await asyncio.to_thread(chat_memory_cache.flush)
+    assert chat_memory_cache.get(bot_id, 100).memory.get_history() == []
+    user = users.collection.find_one({"bot_id": bot_id, "telegram_user_id": 100})
+    assert "bot_memory" not in user
+
+
+async def test_telegram_bot_survives_llm_client_eviction(
+    client_test: AsyncClient,
+    message_bot,
+    monkeypatch
+):
+    """Test the bot's agent keeps answering after its client is evicted"""
+    replies = []
+
+    async def process_request(token, url, method="get", params=None, **kwargs):
+        if url == "sendMessage":
+            replies.append(params["text"])
+        return await telegram_request(token, url, method, params, **kwargs)
+
+    def handle_request(self, request):
+        return httpx.Response(200, json={
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{
+                        "id": "call_test",
+                        "type": "function",
+                        "function": {
+                            "name": "BaseAgentOutputSchema",
+                            "arguments": '{"chat_message": "Hi!"}'
+                        }
+                    }]
+                }
+            }]
+        })
+
+    monkeypatch.setattr(asyncio_helper, "_process_request", process_request)
+    monkeypatch.setattr(ChatbotAgent, "run", BaseAgent.run)
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", handle_request)
+
+    for update_id in (1, 2):
+        response = await client_test.post(
+            f"api/v1/bots/telegram/webhook/{TOKEN}",
+            json=chat_update(update_id, 100)
+        )
+        assert response.status_code == 200
+        await bot_manager.dispatcher.join()
+        # Another client is requested once the bot's one has gone idle
+        monkeypatch.setattr(llm_client_registry, "idle_ttl", 0)
+        llm_client_registry.get_client(
+            None, "openai", "sk-other", async_client=False
+        )
+        monkeypatch.setattr(llm_client_registry, "idle_ttl", 900)
+
+    assert replies == ["Hi!", "Hi!"]
+    await asyncio.to_thread(chat_memory_cache.flush)
+
+
+async def test_chat_memory_cache_writes_behind():
+    """Test memories are flushed in bulk, on eviction and on stop"""
+    users = CountingCollection("bot_users")
+    cache = ChatMemoryCache(collection=users, max_size=1, flush_interval=60)
+    key = generate_user_encryption_key().decode()
+    for chat_id in (100, 200):
+        users.collection.insert_one(
+            {"bot_id": "bot", "telegram_user_id": chat_id, "encryption_key": key}
+        )
+    cache.start()
+
+    memories = {}
+    for chat_id in (100, 200):
+        memory = AgentMemory()
+        memory.add_message(
+            "user", BaseAgentInputSchema(chat_message=f"Hi from {chat_id}")
+        )
+        cache.put("bot", chat_id, memory, key)
+        memories[chat_id] = memory
+    assert users.calls["bulk_write"] == 0
+    assert cache.stats()["evictions"] == 1
+    # The evicted chat is served until its memory is written
+    assert cache.get("bot", 100).memory is memories[100]
+    assert users.calls["find_one"] == 0
+
+    await cache.stop()
+    assert users.calls["bulk_write"] == 1
+    assert cache.stats()["writes"] == 2
+    for chat_id in (100, 200):
+        record = users.collection.find_one(
+            {"bot_id": "bot", "telegram_user_id": chat_id}
+        )
+        stored = json.loads(decrypt_secret(key, record["bot_memory"]))
+        assert stored == memories[chat_id].dump()
+
+
+async def test_chat_memory_cache_retries_failed_batches(monkeypatch):
+    """Test memories without a key are rejected and failed writes retried"""
+    users = CountingCollection("bot_users")
+    cache = ChatMemoryCache(collection=users, flush_interval=60)
+    key = generate_user_encryption_key().decode()
+    memory = AgentMemory()
+    memory.add_message("user", BaseAgentInputSchema(chat_message="Hi"))
+
+    with pytest.raises(ValueError):
+        cache.put("bot", 100, memory, None)
+
+    def encrypt_failure(key, secret):
+        raise TypeError("Encryption failed")
+
+    monkeypatch.setattr(memory_cache, "encrypt_secret", encrypt_failure)
+    cache.start()
+    cache.put("bot", 100, memory, key)
+    assert await asyncio.to_thread(cache.flush) == 0
+    assert cache.stats()["dirty"] == 1
+    assert cache.stats()["failed_writes"] == 1
+
+    monkeypatch.undo()
+    await cache.stop()
+    assert cache.stats()["writes"] == 1
+    record = users.collection.find_one({"bot_id": "bot", "telegram_user_id": 100})
+    assert json.loads(decrypt_secret(key, record["bot_memory"])) == memory.dump()
@@ -1,6 +1,13 @@
 import pytest
 from httpx import AsyncClient
 
+from api.server import app
+from api.auth import auth_manager
+from api.models import APIKey, User
+from api.models.api_key import hash_api_key
+from database.database import update_user_data
+from database.api_key_cache import api_key_cache
+
 import logging
 
 
@@ -26,3 +33,106 @@ async def test_retrieve_self_user(
     assert response.status_code == 200
     msg = response.json()
     assert "email" in msg and msg["email"] == sample_user.email
+
+
+async def test_retrieve_self_user_with_cached_api_key(
+    client_test: AsyncClient,
+    sample_user,
+    monkeypatch
+):
+    lookups = []
+
+    async def retrieve_user_by_api_key(api_key):
+        lookups.append(api_key)
+        return sample_user if api_key == "sk-cached-key" else None
+
+    monkeypatch.setattr(
+        auth_manager,
+        "retrieve_user_by_api_key",
+        retrieve_user_by_api_key
+    )
+    headers = {"X-API-Key": "sk-cached-key"}
+
+    for _ in range(3):
+        response = await client_test.get("/api/v1/users/self", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["email"] == sample_user.email
+
+    # Only the first request looked the key up
+    assert lookups == ["sk-cached-key"]
+
+    # Updating the user invalidates its cached keys
+    await update_user_data(sample_user.id, {"llm_api_keys": {}})
+    response = await client_test.get("/api/v1/users/self", headers=headers)
+    assert response.status_code == 200
+    assert len(lookups) == 2
+
+
+async def test_invalid_api_key_is_negatively_cached(
+    client_test: AsyncClient,
+    db_queries
+):
+    headers = {"X-API-Key": "sk-invalid-key"}
+
+    response = await client_test.get("/api/v1/users/self", headers=headers)
+    assert response.status_code == 401
+
+    db_queries.clear()
+    response = await client_test.get("/api/v1/users/self", headers=headers)
+    assert response.status_code == 401
+    assert db_queries == []
+    assert api_key_cache.stats()["negative_hits"] >= 1
+
+
+async def test_create_user_api_key_authenticates(
+    client_test: AsyncClient,
+    override_dependencies
+):
+    response = await client_test.post(
+        "/api/v1/users/create",
+        json={"email": "new@example.com", "llm_api_keys": {}}
+    )
+    assert response.status_code == 200
+    api_key = response.json()["apiKey"]
+
+    # Raw keys are never stored
+    stored_keys = await APIKey.find_all().to_list()
+    assert len(stored_keys) == 1
+    assert stored_keys[0].key is None
+    assert stored_keys[0].key_hash == hash_api_key(api_key)
+
+    # Authenticate with the new key instead of the overridden user
+    app.dependency_overrides = {}
+    response = await client_test.get(
+        "/api/v1/users/self",
+        headers={"X-API-Key": api_key}
+    )
+    assert response.status_code == 200
+    assert response.json()["email"] == "new@example.com"
+
+
+async def test_cached_api_key_reads_the_current_user(
+    client_test: AsyncClient,
+    sample_user
+):
+    api_key = "sk-cached-key"
+    await APIKey.from_raw_key(api_key, sample_user.id).create()
+    headers = {"X-API-Key": api_key}
+
+    response = await client_test.get("/api/v1/users/self", headers=headers)
+    assert response.status_code == 200
+    assert api_key_cache.lookup(api_key) == (True, sample_user.id)
+
+    # Changes made by another worker don't invalidate this worker's cache
+    users = User.get_motor_collection()
+    await users.update_one(
+        {"_id": sample_user.id},
+        {"$set": {"email": "changed@example.com"}}
+    )
+    response = await client_test.get("/api/v1/users/self", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["email"] == "changed@example.com"
+
+    await users.delete_one({"_id": sample_user.id})
+    response = await client_test.get("/api/v1/users/self", headers=headers)
+    assert response.status_code == 401
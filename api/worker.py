@@ -0,0 +1,270 @@
+import os
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from api.models import (
+    LLMConfig,
+    Agent,
+    User,
+    APIKey,
+    AgentJob,
+    AgentResponse
+)
+from api.routes.agents import AgentRunRequest
+from api.routes.jobs import BrowserUseJobRequest
+from config import init_db, close_db_connection
+from database.database import retrieve_agent_run_context
+from database.job_queue import (
+    AGENT_JOB_VISIBILITY_TIMEOUT,
+    claim_job,
+    complete_job,
+    extend_job_lease,
+    fail_job
+)
+from database.llm_config_catalog import llm_config_catalog
+from database.llm_rate_limit_store import (
+    LLM_RATE_LIMIT_SHARED,
+    MongoRateLimitStore
+)
+from imaginary_agents.llm.client_registry import llm_client_registry
+from imaginary_agents.llm.rate_limiter import llm_rate_limiter
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AGENT_JOB_WORKER_PROCESSES = int(os.getenv("AGENT_JOB_WORKER_PROCESSES", 2))
+# Jobs run concurrently by each worker process
+AGENT_JOB_WORKER_CONCURRENCY = int(os.getenv("AGENT_JOB_WORKER_CONCURRENCY", 4))
+# Seconds an idle worker waits before looking for jobs again
+AGENT_JOB_IDLE_INTERVAL = float(os.getenv("AGENT_JOB_IDLE_INTERVAL", 1))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PermanentJobError(Exception):
+    """Job error that retrying won't fix (e.g., invalid input)"""
+
+
+async def run_agent_job(job: AgentJob) -> Dict[str, Any]:
+    request = AgentRunRequest(**job.payload)
+    agent, llm_config = await retrieve_agent_run_context(request.id)
+    if not agent:
+        raise PermanentJobError("Agent not found")
+    if not llm_config:
+        raise PermanentJobError(
+            f"LLM config not found for model '{agent.llm_model}'"
+        )
+    user = await User.get(job.user_id)
+    if not user or llm_config.provider not in user.llm_api_keys:
+        raise PermanentJobError(
+            f"No LLM API key for provider '{llm_config.provider}'"
+        )
+    try:
+        return await agent.run(
+            llm_api_key=user.llm_api_keys[llm_config.provider],
+            input_message=request.input_message,
+            input_fields=request.input_fields,
+            llm_config=llm_config,
+        )
+    except ValueError as e:
+        raise PermanentJobError(str(e))
+
+
+async def run_browser_use_job(job: AgentJob) -> Dict[str, Any]:
+    # Imported here so workers only load browser-use when they need it
+    from api.routes.browser_use import ToolRunRequest, build_browser_use_tool
+    from imaginary_agents.tools.browser_use_tool import BrowserUseTool
+
+    request = BrowserUseJobRequest(**job.payload)
+    user = await User.get(job.user_id)
+    if not user or request.llm_provider not in user.llm_api_keys:
+        raise PermanentJobError(
+            f"No LLM API key for provider '{request.llm_provider}'"
+        )
+    config = ToolRunRequest(
+        **request.model_dump(),
+        llm_api_key=user.llm_api_keys[request.llm_provider]
+    )
+    # The tool blocks for the whole browser session
+    browser_use_tool = await asyncio.to_thread(build_browser_use_tool, config)
+    response = await asyncio.to_thread(
+        browser_use_tool.run,
+        BrowserUseTool.input_schema(task=request.task)
+    )
+    return response.model_dump()
+
+
+JOB_HANDLERS: Dict[str, Callable[[AgentJob], Awaitable[Any]]] = {
+    "agent_run": run_agent_job,
+    "browser_use": run_browser_use_job,
+}
+
+
+class JobWorker:
+    """
+    Claims jobs from the agent_jobs collection and runs up to concurrency
+    of them at a time. Running jobs are kept invisible to other workers by
+    a lease that is renewed while they run; if the worker dies the lease
+    expires and another worker claims the job again.
+    """
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        concurrency: int = AGENT_JOB_WORKER_CONCURRENCY,
+        visibility_timeout: float = AGENT_JOB_VISIBILITY_TIMEOUT,
+        idle_interval: float = AGENT_JOB_IDLE_INTERVAL
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.idle_interval = idle_interval
+        self._stopping = asyncio.Event()
+
+    async def process_next_job(self) -> Optional[AgentJob]:
+        """Claims and runs a single job, returns None if there was none"""
+        job = await claim_job(self.worker_id, self.visibility_timeout)
+        if job is None:
+            return None
+
+        if job.attempts > job.max_attempts:
+            # A worker died holding the job on its last attempt
+            await fail_job(job, job.error or "Job lease expired", retry=False)
+            return job
+
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            await fail_job(job, f"Unknown job kind '{job.kind}'", retry=False)
+            return job
+
+        logger.info(f"Running job {job.id} ({job.kind}), attempt {job.attempts}")
+        run = asyncio.create_task(handler(job))
+        heartbeat = asyncio.create_task(self._heartbeat(job, run))
+        try:
+            result = await run
+        except asyncio.CancelledError:
+            if self._stopping.is_set() or not heartbeat.done():
+                raise
+            logger.warning(f"Lost the lease of job {job.id}, dropped its run")
+            return job
+        except PermanentJobError as e:
+            await fail_job(job, str(e), retry=False)
+            return job
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            await fail_job(job, str(e))
+            return job
+        finally:
+            heartbeat.cancel()
+
+        if not await complete_job(job, result):
+            logger.warning(f"Lost the lease of job {job.id} before completing")
+        return job
+
+    async def _heartbeat(self, job: AgentJob, run: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            if not await extend_job_lease(job, self.visibility_timeout):
+                # Another worker took over the job
+                run.cancel()
+                return
+
+    async def _work(self):
+        while not self._stopping.is_set():
+            try:
+                job = await self.process_next_job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error processing jobs: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(
+                        self._stopping.wait(), self.idle_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run(self):
+        logger.info(
+            f"Worker {self.worker_id} processing up to "
+            f"{self.concurrency} jobs at a time"
+        )
+        await asyncio.gather(*[self._work() for _ in range(self.concurrency)])
+
+    def stop(self):
+        """Stops claiming new jobs, running jobs are finished"""
+        self._stopping.set()
+
+
+async def serve(concurrency: int = AGENT_JOB_WORKER_CONCURRENCY):
+    await init_db(
+        [LLMConfig, Agent, User, APIKey, AgentJob, AgentResponse]
+    )
+    await llm_config_catalog.load()
+    llm_config_catalog.start()
+    if LLM_RATE_LIMIT_SHARED:
+        llm_rate_limiter.store = MongoRateLimitStore()
+    worker = JobWorker(concurrency=concurrency)
+    # Finish the running jobs on shutdown instead of dropping them
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, worker.stop)
+        except NotImplementedError:
+            # Signal handlers aren't supported by the Windows event loop
+            pass
+    try:
+        await worker.run()
+    finally:
+        await llm_config_catalog.stop()
+        await close_db_connection()
+        await llm_client_registry.aclose()
+
+
+def _serve_process(concurrency: int):
+    try:
+        asyncio.run(serve(concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    # Set up argument parser
+    parser = argparse.ArgumentParser(description='Run the agent job workers')
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=AGENT_JOB_WORKER_PROCESSES,
+        help='Number of worker processes'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=AGENT_JOB_WORKER_CONCURRENCY,
+        help='Jobs run concurrently by each process'
+    )
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    processes = [
+        multiprocessing.Process(target=_serve_process, args=(args.concurrency,))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
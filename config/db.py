@@ -1,11 +1,50 @@
 import os
-from typing import Optional, List, Type
+import logging
+from typing import Optional, List, Type, Dict, Any, Tuple
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie, Document
+from beanie.odm.settings.document import IndexModelField
+from pymongo import IndexModel, ASCENDING
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Indexes of the collections that aren't Beanie documents
+# (Beanie documents declare theirs in Settings.indexes)
+RAW_COLLECTION_INDEXES: Dict[str, List[IndexModel]] = {
+    "bot_registry": [
+        IndexModel([("token", ASCENDING)], unique=True, name="token_unique"),
+        IndexModel([("agent_id", ASCENDING)], name="agent_id"),
+    ],
+    "bot_users": [
+        IndexModel(
+            [("bot_id", ASCENDING), ("telegram_user_id", ASCENDING)],
+            unique=True,
+            name="bot_id_telegram_user_id_unique"
+        ),
+    ],
+    "llm_rate_windows": [
+        IndexModel(
+            [("expires_at", ASCENDING)],
+            expireAfterSeconds=0,
+            name="expires_at_ttl"
+        ),
+    ],
+}
+
+# Query shapes run on hot paths, checked for collection scans on startup
+HOT_QUERY_SHAPES: List[Tuple[str, Dict[str, Any]]] = [
+    ("users", {"email": ""}),
+    ("api_keys", {"key_hash": ""}),
+    ("llm_configs", {"model": ""}),
+    ("bot_registry", {"token": ""}),
+    ("bot_registry", {"agent_id": ""}),
+    ("bot_users", {"bot_id": None, "telegram_user_id": 0}),
+]
+
 # Global client and database references
 _client: Optional[AsyncIOMotorClient] = None
 _db = None
@@ -48,11 +87,101 @@ async def init_db(document_models: Optional[List[Type[Document]]] = None):
     _db = client['imaginary_agents_api']
 
     if document_models:
-        await init_beanie(database=_db, document_models=document_models)
+        # The indexes declared by each document are created separately, so
+        # one that can't be built doesn't stop startup
+        await init_beanie(
+            database=_db, document_models=document_models, skip_indexes=True
+        )
+        await ensure_document_indexes(document_models)
+
+    await ensure_indexes(_db)
+    await report_collection_scans(_db)
 
     return _db
 
 
+async def ensure_indexes(db):
+    """
+    Create the indexes of collections that aren't Beanie documents
+
+    Args:
+        db: The Motor MongoDB database
+    """
+    for collection_name, indexes in RAW_COLLECTION_INDEXES.items():
+        try:
+            await db[collection_name].create_indexes(indexes)
+        except Exception as e:
+            logger.error(
+                f"Failed to create indexes on {collection_name}: {e}"
+            )
+
+
+async def ensure_document_indexes(document_models: List[Type[Document]]):
+    """
+    Create the indexes declared in the Settings of Beanie documents.
+    Failures (e.g. duplicates under a unique index) are logged.
+
+    Args:
+        document_models: Beanie document models initialized with skip_indexes
+    """
+    for document_model in document_models:
+        indexes = document_model.get_settings().indexes
+        if not indexes:
+            continue
+        try:
+            await document_model.get_motor_collection().create_indexes(
+                IndexModelField.list_to_index_model(indexes)
+            )
+        except Exception as e:
+            logger.error(
+                f"Failed to create indexes on "
+                f"{document_model.get_collection_name()}: {e}"
+            )
+
+
+def _has_collection_scan(plan: Dict[str, Any]) -> bool:
+    if plan.get("stage") == "COLLSCAN":
+        return True
+    children = plan.get("inputStages") or []
+    if "inputStage" in plan:
+        children = children + [plan["inputStage"]]
+    return any(_has_collection_scan(child) for child in children)
+
+
+async def report_collection_scans(db) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Explain every hot query shape and report those still resolved
+    with a collection scan
+
+    Args:
+        db: The Motor MongoDB database
+
+    Returns:
+        List of (collection name, filter) that need a collection scan
+    """
+    collection_scans = []
+    for collection_name, query_filter in HOT_QUERY_SHAPES:
+        try:
+            explanation = await db.command(
+                "explain",
+                {"find": collection_name, "filter": query_filter},
+                verbosity="queryPlanner"
+            )
+        except Exception as e:
+            logger.debug(f"Could not explain queries on {collection_name}: {e}")
+            continue
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        if _has_collection_scan(winning_plan):
+            collection_scans.append((collection_name, query_filter))
+            logger.warning(
+                f"Query on {collection_name} with fields "
+                f"{list(query_filter)} uses a collection scan"
+            )
+    if not collection_scans:
+        logger.info("No collection scans found on hot query shapes")
+    return collection_scans
+
+
 async def close_db_connection():
     """Close the MongoDB connection"""
     global _client
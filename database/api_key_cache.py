@@ -0,0 +1,81 @@
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from beanie import PydanticObjectId
+
+from api.models.user import User
+from api.models.api_key import hash_api_key
+from imaginary_agents.helpers.ttl_cache import TTLCache
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+API_KEY_CACHE_MAX_SIZE = int(os.getenv("API_KEY_CACHE_MAX_SIZE", 10000))
+# Keys removed from MongoDB by another worker stop authenticating after this
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", 60))
+API_KEY_NEGATIVE_CACHE_TTL = float(os.getenv("API_KEY_NEGATIVE_CACHE_TTL", 60))
+
+# Cached value of API keys that don't belong to any user
+_INVALID = None
+_MISSING = object()
+
+
+class APIKeyCache:
+    """
+    Bounded TTL cache of api-key -> user id, keyed by the hash of the key.
+
+    Only the id of the owner is cached: the user itself is read on every
+    request, so changes made by other workers (including deleting the
+    user) are seen right away. Invalid keys are cached too (negative
+    caching) for a shorter time, so repeated requests with unknown keys
+    don't reach MongoDB.
+    """
+
+    def __init__(
+        self,
+        max_size: int = API_KEY_CACHE_MAX_SIZE,
+        ttl: float = API_KEY_CACHE_TTL,
+        negative_ttl: float = API_KEY_NEGATIVE_CACHE_TTL
+    ):
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.negative_hits = 0
+
+    def lookup(self, api_key: str) -> Tuple[bool, Optional[PydanticObjectId]]:
+        """
+        Returns (found, user_id). found is False on a cache miss; a found
+        None user_id means the key is known to be invalid.
+        """
+        user_id = self._cache.get(hash_api_key(api_key), _MISSING)
+        if user_id is _MISSING:
+            return False, None
+        if user_id is _INVALID:
+            self.negative_hits += 1
+        return True, user_id
+
+    def store(self, api_key: str, user: Optional[User]):
+        if user is None:
+            self._cache.set(hash_api_key(api_key), _INVALID, self.negative_ttl)
+        else:
+            self._cache.set(hash_api_key(api_key), user.id)
+
+    def invalidate_key_hash(self, key_hash: str):
+        self._cache.pop(key_hash)
+
+    def invalidate_user(self, user_id) -> int:
+        """Drops every cached key of the given user"""
+        return self._cache.invalidate(
+            lambda _, cached_id: (
+                cached_id is not _INVALID and str(cached_id) == str(user_id)
+            )
+        )
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "negative_hits": self.negative_hits}
+
+
+api_key_cache = APIKeyCache()
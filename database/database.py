@@ -1,7 +1,13 @@
+from datetime import datetime
 from beanie import PydanticObjectId
-from typing import List, Union
+from bson import DBRef
+from typing import List, Union, Optional, Tuple
 
 from api.models import LLMConfig, Agent, User, APIKey
+from api.models.api_key import hash_api_key
+from database.llm_config_catalog import llm_config_catalog
+from database.api_key_cache import api_key_cache
+from database.response_cache import response_cache
 
 llm_config_collection = LLMConfig
 
@@ -17,6 +23,7 @@ async def retrieve_llm_configs() -> List[LLMConfig]:
 
 async def add_llm_config(new_llm_config: LLMConfig) -> LLMConfig:
     llm_config = await new_llm_config.create()
+    llm_config_catalog.put(llm_config)
     return llm_config
 
 
@@ -27,8 +34,13 @@ async def retrieve_llm_config(id: PydanticObjectId) -> LLMConfig:
 
 
 async def retrieve_llm_config_by_model(model: str) -> LLMConfig:
+    llm_config = llm_config_catalog.get(model)
+    if llm_config:
+        return llm_config
+    # Not in the catalog yet, e.g. created by another worker
     llm_config = await llm_config_collection.find_one(LLMConfig.model == model)
     if llm_config:
+        llm_config_catalog.put(llm_config)
         return llm_config
 
 
@@ -36,6 +48,7 @@ async def delete_llm_config(id: PydanticObjectId) -> bool:
     llm_config = await llm_config_collection.get(id)
     if llm_config:
         await llm_config.delete()
+        llm_config_catalog.remove(llm_config)
         return True
 
 
@@ -47,7 +60,9 @@ async def update_llm_config_data(
     update_query = {"$set": {field: value for field, value in des_body.items()}}
     llm_config = await llm_config_collection.get(id)
     if llm_config:
+        llm_config_catalog.remove(llm_config)
         await llm_config.update(update_query)
+        llm_config_catalog.put(llm_config)
         return llm_config
     return False
 
@@ -66,6 +81,43 @@ async def retrieve_agent(id: PydanticObjectId) -> Agent:
     return agent
 
 
+async def update_agent_data(
+    id: PydanticObjectId,
+    data: dict
+) -> Union[bool, Agent]:
+    des_body = {k: v for k, v in data.items() if v is not None}
+    update_query = {
+        "$set": {
+            **{field: value for field, value in des_body.items()},
+            "updated_at": datetime.utcnow()
+        },
+        # Version bump invalidates cached runtimes on every worker
+        "$inc": {"version": 1}
+    }
+    agent = await Agent.get(id)
+    if agent:
+        await agent.update(update_query)
+        Agent.invalidate_runtime(id)
+        response_cache.invalidate_agent(id)
+        return agent
+    return False
+
+
+async def retrieve_agent_run_context(
+    id: PydanticObjectId
+) -> Tuple[Optional[Agent], Optional[LLMConfig]]:
+    """
+    Retrieves an Agent together with the LLMConfig of its model.
+    The LLMConfig comes from the in-memory catalog, so this is a single
+    round-trip unless the config is missing from the catalog
+    """
+    agent = await Agent.get(id)
+    if not agent:
+        return None, None
+    llm_config = await retrieve_llm_config_by_model(model=agent.llm_model)
+    return agent, llm_config
+
+
 async def retrieve_agent_available_tools(id: PydanticObjectId) -> List[str]:
     agent = await Agent.get(id)
     if agent:
@@ -79,6 +131,15 @@ async def retrieve_agent_available_tools(id: PydanticObjectId) -> List[str]:
 
 async def add_user(new_user: User) -> User:
     user = await new_user.create()
+    # Its keys may have been cached as invalid before the user existed
+    for api_key in user.api_keys:
+        if isinstance(api_key, APIKey) and api_key.key_hash:
+            api_key_cache.invalidate_key_hash(api_key.key_hash)
+    return user
+
+
+async def retrieve_user(id: PydanticObjectId) -> User:
+    user = await User.get(id)
     return user
 
 
@@ -88,10 +149,13 @@ async def retrieve_user_by_email(email: str) -> User:
 
 
 async def retrieve_user_by_api_key(api_key: str) -> User:
-    user = await User.find(
-        User.api_keys.key == api_key,
-        fetch_links=True
-    ).first_or_none()
+    # Indexed point read on the key hash, then fetch the owner by _id
+    api_key_doc = await APIKey.find_one(
+        APIKey.key_hash == hash_api_key(api_key)
+    )
+    if not api_key_doc or not api_key_doc.user_id:
+        return None
+    user = await User.get(api_key_doc.user_id)
     return user
 
 
@@ -105,14 +169,28 @@ async def update_user_data(
     user = await User.get(id)
     if user:
         await user.update(update_query)
+        api_key_cache.invalidate_user(id)
         return user
     return False
 
 
+async def add_agent_to_user(user_id: PydanticObjectId, agent: Agent) -> bool:
+    """
+    Links an agent to a user with an atomic $push, so agents linked at the
+    same time by other workers are kept
+    """
+    result = await User.get_motor_collection().update_one(
+        {"_id": user_id},
+        {"$push": {"agents": DBRef(Agent.get_collection_name(), agent.id)}}
+    )
+    return result.modified_count == 1
+
+
 async def delete_user(id: PydanticObjectId) -> bool:
     user = await User.get(id)
     if user:
         await user.delete()
+        api_key_cache.invalidate_user(id)
         return True
     return False
 
@@ -124,4 +202,5 @@ async def delete_user(id: PydanticObjectId) -> bool:
 
 async def add_api_key(new_api_key: APIKey) -> APIKey:
     api_key = await new_api_key.create()
+    api_key_cache.invalidate_key_hash(api_key.key_hash)
     return api_key
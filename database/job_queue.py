@@ -0,0 +1,146 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+
+from api.models.agent_job import AgentJob, JobStatus
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Seconds a claimed job stays invisible to other workers without a heartbeat
+AGENT_JOB_VISIBILITY_TIMEOUT = float(
+    os.getenv("AGENT_JOB_VISIBILITY_TIMEOUT", 120)
+)
+AGENT_JOB_MAX_ATTEMPTS = int(os.getenv("AGENT_JOB_MAX_ATTEMPTS", 3))
+# Base delay of the exponential backoff between attempts, in seconds
+AGENT_JOB_RETRY_DELAY = float(os.getenv("AGENT_JOB_RETRY_DELAY", 5))
+
+
+async def enqueue_job(
+    kind: str,
+    payload: Dict[str, Any],
+    user_id: Optional[PydanticObjectId] = None,
+    max_attempts: int = AGENT_JOB_MAX_ATTEMPTS
+) -> AgentJob:
+    job = AgentJob(
+        kind=kind,
+        payload=payload,
+        user_id=user_id,
+        max_attempts=max_attempts
+    )
+    return await job.create()
+
+
+async def retrieve_job(id: PydanticObjectId) -> Optional[AgentJob]:
+    return await AgentJob.get(id)
+
+
+async def claim_job(
+    worker_id: str,
+    visibility_timeout: float = AGENT_JOB_VISIBILITY_TIMEOUT
+) -> Optional[AgentJob]:
+    """
+    Atomically claims the oldest available job: queued jobs whose retry
+    delay is over, and running jobs whose worker let the lease expire
+
+    Args:
+        worker_id: Identifier of the claiming worker
+        visibility_timeout: Seconds the job is leased to the worker
+
+    Returns:
+        The claimed job, or None if the queue is empty
+    """
+    now = datetime.now(timezone.utc)
+    document = await AgentJob.get_motor_collection().find_one_and_update(
+        {
+            "$or": [
+                {"status": JobStatus.QUEUED, "available_at": {"$lte": now}},
+                {"status": JobStatus.RUNNING, "locked_until": {"$lt": now}},
+            ]
+        },
+        {
+            "$set": {
+                "status": JobStatus.RUNNING,
+                "worker_id": worker_id,
+                "started_at": now,
+                "locked_until": now + timedelta(seconds=visibility_timeout),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+    if document is None:
+        return None
+    return AgentJob.model_validate(document)
+
+
+def _lease_filter(job: AgentJob) -> Dict[str, Any]:
+    # Only the worker holding the current lease may update the job
+    return {
+        "_id": job.id,
+        "status": JobStatus.RUNNING,
+        "worker_id": job.worker_id,
+        "attempts": job.attempts,
+    }
+
+
+async def extend_job_lease(
+    job: AgentJob,
+    visibility_timeout: float = AGENT_JOB_VISIBILITY_TIMEOUT
+) -> bool:
+    """Heartbeat of a running job, returns False if the lease was lost"""
+    locked_until = datetime.now(timezone.utc) + timedelta(seconds=visibility_timeout)
+    result = await AgentJob.get_motor_collection().update_one(
+        _lease_filter(job),
+        {"$set": {"locked_until": locked_until}}
+    )
+    return result.modified_count == 1
+
+
+async def complete_job(job: AgentJob, result: Any) -> bool:
+    result = await AgentJob.get_motor_collection().update_one(
+        _lease_filter(job),
+        {
+            "$set": {
+                "status": JobStatus.SUCCEEDED,
+                "result": result,
+                "error": None,
+                "finished_at": datetime.now(timezone.utc),
+                "locked_until": None,
+            }
+        }
+    )
+    return result.modified_count == 1
+
+
+async def fail_job(job: AgentJob, error: str, retry: bool = True) -> bool:
+    """
+    Records a failed attempt. The job is queued again after an exponential
+    backoff while it has attempts left, otherwise it is marked as failed
+    """
+    now = datetime.now(timezone.utc)
+    if retry and job.attempts < job.max_attempts:
+        delay = AGENT_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        update = {
+            "status": JobStatus.QUEUED,
+            "error": error,
+            "available_at": now + timedelta(seconds=delay),
+            "locked_until": None,
+        }
+    else:
+        update = {
+            "status": JobStatus.FAILED,
+            "error": error,
+            "finished_at": now,
+            "locked_until": None,
+        }
+    result = await AgentJob.get_motor_collection().update_one(
+        _lease_filter(job),
+        {"$set": update}
+    )
+    return result.modified_count == 1
@@ -0,0 +1,133 @@
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from api.models import LLMConfig
+from imaginary_agents.llm.endpoints import llm_endpoint_pool
+from imaginary_agents.llm.rate_limiter import RateLimits, llm_rate_limiter
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LLM_CONFIG_CATALOG_REFRESH_INTERVAL = float(
+    os.getenv("LLM_CONFIG_CATALOG_REFRESH_INTERVAL", 60)
+)
+
+
+class LLMConfigCatalog:
+    """
+    In-process catalog of LLMConfig documents indexed by model name.
+
+    The catalog is loaded at startup and updated by every LLMConfig write
+    made through database.database. Writes made by other workers are picked
+    up from a MongoDB change stream, or by polling every refresh_interval
+    seconds when change streams aren't available (e.g. standalone servers).
+    The rate limits and mirrors of the configs are applied to the
+    llm_rate_limiter and the llm_endpoint_pool.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = LLM_CONFIG_CATALOG_REFRESH_INTERVAL
+    ):
+        self.refresh_interval = refresh_interval
+        self._configs: Dict[str, LLMConfig] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+
+    async def load(self):
+        """(Re)loads every LLMConfig from the database"""
+        configs = await LLMConfig.find_all().to_list()
+        for config in self._configs.values():
+            self._unconfigure(config)
+        self._configs = {config.model: config for config in configs}
+        for config in configs:
+            self._configure(config)
+        self.loaded = True
+        logger.info(f"Loaded {len(configs)} LLM configs into the catalog")
+
+    def get(self, model: str) -> Optional[LLMConfig]:
+        return self._configs.get(model)
+
+    def all(self) -> List[LLMConfig]:
+        return list(self._configs.values())
+
+    def put(self, llm_config: LLMConfig):
+        self._configs[llm_config.model] = llm_config
+        self._configure(llm_config)
+
+    def remove(self, llm_config: LLMConfig):
+        self._unconfigure(llm_config)
+        if self._configs.get(llm_config.model) is llm_config:
+            del self._configs[llm_config.model]
+        else:
+            self._configs = {
+                model: config for model, config in self._configs.items()
+                if config.id != llm_config.id
+            }
+
+    @staticmethod
+    def _configure(llm_config: LLMConfig):
+        llm_rate_limiter.configure(
+            llm_config.provider,
+            llm_config.model,
+            RateLimits(**llm_config.rate_limits.model_dump())
+        )
+        llm_endpoint_pool.configure(
+            llm_config.provider,
+            llm_config.model,
+            [llm_config.base_url, *llm_config.mirrors]
+        )
+
+    @staticmethod
+    def _unconfigure(llm_config: LLMConfig):
+        llm_rate_limiter.configure(llm_config.provider, llm_config.model, None)
+        llm_endpoint_pool.configure(llm_config.provider, llm_config.model, None)
+
+    def start(self):
+        """Starts refreshing the catalog in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_forever(self):
+        try:
+            await self._watch_changes()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(
+                f"LLM config change stream unavailable ({e}), "
+                f"polling every {self.refresh_interval}s instead"
+            )
+        await self._poll()
+
+    async def _watch_changes(self):
+        collection = LLMConfig.get_motor_collection()
+        async with collection.watch() as stream:
+            async for _ in stream:
+                await self.load()
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Failed to refresh LLM config catalog: {e}")
+
+
+llm_config_catalog = LLMConfigCatalog()
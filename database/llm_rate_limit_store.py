@@ -0,0 +1,82 @@
+import os
+import time
+from datetime import datetime, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config.db import get_database
+from imaginary_agents.llm.rate_limiter import RateLimits
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Whether workers share the LLM rate limits through MongoDB
+LLM_RATE_LIMIT_SHARED = os.getenv("LLM_RATE_LIMIT_SHARED", "false").lower() == "true"
+
+LLM_RATE_WINDOWS_COLLECTION = "llm_rate_windows"
+WINDOW_SECONDS = 60
+
+
+class MongoRateLimitStore:
+    """
+    Per-minute usage windows of each (provider, model), shared by every
+    worker through the llm_rate_windows collection. A reservation that
+    would exceed the window is rolled back and retried in the next window.
+    Window documents expire once they are over.
+    """
+
+    async def reserve(
+        self,
+        key: str,
+        requests: int,
+        tokens: int,
+        limits: RateLimits
+    ) -> float:
+        now = time.time()
+        window = int(now // WINDOW_SECONDS)
+        collection = (await get_database())[LLM_RATE_WINDOWS_COLLECTION]
+        window_filter = {"_id": f"{key}:{window}"}
+        usage = {"requests": requests, "tokens": tokens}
+        update = {
+            "$inc": usage,
+            "$setOnInsert": {
+                "expires_at": datetime.fromtimestamp(
+                    (window + 2) * WINDOW_SECONDS, timezone.utc
+                )
+            },
+        }
+        try:
+            used = await collection.find_one_and_update(
+                window_filter,
+                update,
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another worker opened the window at the same time
+            used = await collection.find_one_and_update(
+                window_filter,
+                update,
+                return_document=ReturnDocument.AFTER
+            )
+
+        over_requests = (
+            limits.requests_per_minute is not None
+            and used["requests"] > limits.requests_per_minute
+        )
+        # A request larger than the whole budget may run in an empty window
+        over_tokens = (
+            limits.tokens_per_minute is not None
+            and used["tokens"] > limits.tokens_per_minute
+            and used["tokens"] > tokens
+        )
+        if not over_requests and not over_tokens:
+            return 0.0
+
+        await collection.update_one(
+            window_filter,
+            {"$inc": {name: -value for name, value in usage.items()}}
+        )
+        return (window + 1) * WINDOW_SECONDS - now
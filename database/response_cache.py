@@ -0,0 +1,255 @@
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.models.agent_response import AgentResponse
+from imaginary_agents.helpers.ttl_cache import TTLCache
+from imaginary_agents.helpers.minhash import (
+    LSHIndex,
+    estimated_jaccard,
+    lsh_bands
+)
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", 2048))
+# Signatures kept in the in-process LSH index
+NEAR_DUPLICATE_INDEX_SIZE = int(os.getenv("NEAR_DUPLICATE_INDEX_SIZE", 10000))
+# Stored responses compared against an input on an in-process LSH miss
+NEAR_DUPLICATE_MAX_CANDIDATES = int(
+    os.getenv("NEAR_DUPLICATE_MAX_CANDIDATES", 20)
+)
+# Share of near-duplicate hits re-run against the LLM to measure false hits.
+# Each one costs an LLM call, so it's off by default: the verified and
+# false_hits stats stay at 0 unless this is set (e.g. 0.01)
+NEAR_DUPLICATE_SAMPLE_RATE = float(os.getenv("NEAR_DUPLICATE_SAMPLE_RATE", 0))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Cache of agent responses for agents with a cache policy.
+
+    Responses are stored in the agent_responses TTL collection, shared by
+    every worker, with a bounded in-process LRU in front of it. Keys carry
+    the agent config version, so edited agents never get stale responses.
+
+    Responses stored with a MinHash signature can also be found by
+    near-duplicate inputs: signatures are indexed by their LSH bands in
+    process and in the collection, scoped to the agent config version.
+    """
+
+    def __init__(
+        self,
+        max_size: int = RESPONSE_CACHE_MAX_SIZE,
+        index_size: int = NEAR_DUPLICATE_INDEX_SIZE
+    ):
+        self._cache = TTLCache(max_size=max_size)
+        self._lsh = LSHIndex(max_size=index_size)
+        self.hits = 0
+        self.local_hits = 0
+        self.misses = 0
+        self.near_hits = 0
+        self.near_misses = 0
+        self.near_verified = 0
+        self.near_false_hits = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        response = self._cache.get(key)
+        if response is not None:
+            self.hits += 1
+            self.local_hits += 1
+            return response
+
+        response = await self._get_stored(key)
+        if response is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return response
+
+    async def set(
+        self,
+        key: str,
+        agent_id: str,
+        version: int,
+        response: Dict[str, Any],
+        ttl: float,
+        scope: Optional[str] = None,
+        signature: Optional[List[int]] = None
+    ):
+        """
+        Stores a response. When a scope and the MinHash signature of the
+        input are given, near-duplicate inputs of that scope can find it.
+        """
+        self._cache.set(key, response, ttl=ttl)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        document = {
+            "agent_id": agent_id,
+            "version": version,
+            "response": response,
+            "created_at": datetime.now(timezone.utc),
+            "expires_at": expires_at,
+        }
+        if scope is not None and signature is not None:
+            bands = lsh_bands(signature, scope)
+            self._lsh.add(key, signature, bands)
+            document.update(scope=scope, signature=signature, lsh_bands=bands)
+        try:
+            await AgentResponse.get_motor_collection().update_one(
+                {"key": key},
+                {"$set": document},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to store cached response: {e}")
+
+    async def get_similar(
+        self,
+        scope: str,
+        signature: List[int],
+        threshold: float
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Looks up the response of the most similar input of the scope
+
+        Args:
+            scope: Agent id and config version the input belongs to
+            signature: MinHash signature of the input
+            threshold: Minimum estimated Jaccard similarity of the inputs
+
+        Returns:
+            The cached response and the similarity, or None
+        """
+        bands = lsh_bands(signature, scope)
+        match = await self._best_match(
+            self._lsh.query(bands), signature, threshold
+        )
+        if match is None:
+            match = await self._best_match(
+                await self._stored_candidates(scope, bands),
+                signature,
+                threshold
+            )
+        if match is None:
+            self.near_misses += 1
+            return None
+        self.near_hits += 1
+        return match
+
+    async def _best_match(
+        self,
+        candidates: Dict[str, List[int]],
+        signature: List[int],
+        threshold: float
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        ranked = sorted(
+            (
+                (estimated_jaccard(signature, candidate), key)
+                for key, candidate in candidates.items()
+            ),
+            reverse=True
+        )
+        for similarity, key in ranked:
+            if similarity < threshold:
+                break
+            response = self._cache.get(key)
+            if response is None:
+                response = await self._get_stored(key)
+            if response is not None:
+                return response, similarity
+            # Expired or evicted
+            self._lsh.remove(key)
+        return None
+
+    async def _get_stored(self, key: str) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        try:
+            cached = await AgentResponse.find_one(
+                AgentResponse.key == key,
+                AgentResponse.expires_at > now
+            )
+        except Exception as e:
+            logger.error(f"Failed to read cached response: {e}")
+            return None
+        if cached is None:
+            return None
+        # MongoDB returns naive datetimes in UTC
+        expires_at = cached.expires_at.replace(tzinfo=timezone.utc)
+        self._cache.set(
+            key,
+            cached.response,
+            ttl=(expires_at - now).total_seconds()
+        )
+        return cached.response
+
+    async def _stored_candidates(
+        self,
+        scope: str,
+        bands: List[str]
+    ) -> Dict[str, List[int]]:
+        """Signatures stored by other workers that share a band"""
+        try:
+            stored = await AgentResponse.find(
+                {
+                    "scope": scope,
+                    "lsh_bands": {"$in": bands},
+                    "expires_at": {"$gt": datetime.now(timezone.utc)},
+                }
+            ).limit(NEAR_DUPLICATE_MAX_CANDIDATES).to_list()
+        except Exception as e:
+            logger.error(f"Failed to read near-duplicate candidates: {e}")
+            return {}
+        candidates = {}
+        for cached in stored:
+            if cached.signature and cached.lsh_bands:
+                self._lsh.add(cached.key, cached.signature, cached.lsh_bands)
+                candidates[cached.key] = cached.signature
+        return candidates
+
+    def record_verification(self, false_hit: bool):
+        """Records a sampled near-duplicate hit checked against the LLM"""
+        self.near_verified += 1
+        if false_hit:
+            self.near_false_hits += 1
+
+    def invalidate_agent(self, agent_id) -> int:
+        """Drops the in-process responses of the given agent"""
+        prefix = f"{agent_id}:"
+        self._lsh.invalidate(lambda key: key.startswith(prefix))
+        return self._cache.invalidate(lambda key, _: key.startswith(prefix))
+
+    def clear(self):
+        self._cache.clear()
+        self._lsh.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "max_size": self._cache.max_size,
+            "hits": self.hits,
+            "local_hits": self.local_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "near_duplicate": {
+                "indexed": len(self._lsh),
+                "hits": self.near_hits,
+                "misses": self.near_misses,
+                "sample_rate": NEAR_DUPLICATE_SAMPLE_RATE,
+                "verified": self.near_verified,
+                "false_hits": self.near_false_hits,
+                "false_hit_rate": (
+                    self.near_false_hits / self.near_verified
+                    if self.near_verified else 0.0
+                ),
+            },
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,102 @@
+import copy
+from typing import Any, Optional, Type
+from pydantic import BaseModel
+from atomic_agents.lib.base.base_io_schema import BaseIOSchema
+from atomic_agents.lib.components.agent_memory import AgentMemory
+from atomic_agents.agents.base_agent import BaseAgent
+
+
+class AsyncBaseAgent(BaseAgent):
+    """
+        BaseAgent that can await a complete (non-streaming) response from an
+        async instructor client, so LLM calls don't block the event loop.
+
+        BaseAgent.run_async streams partial responses; arun is its
+        non-streaming counterpart.
+    """
+
+    def fork(
+        self,
+        client: Optional[Any] = None,
+        memory: Optional[AgentMemory] = None
+    ) -> "AsyncBaseAgent":
+        """
+        Returns a lightweight copy of the agent for a single run.
+
+        The copy shares the client, schemas and system prompt generator of
+        this agent but gets its own memory, so one long-lived agent can serve
+        concurrent runs without building a new agent each time.
+
+        Args:
+            client: Client to use instead of this agent's client
+            memory: Memory to run with (defaults to a copy of the initial one)
+
+        Returns:
+            AsyncBaseAgent: The forked agent
+        """
+        agent = copy.copy(self)
+        agent.memory = memory if memory is not None else self.initial_memory.copy()
+        agent.current_user_input = None
+        if client is not None:
+            agent.client = client
+        return agent
+
+    async def get_response_async(self, response_model=None) -> Type[BaseModel]:
+        """
+        Obtains a response from the language model asynchronously.
+
+        Args:
+            response_model (Type[BaseModel], optional):
+                The schema for the response data. If not set,
+                self.output_schema is used.
+
+        Returns:
+            Type[BaseModel]: The response from the language model.
+        """
+        if response_model is None:
+            response_model = self.output_schema
+
+        messages = [
+            {
+                "role": "system",
+                "content": self.system_prompt_generator.generate_prompt(),
+            }
+        ] + self.memory.get_history()
+
+        response = await self.client.chat.completions.create(
+            messages=messages,
+            model=self.model,
+            response_model=response_model,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+
+        return response
+
+    def record_turn(self, user_input: BaseIOSchema, response: BaseIOSchema):
+        """Adds a user input and a response obtained elsewhere to memory"""
+        self.memory.initialize_turn()
+        self.current_user_input = user_input
+        self.memory.add_message("user", user_input)
+        self.memory.add_message("assistant", response)
+
+    async def arun(self, user_input: Optional[BaseIOSchema] = None) -> BaseIOSchema:
+        """
+        Runs the agent with the given user input asynchronously.
+
+        Args:
+            user_input (Optional[BaseIOSchema]): The input from the user.
+                If not provided, skips adding to memory.
+
+        Returns:
+            BaseIOSchema: The response from the agent.
+        """
+        if user_input:
+            self.memory.initialize_turn()
+            self.current_user_input = user_input
+            self.memory.add_message("user", user_input)
+
+        response = await self.get_response_async(response_model=self.output_schema)
+        self.memory.add_message("assistant", response)
+
+        return response
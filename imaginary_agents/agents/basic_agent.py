@@ -4,10 +4,9 @@ from atomic_agents.lib.base.base_io_schema import BaseIOSchema
 from atomic_agents.lib.components.system_prompt_generator import (
     SystemPromptGenerator
 )
-from atomic_agents.agents.base_agent import (
-    BaseAgent,
-    BaseAgentConfig
-)
+from atomic_agents.agents.base_agent import BaseAgentConfig
+
+from imaginary_agents.agents.async_base_agent import AsyncBaseAgent
 
 
 ########################
@@ -24,7 +23,7 @@ class FinalAnswerSchema(BaseIOSchema):
     )
 
 
-class BasicAgent(BaseAgent):
+class BasicAgent(AsyncBaseAgent):
     """
         An Agent that receives a user's input and produces an output.
     """
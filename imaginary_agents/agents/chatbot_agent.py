@@ -1,11 +1,14 @@
 import os
 import instructor
-import openai
 from typing import List
 from atomic_agents.lib.components.system_prompt_generator import (
     SystemPromptGenerator
 )
-from atomic_agents.agents.base_agent import BaseAgentConfig, BaseAgent
+from atomic_agents.agents.base_agent import BaseAgentConfig
+
+from imaginary_agents.agents.async_base_agent import AsyncBaseAgent
+
+from imaginary_agents.llm.client_registry import llm_client_registry
 
 from dotenv import load_dotenv
 
@@ -14,8 +17,13 @@ load_dotenv()
 DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL")
 
 
-class ChatbotAgent(BaseAgent):
-    """Agent that interacts with the user through a chatbot interface."""
+class ChatbotAgent(AsyncBaseAgent):
+    """
+    Agent that interacts with the user through a chatbot interface.
+
+    Built once per bot; each conversation runs on a fork holding the chat's
+    own memory.
+    """
 
     def __init__(
         self,
@@ -45,17 +53,23 @@ class ChatbotAgent(BaseAgent):
             )
 
         if llm_provider == "deepseek":  # TODO: make multi provider dinamically
-            # Create Deepseek client
-            client = instructor.from_openai(
-                openai.OpenAI(
-                    api_key=llm_api_key,
-                    base_url=DEEPSEEK_API_URL,
-                ),
+            # Get pooled Deepseek client
+            client = llm_client_registry.get_client(
+                base_url=DEEPSEEK_API_URL,
+                provider=llm_provider,
+                api_key=llm_api_key,
+                async_client=False,
                 mode=instructor.Mode.MD_JSON
             )
         else:
-            # Create OpenAI client
-            client = instructor.from_openai(openai.OpenAI(api_key=llm_api_key))
+            # Get pooled OpenAI client
+            client = llm_client_registry.get_client(
+                base_url=None,
+                provider=llm_provider,
+                api_key=llm_api_key,
+                async_client=False,
+                mode=instructor.Mode.TOOLS
+            )
 
         # Create agent config
         config = BaseAgentConfig(
@@ -0,0 +1,326 @@
+import os
+import re
+import json
+import math
+import argparse
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Minimum margin of the best tool over the runner-up to skip the LLM
+FAST_ROUTER_THRESHOLD = float(os.getenv("FAST_ROUTER_THRESHOLD", 0.3))
+
+# Score added to tools matching a detector
+URL_BONUS = 0.4
+NAVIGATION_BONUS = 0.4
+
+URL_PATTERN = re.compile(
+    r"(https?://[^\s]+|www\.[^\s]+|\b[a-z0-9-]+(?:\.[a-z0-9-]+)*"
+    r"\.(?:com|org|net|io|dev|ai|app|fun|xyz|co)\b[^\s]*)",
+    re.IGNORECASE
+)
+NAVIGATION_PATTERN = re.compile(
+    r"\b(go to|navigate to|open|visit|browse|click|log in|login|sign in|"
+    r"fill|search for|search)\b",
+    re.IGNORECASE
+)
+# Terms of tools that drive a browser
+NAVIGATION_TERMS = {"browser", "browse", "navigate", "click", "search", "task"}
+URL_FIELD_TERMS = {"url", "website", "link"}
+URL_FIELD_FORMATS = {"uri", "url"}
+# Fields taking the request itself, in the user's own words
+FREE_TEXT_FIELD_TERMS = {"task", "instruction", "query", "prompt", "request"}
+
+# Words left dangling at the end of an instruction once its URL is cut out
+TRAILING_CONNECTORS = {"from", "of", "on", "at", "in", "to", "for", "and"}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "get",
+    "i", "if", "in", "is", "it", "its", "me", "my", "of", "on", "or", "the",
+    "this", "to", "tool", "use", "what", "with", "you", "your", "please",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words without stopwords and plural/-ing endings"""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 5 and word.endswith("ing"):
+            word = word[:-3]
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def _tool_text(tool_name: str, tool_info: Dict[str, Any]) -> str:
+    parts = [tool_name.replace("_", " "), tool_info.get("description", "")]
+    for field_name, field_def in (tool_info.get("input_schema_fields") or {}).items():
+        parts.append(field_name.replace("_", " "))
+        parts.append(field_def.get("description", ""))
+    return " ".join(parts)
+
+
+def _field_terms(field_name: str) -> set:
+    return set(tokenize(field_name.replace("_", " ")))
+
+
+def _is_url_field(field_name: str, field_def: Dict[str, Any]) -> bool:
+    """URL fields are told by their name or format, never their description"""
+    if str(field_def.get("format", "")).lower() in URL_FIELD_FORMATS:
+        return True
+    return bool(_field_terms(field_name) & URL_FIELD_TERMS)
+
+
+def _is_free_text_field(field_name: str) -> bool:
+    return bool(_field_terms(field_name) & FREE_TEXT_FIELD_TERMS)
+
+
+@dataclass
+class Route:
+    """Tool picked by the fast router and the parameters it extracted"""
+    tool: str
+    tool_parameters: Dict[str, Any]
+    confidence: float
+
+
+class RouterStats:
+    """Process-wide counts of fast-path and LLM-routed requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.llm_fallback = 0
+
+    def record(self, fast_path: bool):
+        with self._lock:
+            if fast_path:
+                self.fast_path += 1
+            else:
+                self.llm_fallback += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.fast_path + self.llm_fallback
+        return {
+            "fast_path": self.fast_path,
+            "llm_fallback": self.llm_fallback,
+            "fast_path_rate": self.fast_path / total if total else 0.0,
+        }
+
+
+router_stats = RouterStats()
+
+
+class FastRouter:
+    """
+    Local pre-router for orchestrator agents.
+
+    Each tool of tools_available is indexed by the TF-IDF terms of its name,
+    description and input fields. Inputs are scored against every tool, plus
+    bonuses from URL and navigation detectors. When the best tool beats the
+    runner-up by at least threshold and its parameters can be extracted from
+    the input, the route is returned; otherwise route() returns None and the
+    LLM does the routing.
+    """
+
+    def __init__(
+        self,
+        tools: Dict[str, Dict[str, Any]],
+        threshold: float = FAST_ROUTER_THRESHOLD
+    ):
+        self.tools = tools
+        self.threshold = threshold
+        documents = {
+            name: Counter(tokenize(_tool_text(name, info)))
+            for name, info in tools.items()
+        }
+        document_frequency = Counter()
+        for terms in documents.values():
+            document_frequency.update(set(terms))
+        self._idf = {
+            term: math.log((len(documents) + 1) / (frequency + 1)) + 1
+            for term, frequency in document_frequency.items()
+        }
+        self._vectors = {
+            name: self._weigh(terms) for name, terms in documents.items()
+        }
+        self._navigation_tools = {
+            name for name, terms in documents.items()
+            if set(terms) & NAVIGATION_TERMS
+        }
+        self._url_tools = {
+            name for name, info in tools.items()
+            if any(
+                _is_url_field(field_name, field_def)
+                for field_name, field_def in (
+                    info.get("input_schema_fields") or {}
+                ).items()
+            )
+        }
+
+    def _weigh(self, terms: Counter) -> Dict[str, float]:
+        vector = {
+            term: count * self._idf[term]
+            for term, count in terms.items() if term in self._idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def score(self, message: str) -> Dict[str, float]:
+        """Score of every tool for the given input"""
+        query = self._weigh(Counter(tokenize(message)))
+        has_url = bool(URL_PATTERN.search(message or ""))
+        navigates = bool(NAVIGATION_PATTERN.search(message or ""))
+        scores = {}
+        for name, vector in self._vectors.items():
+            score = sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            if has_url and name in self._url_tools:
+                # A URL alongside navigation steps is rather a browser task
+                score += URL_BONUS / 2 if navigates else URL_BONUS
+            if navigates and name in self._navigation_tools:
+                score += NAVIGATION_BONUS
+            scores[name] = score
+        return scores
+
+    def extract_parameters(
+        self,
+        tool_name: str,
+        message: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Fills the tool input fields from the input: URL fields get the
+        detected URL and a single remaining free-text field (a task, query,
+        instruction...) gets the rest of the input. Returns None when a
+        field can't be filled unambiguously, e.g. a tag or a name that only
+        the LLM can pick out of the input.
+        """
+        fields = self.tools[tool_name].get("input_schema_fields") or {}
+        url_match = URL_PATTERN.search(message)
+        parameters = {}
+        text_fields = []
+        for field_name, field_def in fields.items():
+            if field_def.get("type", "str").lower() != "str":
+                return None
+            if _is_url_field(field_name, field_def):
+                if not url_match:
+                    return None
+                parameters[field_name] = url_match.group(0).rstrip(".,;")
+            else:
+                text_fields.append(field_name)
+
+        if len(text_fields) > 1:
+            return None
+        if text_fields:
+            if not _is_free_text_field(text_fields[0]):
+                return None
+            text = message
+            if parameters and url_match:
+                words = URL_PATTERN.sub(" ", message).split()
+                while words and words[-1].lower() in TRAILING_CONNECTORS:
+                    words.pop()
+                text = " ".join(words).strip(" ,.;:")
+            if not text:
+                return None
+            parameters[text_fields[0]] = text
+        return parameters
+
+    def route(self, message: Optional[str]) -> Optional[Route]:
+        """Returns the route of the input, or None to fall back to the LLM"""
+        if not message or not self.tools:
+            return None
+        ranked = sorted(self.score(message).items(), key=lambda item: -item[1])
+        best_tool, best_score = ranked[0]
+        runner_up_score = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = best_score - runner_up_score
+        if confidence < self.threshold:
+            return None
+        parameters = self.extract_parameters(best_tool, message)
+        if parameters is None:
+            return None
+        return Route(best_tool, parameters, confidence)
+
+
+def evaluate(
+    router: FastRouter,
+    examples: Iterable[Tuple[str, Optional[str], Optional[Dict[str, Any]]]]
+) -> Dict[str, Any]:
+    """
+    Measures the router against labelled (input, expected tool, expected
+    tool parameters) examples
+
+    Returns:
+        How many inputs take the fast path (coverage) and how many of those
+        are routed to the expected tool with the expected parameters
+        (accuracy)
+    """
+    total = fast_path = correct = 0
+    mistakes = []
+    for message, expected_tool, expected_parameters in examples:
+        total += 1
+        route = router.route(message)
+        if route is None:
+            continue
+        fast_path += 1
+        if (
+            route.tool == expected_tool
+            and route.tool_parameters == (expected_parameters or {})
+        ):
+            correct += 1
+        else:
+            mistakes.append({
+                "input": message,
+                "expected": expected_tool,
+                "expected_parameters": expected_parameters,
+                "routed": route.tool,
+                "routed_parameters": route.tool_parameters
+            })
+    return {
+        "total": total,
+        "fast_path": fast_path,
+        "coverage": fast_path / total if total else 0.0,
+        "accuracy": correct / fast_path if fast_path else 0.0,
+        "mistakes": mistakes,
+    }
+
+
+def evaluate_file(path: str, threshold: float = FAST_ROUTER_THRESHOLD):
+    """
+    Evaluates a labelled set file: {"tools": {...}, "examples": [{"input",
+    "tool", "tool_parameters"}, ...]}
+    """
+    with open(path) as labelled_set_file:
+        labelled_set = json.load(labelled_set_file)
+    router = FastRouter(labelled_set["tools"], threshold=threshold)
+    return evaluate(
+        router,
+        [
+            (example["input"], example["tool"], example.get("tool_parameters"))
+            for example in labelled_set["examples"]
+        ]
+    )
+
+
+LABELLED_SET_PATH = os.path.join(
+    os.path.dirname(__file__), "fast_router_labelled_set.json"
+)
+
+
+if __name__ == "__main__":
+    # Set up argument parser
+    parser = argparse.ArgumentParser(
+        description='Evaluate the fast router against a labelled set'
+    )
+    parser.add_argument('path', nargs='?', default=LABELLED_SET_PATH)
+    parser.add_argument('--threshold', type=float, default=FAST_ROUTER_THRESHOLD)
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    print(json.dumps(evaluate_file(args.path, args.threshold), indent=2))
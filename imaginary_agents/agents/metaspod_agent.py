@@ -1,7 +1,6 @@
 import os
 from dotenv import load_dotenv
 import instructor
-import openai
 from pydantic import Field
 from atomic_agents.agents.base_agent import (
     BaseIOSchema,
@@ -14,6 +13,7 @@ from atomic_agents.lib.components.system_prompt_generator import (
 from imaginary_agents.context_providers import (
     TrendingMemesProvider, PreviousPostProvider
 )
+from imaginary_agents.llm.client_registry import llm_client_registry
 
 load_dotenv()
 
@@ -52,8 +52,12 @@ trending_memes_provider = TrendingMemesProvider(title="Trending Memes")
 # Create the question answering agent
 metas_pod_agent = BaseAgent(
     BaseAgentConfig(
-        client=instructor.from_openai(
-            openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client=llm_client_registry.get_client(
+            base_url=None,
+            provider="openai",
+            api_key=API_KEY,
+            async_client=False,
+            mode=instructor.Mode.TOOLS
         ),
         model="gpt-4o-mini",
         system_prompt_generator=SystemPromptGenerator(
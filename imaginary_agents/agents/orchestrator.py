@@ -4,10 +4,9 @@ from atomic_agents.lib.base.base_io_schema import BaseIOSchema
 from atomic_agents.lib.components.system_prompt_generator import (
     SystemPromptGenerator
 )
-from atomic_agents.agents.base_agent import (
-    BaseAgent,
-    BaseAgentConfig
-)
+from atomic_agents.agents.base_agent import BaseAgentConfig
+
+from imaginary_agents.agents.async_base_agent import AsyncBaseAgent
 
 
 ########################
@@ -24,7 +23,14 @@ class FinalAnswerSchema(BaseIOSchema):
     )
 
 
-class OrchestratorAgent(BaseAgent):
+class ToolResultSchema(BaseIOSchema):
+    """Schema for the output of a tool run by the Orchestrator Agent."""
+
+    tool: str = Field(..., description="The tool that was run.")
+    result: str = Field(..., description="The tool output, or its error.")
+
+
+class OrchestratorAgent(AsyncBaseAgent):
     """
         An Agent that receives a user's message and determines which tool to use.
         It can use tools dinamically.
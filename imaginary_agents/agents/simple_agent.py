@@ -1,7 +1,5 @@
 import os
 import instructor
-import openai
-from pydantic import Field, create_model
 from typing import Dict, Any, List
 from atomic_agents.lib.components.system_prompt_generator import (
     SystemPromptGenerator
@@ -12,6 +10,9 @@ from atomic_agents.agents.base_agent import (
     BaseIOSchema
 )
 
+from imaginary_agents.llm.client_registry import llm_client_registry
+from imaginary_agents.helpers.schema_compiler import schema_compiler
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -49,44 +50,39 @@ class SimpleAgent(BaseAgent):
             model: OpenAI model to use
         """
 
-        # Create dynamic input and output schemas
-        SimpleAgentInputSchema = create_model(
+        # Get (cached) dynamic input and output schemas
+        SimpleAgentInputSchema = schema_compiler.compile(
             'SimpleAgentInputSchema',
-            __base__=BaseIOSchema,
-            __doc__="Input schema for SimpleAgent, defines expected input structure.",
-            **{
-                name: (field_def['type'], Field(
-                    ...,
-                    description=field_def['description']
-                ))
-                for name, field_def in input_schema_fields.items()
-            }
+            input_schema_fields,
+            base=BaseIOSchema,
+            doc="Input schema for SimpleAgent, defines expected input structure."
         )
 
-        SimpleAgentOutputSchema = create_model(
+        SimpleAgentOutputSchema = schema_compiler.compile(
             'SimpleAgentOutputSchema',
-            __base__=BaseIOSchema,
-            __doc__="Output schema for SimpleAgent that defines the response structure.",
-            **{
-                name: (field_def['type'], Field(
-                    ..., description=field_def['description']
-                ))
-                for name, field_def in output_schema_fields.items()
-            }
+            output_schema_fields,
+            base=BaseIOSchema,
+            doc="Output schema for SimpleAgent that defines the response structure."
         )
 
         if llm_provider == "deepseek":  # TODO: make multi provider dinamically
-            # Create Deepseek client
-            client = instructor.from_openai(
-                openai.OpenAI(
-                    api_key=api_key,
-                    base_url=DEEPSEEK_API_URL,
-                ),
+            # Get pooled Deepseek client
+            client = llm_client_registry.get_client(
+                base_url=DEEPSEEK_API_URL,
+                provider=llm_provider,
+                api_key=api_key,
+                async_client=False,
                 mode=instructor.Mode.MD_JSON
             )
         else:
-            # Create OpenAI client
-            client = instructor.from_openai(openai.OpenAI(api_key=api_key))
+            # Get pooled OpenAI client
+            client = llm_client_registry.get_client(
+                base_url=None,
+                provider=llm_provider,
+                api_key=api_key,
+                async_client=False,
+                mode=instructor.Mode.TOOLS
+            )
 
         # Create agent config
         config = BaseAgentConfig(
@@ -0,0 +1,148 @@
+import re
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+# MinHash signatures have NUM_PERM values, split in LSH_BANDS bands
+NUM_PERM = 64
+LSH_BANDS = 16
+# Words per shingle
+SHINGLE_SIZE = 3
+
+_PRIME = (1 << 61) - 1
+_random = random.Random(1)
+_PERMUTATIONS = [
+    (_random.randrange(1, _PRIME), _random.randrange(0, _PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def canonical_text(value: Any) -> str:
+    """
+    Canonical text of an input: the values of dicts in key order, joined
+    and lowercased, without punctuation, emoji or repeated whitespace
+    """
+    if isinstance(value, dict):
+        value = " ".join(canonical_text(value[key]) for key in sorted(value))
+    elif isinstance(value, (list, tuple)):
+        value = " ".join(canonical_text(item) for item in value)
+    return " ".join(re.findall(r"\w+", str(value).lower()))
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """
+    Word n-gram shingles of a canonical text, so word order and negations
+    count; texts shorter than size are a single shingle
+    """
+    words = text.split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {
+        " ".join(words[start:start + size])
+        for start in range(len(words) - size + 1)
+    }
+
+
+def minhash(tokens: Iterable[str]) -> Optional[List[int]]:
+    """MinHash signature of a set of tokens, None for an empty set"""
+    hashes = [
+        int.from_bytes(
+            hashlib.blake2b(token.encode(), digest_size=8).digest(), "big"
+        )
+        for token in set(tokens)
+    ]
+    if not hashes:
+        return None
+    return [
+        min((a * value + b) % _PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def estimated_jaccard(signature: List[int], other: List[int]) -> float:
+    """Jaccard similarity of two sets estimated from their signatures"""
+    equal = sum(1 for a, b in zip(signature, other) if a == b)
+    return equal / len(signature)
+
+
+def lsh_bands(signature: List[int], scope: str = "") -> List[str]:
+    """
+    LSH band keys of a signature. Inputs sharing at least one band key are
+    candidate near-duplicates.
+    """
+    rows = len(signature) // LSH_BANDS
+    bands = []
+    for band in range(LSH_BANDS):
+        values = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(
+            ",".join(map(str, values)).encode(), digest_size=8
+        ).hexdigest()
+        bands.append(f"{scope}:{band}:{digest}")
+    return bands
+
+
+class LSHIndex:
+    """
+    Bounded in-memory LSH index of MinHash signatures.
+
+    Keys are indexed by their band keys; when the index is full the least
+    recently added key is evicted.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._signatures: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._bands: Dict[str, Set[str]] = {}
+        self._key_bands: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, signature: List[int], bands: List[str]):
+        with self._lock:
+            self._remove(key)
+            self._signatures[key] = signature
+            self._key_bands[key] = bands
+            for band in bands:
+                self._bands.setdefault(band, set()).add(key)
+            while len(self._signatures) > self.max_size:
+                self._remove(next(iter(self._signatures)))
+
+    def remove(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        if self._signatures.pop(key, None) is None:
+            return
+        for band in self._key_bands.pop(key, []):
+            keys = self._bands.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._bands[band]
+
+    def invalidate(self, predicate: Callable[[str], bool]) -> int:
+        """Removes the keys matching predicate, returns how many"""
+        with self._lock:
+            keys = [key for key in self._signatures if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def query(self, bands: List[str]) -> Dict[str, List[int]]:
+        """Candidate keys sharing a band, with their signatures"""
+        with self._lock:
+            candidates = set()
+            for band in bands:
+                candidates.update(self._bands.get(band, ()))
+            return {key: self._signatures[key] for key in candidates}
+
+    def clear(self):
+        with self._lock:
+            self._signatures.clear()
+            self._bands.clear()
+            self._key_bands.clear()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
@@ -0,0 +1,147 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Type, get_args, get_origin
+
+from pydantic import BaseModel, Field, create_model
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCHEMA_CACHE_MAX_SIZE = int(os.getenv("SCHEMA_CACHE_MAX_SIZE", 512))
+
+
+def _type_fingerprint(field_type: Any) -> str:
+    """Stable textual identity of a field type, including nested schemas"""
+    origin = get_origin(field_type)
+    if origin is not None:
+        args = ",".join(_type_fingerprint(arg) for arg in get_args(field_type))
+        return f"{_type_fingerprint(origin)}[{args}]"
+    fingerprint = getattr(field_type, "__schema_fingerprint__", None)
+    if fingerprint:
+        return fingerprint
+    if isinstance(field_type, type):
+        return f"{field_type.__module__}.{field_type.__qualname__}"
+    return repr(field_type)
+
+
+class SchemaCompiler:
+    """
+    Content-addressed cache of dynamically created Pydantic models.
+
+    Schemas are described by a dict of {field_name: {type, description}}.
+    The definition (model name, base class, docstring and fields) is hashed,
+    and identical definitions return the same compiled model from a bounded
+    LRU instead of calling pydantic.create_model again.
+    """
+
+    def __init__(self, max_size: int = SCHEMA_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._models: "OrderedDict[str, Type[BaseModel]]" = OrderedDict()
+        self._json_schemas: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def fingerprint(
+        name: str,
+        fields: Dict[str, Dict[str, Any]],
+        base: Type[BaseModel] = BaseModel,
+        doc: Optional[str] = None
+    ) -> str:
+        definition = {
+            "name": name,
+            "base": _type_fingerprint(base),
+            "doc": doc,
+            "fields": {
+                field_name: {
+                    "type": _type_fingerprint(field_def["type"]),
+                    "description": field_def.get("description", ""),
+                }
+                for field_name, field_def in fields.items()
+            },
+        }
+        payload = json.dumps(definition, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def compile(
+        self,
+        name: str,
+        fields: Dict[str, Dict[str, Any]],
+        base: Type[BaseModel] = BaseModel,
+        doc: Optional[str] = None
+    ) -> Type[BaseModel]:
+        """
+        Returns the model for the given definition, creating it on a miss.
+
+        Args:
+            name: Name of the model class
+            fields: {field_name: {"type": python type, "description": str}}
+            base: Base class of the model
+            doc: Docstring of the model
+
+        Returns:
+            Type[BaseModel]: The compiled model
+        """
+        key = self.fingerprint(name, fields, base, doc)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self.hits += 1
+                self._models.move_to_end(key)
+                return model
+            self.misses += 1
+
+        model = create_model(
+            name,
+            __base__=base,
+            __doc__=doc,
+            **{
+                field_name: (
+                    field_def["type"],
+                    Field(..., description=field_def.get("description", ""))
+                )
+                for field_name, field_def in fields.items()
+            }
+        )
+        model.__schema_fingerprint__ = key
+
+        with self._lock:
+            # Another caller may have compiled the same definition meanwhile
+            model = self._models.setdefault(key, model)
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_size:
+                evicted_key, _ = self._models.popitem(last=False)
+                self._json_schemas.pop(evicted_key, None)
+                self.evictions += 1
+        return model
+
+    def json_schema(self, model: Type[BaseModel]) -> Dict[str, Any]:
+        """Returns the (cached) JSON schema of a compiled model"""
+        key = getattr(model, "__schema_fingerprint__", None)
+        if key is None:
+            return model.model_json_schema()
+        with self._lock:
+            schema = self._json_schemas.get(key)
+        if schema is None:
+            schema = model.model_json_schema()
+            with self._lock:
+                if key in self._models:
+                    self._json_schemas[key] = schema
+        return schema
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._models),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+schema_compiler = SchemaCompiler()
@@ -0,0 +1,58 @@
+import copy
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def canonical_hash(value: Any) -> str:
+    """Hash of a JSON-serializable value that ignores key order"""
+    payload = json.dumps(
+        value, sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single call.
+
+    The first caller of a key starts the call in its own task; callers
+    arriving while it is in flight wait for that task and get a copy of its
+    result (or its exception). The task is shielded, so a caller giving up
+    doesn't cancel the call for the others. Nothing is kept once the call
+    finishes: this is coalescing, not caching.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+            return await asyncio.shield(task)
+
+        self.coalesced += 1
+        result = await asyncio.shield(task)
+        # Callers must not share mutable results
+        return copy.deepcopy(result)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved if every caller gave up
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
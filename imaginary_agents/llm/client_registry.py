@@ -0,0 +1,356 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+
+import httpx
+import instructor
+import openai
+from dotenv import load_dotenv
+
+from imaginary_agents.llm.endpoints import (
+    HedgingAsyncTransport,
+    llm_endpoint_pool
+)
+from imaginary_agents.llm.rate_limiter import (
+    RateLimitedAsyncTransport,
+    RateLimitedTransport,
+    llm_rate_limiter
+)
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LLM_CLIENT_REGISTRY_MAX_SIZE = int(os.getenv("LLM_CLIENT_REGISTRY_MAX_SIZE", 64))
+LLM_CLIENT_IDLE_TTL = float(os.getenv("LLM_CLIENT_IDLE_TTL", 900))
+
+# Connection pool settings per provider, "default" applies to unknown ones
+PROVIDER_POOL_LIMITS: Dict[str, Dict[str, int]] = {
+    "default": {"max_connections": 100, "max_keepalive_connections": 20},
+    "openai": {"max_connections": 500, "max_keepalive_connections": 100},
+    "deepseek": {"max_connections": 200, "max_keepalive_connections": 50},
+}
+
+
+def hash_llm_api_key(api_key: str) -> str:
+    """Hashes an LLM API key so raw keys are never used as registry keys"""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()
+
+
+class _ClosingAsyncStream(httpx.AsyncByteStream):
+    """Response body that reports its request finished once closed"""
+
+    def __init__(self, stream, finish):
+        self.stream = stream
+        self.finish = finish
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            await self.finish()
+
+
+class _ClosingSyncStream(httpx.SyncByteStream):
+    def __init__(self, stream, finish):
+        self.stream = stream
+        self.finish = finish
+
+    def __iter__(self):
+        for chunk in self.stream:
+            yield chunk
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            self.finish()
+
+
+class InFlightAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Counts the requests in flight through a pooled client. Once the client
+    is evicted, its connection pool is closed when the last of them
+    finishes. The pool reconnects if the client is used again.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        pool: httpx.AsyncHTTPTransport
+    ):
+        self.transport = transport
+        self.pool = pool
+        self.in_flight = 0
+        self.evicted = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            await self._finish()
+            raise
+        if response.is_closed:
+            await self._finish()
+            return response
+        response.stream = _ClosingAsyncStream(response.stream, self._finish)
+        return response
+
+    async def _finish(self):
+        with self._lock:
+            self.in_flight -= 1
+        await self._close_pool()
+
+    async def _close_pool(self):
+        with self._lock:
+            if not self.evicted or self.in_flight:
+                return
+        try:
+            await self.pool.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing LLM connection pool: {e}")
+
+    def release(self):
+        """Closes the pool now if it's idle, else after its last request"""
+        with self._lock:
+            self.evicted = True
+            idle = self.in_flight == 0
+        loop = self._loop
+        # A transport that never sent a request has no connections
+        if idle and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._schedule_close)
+
+    def _schedule_close(self):
+        self._closing = asyncio.get_running_loop().create_task(
+            self._close_pool()
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class InFlightTransport(httpx.BaseTransport):
+    """Sync counterpart of InFlightAsyncTransport"""
+
+    def __init__(self, transport: httpx.BaseTransport, pool: httpx.HTTPTransport):
+        self.transport = transport
+        self.pool = pool
+        self.in_flight = 0
+        self.evicted = False
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.in_flight += 1
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            self._finish()
+            raise
+        if response.is_closed:
+            self._finish()
+            return response
+        response.stream = _ClosingSyncStream(response.stream, self._finish)
+        return response
+
+    def _finish(self):
+        with self._lock:
+            self.in_flight -= 1
+            if self.evicted and not self.in_flight:
+                self._close_pool()
+
+    def _close_pool(self):
+        try:
+            self.pool.close()
+        except Exception as e:
+            logger.warning(f"Error closing LLM connection pool: {e}")
+
+    def release(self):
+        """Closes the pool now if it's idle, else after its last request"""
+        with self._lock:
+            self.evicted = True
+            if not self.in_flight:
+                self._close_pool()
+
+    def close(self):
+        self.transport.close()
+
+
+@dataclass
+class _RegistryEntry:
+    openai_client: object
+    client: instructor.Instructor
+    transport: object
+    last_used: float
+
+
+class LLMClientRegistry:
+    """
+    Process-wide registry of pooled LLM clients.
+
+    Clients are keyed by (base_url, provider, hashed API key, sync/async,
+    instructor mode), so every agent using the same provider credentials
+    reuses the same keep-alive connection pool. Requests go through the
+    llm_rate_limiter, which throttles models with rate limits, and async
+    requests of models with mirrors are hedged across their endpoints.
+
+    The registry is bounded: least recently used clients are evicted when
+    it is full, and clients idle for longer than idle_ttl seconds are
+    dropped.
+    """
+
+    def __init__(
+        self,
+        max_size: int = LLM_CLIENT_REGISTRY_MAX_SIZE,
+        idle_ttl: float = LLM_CLIENT_IDLE_TTL,
+        pool_limits: Optional[Dict[str, Dict[str, int]]] = None
+    ):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.pool_limits = pool_limits or PROVIDER_POOL_LIMITS
+        self._entries: "OrderedDict[Hashable, _RegistryEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_limits(self, provider: str) -> httpx.Limits:
+        limits = self.pool_limits.get(provider) or self.pool_limits["default"]
+        return httpx.Limits(**limits)
+
+    def get_client(
+        self,
+        base_url: Optional[str],
+        provider: str,
+        api_key: str,
+        async_client: bool = True,
+        mode: instructor.Mode = instructor.Mode.MD_JSON
+    ) -> instructor.Instructor:
+        """
+        Returns a pooled instructor client, creating it on first use.
+
+        Args:
+            base_url: Base URL of the provider API (None for OpenAI default)
+            provider: The provider name (e.g., 'openai', 'deepseek')
+            api_key: API key for the provider
+            async_client: Whether to return an async client
+            mode: instructor mode used to parse structured outputs
+
+        Returns:
+            instructor.Instructor: An (Async)Instructor client
+        """
+        key = (base_url, provider, hash_llm_api_key(api_key), async_client, mode)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                entry.last_used = now
+                self._entries.move_to_end(key)
+                return entry.client
+
+            self.misses += 1
+            openai_client, transport = self._create_openai_client(
+                base_url, provider, api_key, async_client
+            )
+            client = instructor.from_openai(openai_client, mode=mode)
+            self._entries[key] = _RegistryEntry(
+                openai_client, client, transport, now
+            )
+            while len(self._entries) > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._release(evicted)
+            return client
+
+    def _create_openai_client(self, base_url, provider, api_key, async_client):
+        limits = self.get_limits(provider)
+        if async_client:
+            pool = httpx.AsyncHTTPTransport(limits=limits)
+            # Hedges and failovers are each admitted by the rate limiter
+            transport = InFlightAsyncTransport(
+                HedgingAsyncTransport(
+                    RateLimitedAsyncTransport(pool, provider, llm_rate_limiter),
+                    provider,
+                    llm_endpoint_pool
+                ),
+                pool
+            )
+            openai_client = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=openai.DefaultAsyncHttpxClient(transport=transport)
+            )
+            return openai_client, transport
+        pool = httpx.HTTPTransport(limits=limits)
+        transport = InFlightTransport(
+            RateLimitedTransport(pool, provider, llm_rate_limiter),
+            pool
+        )
+        openai_client = openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=openai.DefaultHttpxClient(transport=transport)
+        )
+        return openai_client, transport
+
+    def _evict_idle(self, now: float):
+        idle_keys = [
+            key for key, entry in self._entries.items()
+            if now - entry.last_used > self.idle_ttl
+        ]
+        for key in idle_keys:
+            self._release(self._entries.pop(key))
+
+    def _release(self, entry: _RegistryEntry):
+        """
+        Drops an evicted client. Its connection pool is closed once its
+        in-flight requests finish, but the client itself stays open:
+        long-lived agents still holding it keep working, reconnecting on
+        their next request.
+        """
+        self.evictions += 1
+        entry.transport.release()
+
+    async def aclose(self):
+        """Closes every pooled client, used on application shutdown"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            try:
+                if isinstance(entry.openai_client, openai.AsyncOpenAI):
+                    await entry.openai_client.close()
+                else:
+                    await asyncio.to_thread(entry.openai_client.close)
+            except Exception as e:
+                logger.warning(f"Error closing LLM client: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+llm_client_registry = LLMClientRegistry()
@@ -0,0 +1,358 @@
+import os
+import time
+import math
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+from imaginary_agents.llm.rate_limiter import describe_request
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds before hedging while an endpoint has too few samples for a p95
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", 5))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", 0.05))
+# Latencies kept per endpoint, and needed before using their p95
+LLM_HEDGE_LATENCY_WINDOW = int(os.getenv("LLM_HEDGE_LATENCY_WINDOW", 200))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+# Consecutive failures that open an endpoint's circuit, and for how long
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", 5))
+LLM_CIRCUIT_COOLDOWN = float(os.getenv("LLM_CIRCUIT_COOLDOWN", 30))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_failure(response: httpx.Response) -> bool:
+    """
+    Responses another endpoint may answer better. 429s aren't: mirrors
+    share the API key, so they are left to the rate limiter's pause.
+    """
+    return response.status_code >= 500
+
+
+class Endpoint:
+    """
+    Latency window and circuit breaker of one base URL.
+
+    After failure_threshold consecutive failures the circuit opens and the
+    endpoint is taken out of rotation for cooldown seconds; then a single
+    trial request is let through, closing the circuit if it succeeds.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD,
+        cooldown: float = LLM_CIRCUIT_COOLDOWN
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latencies: deque = deque(maxlen=LLM_HEDGE_LATENCY_WINDOW)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def matches(self, url: str) -> bool:
+        return url.startswith(self.base_url + "/")
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[math.ceil(len(latencies) * 0.95) - 1]
+
+    def acquire(self, now: float) -> bool:
+        """Whether a request may be sent to the endpoint now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now - self.opened_at >= self.cooldown:
+                # Let a single trial request through
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.requests += 1
+            self.wins += 1
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+            self.state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.consecutive_failures += 1
+            if (
+                self.state == HALF_OPEN
+                or self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state != OPEN:
+                    logger.warning(f"Circuit of LLM endpoint {self.base_url} opened")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """The request lost a hedge race, give back a half-open trial"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "wins": self.wins,
+            "p95_ms": p95 * 1000 if p95 is not None else None,
+        }
+
+
+class ModelEndpoints:
+    """Endpoints serving a (provider, model), primary first"""
+
+    def __init__(self, base_urls: List[str], hedge_delay: Optional[float] = None):
+        self.endpoints = [Endpoint(base_url) for base_url in base_urls]
+        self.default_hedge_delay = (
+            LLM_HEDGE_DEFAULT_DELAY if hedge_delay is None else hedge_delay
+        )
+        self.hedges = 0
+        self.failovers = 0
+
+    @property
+    def base_urls(self) -> List[str]:
+        return [endpoint.base_url for endpoint in self.endpoints]
+
+    def origin(self, url: str) -> Optional[Endpoint]:
+        for endpoint in self.endpoints:
+            if endpoint.matches(url):
+                return endpoint
+        return None
+
+    def candidates(self) -> Iterator[Endpoint]:
+        """
+        Endpoints in rotation, in order. Circuits are only checked when the
+        next endpoint is needed; with every circuit open, the primary is used.
+        """
+        found = False
+        for endpoint in self.endpoints:
+            if endpoint.acquire(time.monotonic()):
+                found = True
+                yield endpoint
+        if not found:
+            yield self.endpoints[0]
+
+    def hedge_delay(self, endpoint: Endpoint) -> float:
+        """Seconds to wait for an endpoint before hedging: its observed p95"""
+        p95 = endpoint.p95()
+        if p95 is None:
+            return self.default_hedge_delay
+        return max(p95, LLM_HEDGE_MIN_DELAY)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "endpoints": {
+                endpoint.base_url: endpoint.stats()
+                for endpoint in self.endpoints
+            },
+        }
+
+
+class EndpointPool:
+    """
+    Endpoints of the models served by several base URLs (a primary and its
+    mirrors or proxies), configured from the LLM configs
+    """
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], ModelEndpoints] = {}
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        provider: str,
+        model: str,
+        base_urls: Optional[List[str]],
+        hedge_delay: Optional[float] = None
+    ):
+        """Sets the endpoints of a model, a single one (or None) removes them"""
+        key = (provider, model)
+        with self._lock:
+            if not base_urls or len(base_urls) < 2:
+                self._models.pop(key, None)
+                return
+            current = self._models.get(key)
+            if current is None or current.base_urls != [
+                base_url.rstrip("/") for base_url in base_urls
+            ]:
+                self._models[key] = ModelEndpoints(base_urls, hedge_delay)
+
+    def get(self, provider: str, model: str) -> Optional[ModelEndpoints]:
+        return self._models.get((provider, model))
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            f"{provider}:{model}": endpoints.stats()
+            for (provider, model), endpoints in list(self._models.items())
+        }
+
+
+llm_endpoint_pool = EndpointPool()
+
+
+def _close_response(task: asyncio.Task):
+    """Closes the response of a request that lost the race"""
+    if task.cancelled() or task.exception() is not None:
+        return
+    response, _ = task.result()
+    asyncio.ensure_future(response.aclose())
+
+
+class HedgingAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport spreading the requests of multi-endpoint models.
+
+    A request is sent to the first endpoint in rotation. If it hasn't
+    answered after that endpoint's p95 latency, a hedged copy is sent to the
+    next endpoint and whichever answers first is used, the other request is
+    cancelled. Failed requests (errors and 5xx) fail over to the next
+    endpoint right away. Models with a single endpoint pass through.
+
+    It wraps the rate-limited transport, so every attempt on the wire,
+    hedges and failovers included, is admitted and counted by the limiter.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        provider: str,
+        pool: EndpointPool = llm_endpoint_pool
+    ):
+        self.transport = transport
+        self.provider = provider
+        self.pool = pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, _, _ = describe_request(request)
+        endpoints = self.pool.get(self.provider, model) if model else None
+        origin = endpoints.origin(str(request.url)) if endpoints else None
+        if origin is None:
+            return await self.transport.handle_async_request(request)
+        return await self._send_hedged(request, endpoints, origin)
+
+    async def _send(
+        self,
+        request: httpx.Request,
+        origin: Endpoint,
+        endpoint: Endpoint
+    ) -> Tuple[httpx.Response, float]:
+        if endpoint is not origin:
+            url = endpoint.base_url + str(request.url)[len(origin.base_url):]
+            headers = [
+                (name, value) for name, value in request.headers.multi_items()
+                if name.lower() != "host"
+            ]
+            request = httpx.Request(
+                request.method,
+                url,
+                headers=headers,
+                content=request.content,
+                extensions=request.extensions
+            )
+        start = time.monotonic()
+        response = await self.transport.handle_async_request(request)
+        return response, time.monotonic() - start
+
+    async def _send_hedged(
+        self,
+        request: httpx.Request,
+        endpoints: ModelEndpoints,
+        origin: Endpoint
+    ) -> httpx.Response:
+        candidates = endpoints.candidates()
+        pending: Dict[asyncio.Task, Endpoint] = {}
+        hedged = False
+        last_response: Optional[httpx.Response] = None
+        last_error: Optional[BaseException] = None
+
+        def start(endpoint: Endpoint):
+            task = asyncio.create_task(self._send(request, origin, endpoint))
+            pending[task] = endpoint
+
+        first = next(candidates)
+        start(first)
+        try:
+            while pending:
+                timeout = None if hedged else endpoints.hedge_delay(first)
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    endpoint = next(candidates, None)
+                    if endpoint is not None:
+                        endpoints.hedges += 1
+                        start(endpoint)
+                    continue
+
+                for task in done:
+                    endpoint = pending.pop(task)
+                    try:
+                        response, latency = task.result()
+                    except Exception as e:
+                        endpoint.record_failure()
+                        last_error = e
+                        continue
+                    if is_failure(response):
+                        endpoint.record_failure()
+                        if last_response is not None:
+                            await last_response.aclose()
+                        last_response = response
+                        continue
+                    if response.status_code != 429:
+                        endpoint.record_success(latency)
+                    if last_response is not None:
+                        await last_response.aclose()
+                    return response
+
+                if not pending:
+                    endpoint = next(candidates, None)
+                    if endpoint is not None:
+                        endpoints.failovers += 1
+                        start(endpoint)
+        finally:
+            for task, endpoint in pending.items():
+                endpoint.record_cancelled()
+                task.cancel()
+                task.add_done_callback(_close_response)
+
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    async def aclose(self):
+        await self.transport.aclose()
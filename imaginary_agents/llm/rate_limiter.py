@@ -0,0 +1,556 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Protocol, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Completion tokens assumed for requests without max_tokens
+LLM_RATE_LIMIT_COMPLETION_TOKENS = int(
+    os.getenv("LLM_RATE_LIMIT_COMPLETION_TOKENS", 512)
+)
+# Seconds a provider is paused after a 429 without a Retry-After header
+LLM_RATE_LIMIT_BACKOFF = float(os.getenv("LLM_RATE_LIMIT_BACKOFF", 1))
+
+
+@dataclass(frozen=True)
+class RateLimits:
+    """Limits of a (provider, model), None means unlimited"""
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    max_concurrency: Optional[int] = None
+
+    @property
+    def unlimited(self) -> bool:
+        return (
+            self.requests_per_minute is None
+            and self.tokens_per_minute is None
+            and self.max_concurrency is None
+        )
+
+
+class RateLimitStore(Protocol):
+    """Shared per-minute usage windows, so limits hold across workers"""
+
+    async def reserve(
+        self,
+        key: str,
+        requests: int,
+        tokens: int,
+        limits: RateLimits
+    ) -> float:
+        """Reserves usage in the current window, returns 0 or the seconds
+        to wait for the next one"""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at per_minute / 60 tokens per second.
+
+    Reservations may take the bucket below zero: each caller is told how
+    long to wait for its share, so callers are served in arrival order.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Takes amount tokens, returns the seconds to wait for them"""
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self, now: float):
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class FairSemaphore:
+    """
+    FIFO semaphore usable from event loops and threads alike, so async and
+    sync clients of a model share its concurrency limit.
+    """
+
+    def __init__(self, value: int):
+        self.value = value
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._lock:
+            if self.value > 0 and not self._waiters:
+                self.value -= 1
+                return
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            if future.done() and not future.cancelled():
+                # Granted while being cancelled, hand the slot on
+                self.release()
+            raise
+
+    def acquire_sync(self):
+        event = threading.Event()
+        with self._lock:
+            if self.value > 0 and not self._waiters:
+                self.value -= 1
+                return
+            self._waiters.append(event)
+        event.wait()
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, future = waiter
+                try:
+                    loop.call_soon_threadsafe(self._grant, future)
+                    return
+                except RuntimeError:
+                    # The waiter's loop is closed
+                    continue
+            self.value += 1
+
+    def _grant(self, future: asyncio.Future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class Permit:
+    """Admission of one LLM request, released once its response is read"""
+
+    def __init__(self, limiter: "ModelRateLimiter", tokens: int):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.released = False
+
+    def release(self, used_tokens: Optional[int] = None):
+        if self.released:
+            return
+        self.released = True
+        self.limiter.finish(self, used_tokens)
+
+
+class ModelRateLimiter:
+    """Token buckets, concurrency slots and statistics of a (provider, model)"""
+
+    def __init__(self, key: str, limits: RateLimits):
+        self.key = key
+        self.limits = limits
+        self.requests = (
+            TokenBucket(limits.requests_per_minute)
+            if limits.requests_per_minute else None
+        )
+        self.tokens = (
+            TokenBucket(limits.tokens_per_minute)
+            if limits.tokens_per_minute else None
+        )
+        self.concurrency = (
+            FairSemaphore(limits.max_concurrency)
+            if limits.max_concurrency else None
+        )
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.delayed = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self, tokens: int) -> float:
+        """Reserves a request of tokens, returns the seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.blocked_until - now)
+            if self.requests is not None:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            self.queued += 1
+            return wait
+
+    def cancel(self, tokens: int):
+        """Gives back the reservation of a caller that gave up"""
+        with self._lock:
+            self.queued -= 1
+            if self.requests is not None:
+                self.requests.refund(1)
+            if self.tokens is not None:
+                self.tokens.refund(tokens)
+
+    def admit(self, tokens: int, waited: float) -> Permit:
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            if waited > 0.001:
+                self.delayed += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return Permit(self, tokens)
+
+    def finish(self, permit: Permit, used_tokens: Optional[int] = None):
+        with self._lock:
+            self.in_flight -= 1
+            if self.tokens is not None and used_tokens is not None:
+                # Settle the estimate with the actual usage
+                self.tokens.tokens -= used_tokens - permit.tokens
+        if self.concurrency is not None:
+            self.concurrency.release()
+
+    def penalize(self, retry_after: float):
+        """Pauses admissions after the provider answered 429"""
+        with self._lock:
+            now = time.monotonic()
+            self.rate_limited += 1
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            if self.requests is not None:
+                self.requests.drain(now)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limits": {
+                "requests_per_minute": self.limits.requests_per_minute,
+                "tokens_per_minute": self.limits.tokens_per_minute,
+                "max_concurrency": self.limits.max_concurrency,
+            },
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "delayed": self.delayed,
+            "rate_limited": self.rate_limited,
+            "avg_wait_ms": (
+                self.total_wait / self.admitted * 1000 if self.admitted else 0.0
+            ),
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class LLMRateLimiter:
+    """
+    Client-side scheduler of outgoing LLM requests.
+
+    Limits are configured per (provider, model) from the LLM configs.
+    Requests are admitted in arrival order once the requests/minute and
+    tokens/minute buckets have room and a concurrency slot is free; callers
+    wait instead of getting 429s. With a store, requests are also counted
+    in shared per-minute windows so the limits hold across workers.
+    Models without limits are not throttled.
+    """
+
+    def __init__(self, store: Optional[RateLimitStore] = None):
+        self.store = store
+        self._limiters: Dict[Tuple[str, str], ModelRateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        provider: str,
+        model: str,
+        limits: Optional[RateLimits]
+    ):
+        """Sets the limits of a model, None (or no limit at all) removes them"""
+        key = (provider, model)
+        with self._lock:
+            if limits is None or limits.unlimited:
+                self._limiters.pop(key, None)
+                return
+            current = self._limiters.get(key)
+            if current is None or current.limits != limits:
+                self._limiters[key] = ModelRateLimiter(
+                    f"{provider}:{model}", limits
+                )
+
+    def clear(self):
+        with self._lock:
+            self._limiters.clear()
+
+    def get(self, provider: str, model: str) -> Optional[ModelRateLimiter]:
+        return self._limiters.get((provider, model))
+
+    async def acquire(
+        self,
+        provider: str,
+        model: str,
+        tokens: int
+    ) -> Optional[Permit]:
+        """Waits for the model to admit a request, None if it has no limits"""
+        limiter = self.get(provider, model)
+        if limiter is None:
+            return None
+        start = time.monotonic()
+        wait = limiter.reserve(tokens)
+        try:
+            if wait:
+                await asyncio.sleep(wait)
+            if self.store is not None:
+                await self._reserve_shared(limiter, tokens)
+            if limiter.concurrency is not None:
+                await limiter.concurrency.acquire()
+        except BaseException:
+            limiter.cancel(tokens)
+            raise
+        return limiter.admit(tokens, time.monotonic() - start)
+
+    def acquire_sync(
+        self,
+        provider: str,
+        model: str,
+        tokens: int
+    ) -> Optional[Permit]:
+        """
+        Blocking acquire for sync clients. Sync clients only use the
+        in-process limits.
+        """
+        limiter = self.get(provider, model)
+        if limiter is None:
+            return None
+        start = time.monotonic()
+        wait = limiter.reserve(tokens)
+        try:
+            if wait:
+                time.sleep(wait)
+            if limiter.concurrency is not None:
+                limiter.concurrency.acquire_sync()
+        except BaseException:
+            limiter.cancel(tokens)
+            raise
+        return limiter.admit(tokens, time.monotonic() - start)
+
+    async def _reserve_shared(self, limiter: ModelRateLimiter, tokens: int):
+        while True:
+            try:
+                wait = await self.store.reserve(
+                    limiter.key, 1, tokens, limiter.limits
+                )
+            except Exception as e:
+                # The in-process limits still apply
+                logger.error(f"Failed to reserve shared LLM rate limit: {e}")
+                return
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def penalize(self, provider: str, model: str, retry_after: float):
+        limiter = self.get(provider, model)
+        if limiter is not None:
+            limiter.penalize(retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            limiter.key: limiter.stats()
+            for limiter in list(self._limiters.values())
+        }
+
+
+llm_rate_limiter = LLMRateLimiter()
+
+
+############################################
+# HTTP transports
+############################################
+
+
+def describe_request(request: httpx.Request) -> Tuple[Optional[str], int, bool]:
+    """
+    Model, estimated tokens and streaming flag of an LLM API request
+
+    Prompt tokens are estimated at 4 bytes per token, completion tokens
+    from max_tokens (or LLM_RATE_LIMIT_COMPLETION_TOKENS).
+    """
+    if request.method != "POST":
+        return None, 0, False
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return None, 0, False
+    if not isinstance(body, dict) or not body.get("model"):
+        return None, 0, False
+    completion_tokens = (
+        body.get("max_tokens")
+        or body.get("max_completion_tokens")
+        or LLM_RATE_LIMIT_COMPLETION_TOKENS
+    )
+    tokens = len(request.content) // 4 + completion_tokens
+    return body["model"], tokens, bool(body.get("stream"))
+
+
+def used_tokens(content: bytes) -> Optional[int]:
+    """Total tokens reported in a (non-streamed) completion response"""
+    try:
+        return json.loads(content)["usage"]["total_tokens"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return LLM_RATE_LIMIT_BACKOFF
+
+
+class _PermitAsyncStream(httpx.AsyncByteStream):
+    """Response body that releases its permit once read or closed"""
+
+    def __init__(self, stream, permit: Permit, collect: bool):
+        self.stream = stream
+        self.permit = permit
+        self.collect = collect
+        self.chunks = []
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            if self.collect:
+                self.chunks.append(chunk)
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            self.permit.release(
+                used_tokens(b"".join(self.chunks)) if self.collect else None
+            )
+
+
+class _PermitSyncStream(httpx.SyncByteStream):
+    def __init__(self, stream, permit: Permit, collect: bool):
+        self.stream = stream
+        self.permit = permit
+        self.collect = collect
+        self.chunks = []
+
+    def __iter__(self):
+        for chunk in self.stream:
+            if self.collect:
+                self.chunks.append(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            self.permit.release(
+                used_tokens(b"".join(self.chunks)) if self.collect else None
+            )
+
+
+class RateLimitedAsyncTransport(httpx.AsyncBaseTransport):
+    """Async transport admitting every LLM request through the limiter"""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        provider: str,
+        limiter: LLMRateLimiter = llm_rate_limiter
+    ):
+        self.transport = transport
+        self.provider = provider
+        self.limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens, streaming = describe_request(request)
+        permit = None
+        if model is not None:
+            permit = await self.limiter.acquire(self.provider, model, tokens)
+        if permit is None:
+            return await self.transport.handle_async_request(request)
+
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            permit.release()
+            raise
+        if response.status_code == 429:
+            self.limiter.penalize(self.provider, model, retry_after(response))
+        if response.is_closed:
+            # The body was read by the inner transport
+            permit.release(None if streaming else used_tokens(response.content))
+            return response
+        response.stream = _PermitAsyncStream(
+            response.stream, permit, collect=not streaming
+        )
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Sync counterpart of RateLimitedAsyncTransport"""
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        provider: str,
+        limiter: LLMRateLimiter = llm_rate_limiter
+    ):
+        self.transport = transport
+        self.provider = provider
+        self.limiter = limiter
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens, streaming = describe_request(request)
+        permit = None
+        if model is not None:
+            permit = self.limiter.acquire_sync(self.provider, model, tokens)
+        if permit is None:
+            return self.transport.handle_request(request)
+
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            permit.release()
+            raise
+        if response.status_code == 429:
+            self.limiter.penalize(self.provider, model, retry_after(response))
+        if response.is_closed:
+            # The body was read by the inner transport
+            permit.release(None if streaming else used_tokens(response.content))
+            return response
+        response.stream = _PermitSyncStream(
+            response.stream, permit, collect=not streaming
+        )
+        return response
+
+    def close(self):
+        self.transport.close()
@@ -1,18 +1,49 @@
+import os
+import asyncio
 import logging
-import telebot
-from typing import List
+import threading
+from typing import List, Optional
+from pymongo import ReturnDocument
+from telebot import asyncio_helper, types
+from telebot.async_telebot import AsyncTeleBot
 from .commands import register_commands
+from .db import bot_users_collection
+from imaginary_agents.agents.chatbot_agent import ChatbotAgent
+from imaginary_agents.helpers.encription_helper import generate_user_encryption_key
+from imaginary_agents.helpers.ttl_cache import TTLCache
 from .utils.process_AI_agent_response import (
     process_AI_agent_response,
     agent_memory_update
 )
+from dotenv import load_dotenv
 
+load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Connections of the aiohttp session shared by every bot
+TELEGRAM_CONNECTION_LIMIT = int(os.getenv("TELEGRAM_CONNECTION_LIMIT", 100))
+asyncio_helper.REQUEST_LIMIT = TELEGRAM_CONNECTION_LIMIT
+# Chats per bot whose bot_users record (and encryption key) is kept in memory
+TELEGRAM_KNOWN_CHATS_SIZE = int(os.getenv("TELEGRAM_KNOWN_CHATS_SIZE", 10000))
+
+
+async def close_telegram_session():
+    """Closes the pooled Telegram API session, used on shutdown"""
+    session = asyncio_helper.session_manager.session
+    if session is not None and not session.closed:
+        await session.close()
+
 
 class TelegramAgentBot:
+    """
+    Telegram bot answering messages with a chatbot agent.
+
+    Built on AsyncTeleBot: every bot sends its Telegram API calls through the
+    same pooled aiohttp session, and the agent runs off the event loop.
+    """
+
     def __init__(
         self,
         token: str,
@@ -22,7 +53,9 @@ class TelegramAgentBot:
         output_instructions: List[str],
         llm_api_key: str,
         llm_provider: str,
-        model: str
+        model: str,
+        bot_id: Optional[object] = None,
+        agent_id: Optional[str] = None
     ):
         self.token = token
         self.agent_name = agent_name
@@ -32,38 +65,99 @@ class TelegramAgentBot:
         self.llm_api_key = llm_api_key
         self.llm_provider = llm_provider
         self.model = model
-        self.bot = telebot.TeleBot(self.token)
+        # Resolved once from the registry, the hot path never reads it
+        self.bot_id = bot_id
+        self.agent_id = agent_id
+        # Encryption keys of the chats already registered in bot_users
+        self.chat_keys = TTLCache(max_size=TELEGRAM_KNOWN_CHATS_SIZE)
+        # Agent runtime shared by every chat, built on the first message
+        self._agent = None
+        self._agent_lock = threading.Lock()
+        self.bot = AsyncTeleBot(self.token)
         self.register_handlers()
 
     def register_handlers(self):
         """Register bot command handlers."""
         @self.bot.message_handler(commands=['start'])
-        def send_welcome(message):
-            self.bot.send_message(message.chat.id, "Welcome to the bot!")
+        async def send_welcome(message):
+            await self.bot.send_message(message.chat.id, "Welcome to the bot!")
 
-        register_commands(self.bot)
+        register_commands(self)
 
         @self.bot.message_handler(func=lambda message: True)
-        def reply_handler(message):
+        async def reply_handler(message):
             try:
-                response = process_AI_agent_response(
-                    self,
-                    message.chat.id,
-                    message.text
-                )
-                self.bot.send_message(message.chat.id, response["reply"])
-                agent_memory_update(
+                await self.bot.send_chat_action(message.chat.id, "typing")
+                response = await self.reply(message.chat.id, message.text)
+                await self.bot.send_message(message.chat.id, response["reply"])
+                await asyncio.to_thread(
+                    agent_memory_update,
                     response["user_agent"],
                     message.chat.id,
-                    response["bot_id"]
+                    response["bot_id"],
+                    self.chat_keys.get(message.chat.id)
                 )
             except Exception as e:
                 logger.error(f"Error processing message: {e}")
 
-    def set_webhook(self, webhook_url: str):
+    def get_agent(self) -> ChatbotAgent:
+        """
+        Returns the bot's agent (client, prompt generator and config), to be
+        forked with each chat's memory rather than run directly
+        """
+        if self._agent is None:
+            with self._agent_lock:
+                if self._agent is None:
+                    self._agent = ChatbotAgent(
+                        background=self.background,
+                        steps=self.steps,
+                        output_instructions=self.output_instructions,
+                        llm_api_key=self.llm_api_key,
+                        llm_provider=self.llm_provider,
+                        model=self.model
+                    )
+        return self._agent
+
+    def register_chat(self, chat_id) -> Optional[str]:
+        """
+        Creates the bot_users record (and encryption key) of a chat on its
+        first message and returns its key, known chats aren't queried again
+        """
+        key = self.chat_keys.get(chat_id)
+        if key is not None or self.bot_id is None:
+            return key
+        user = bot_users_collection.find_one_and_update(
+            {"bot_id": self.bot_id, "telegram_user_id": chat_id},
+            {
+                "$setOnInsert": {
+                    "encryption_key": generate_user_encryption_key().decode()
+                }
+            },
+            projection={"encryption_key": True},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        key = user.get("encryption_key")
+        if key is None:
+            # Record created by an earlier memory update, without a key
+            key = generate_user_encryption_key().decode()
+            bot_users_collection.update_one(
+                {"bot_id": self.bot_id, "telegram_user_id": chat_id},
+                {"$set": {"encryption_key": key}}
+            )
+        self.chat_keys.set(chat_id, key)
+        return key
+
+    async def reply(self, chat_id, user_message):
+        """Runs the agent on a message, in a worker thread"""
+        return await asyncio.to_thread(
+            process_AI_agent_response, self, chat_id, user_message
+        )
+
+    async def set_webhook(self, webhook_url: str):
         try:
-            self.bot.remove_webhook()
-            success = self.bot.set_webhook(webhook_url)
+            await self.bot.remove_webhook()
+            success = await self.bot.set_webhook(webhook_url)
             if success:
                 logger.info(f"Webhook set for bot: {webhook_url}")
             else:
@@ -71,9 +165,9 @@ class TelegramAgentBot:
         except Exception as e:
             logger.error(f"Error setting webhook: {e}")
 
-    def remove_webhook(self):
-        self.bot.remove_webhook()
+    async def remove_webhook(self):
+        await self.bot.remove_webhook()
         logger.info(f"Webhook removed for bot {self.token[:8]}")
 
-    def process_webhook(self, update):
-        self.bot.process_new_updates([telebot.types.Update.de_json(update)])
+    async def process_webhook(self, update):
+        await self.bot.process_new_updates([types.Update.de_json(update)])
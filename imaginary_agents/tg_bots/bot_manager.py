@@ -1,9 +1,14 @@
 import os
+import asyncio
 import logging
 from fastapi import HTTPException
-from typing import Dict, List
+from typing import Any, Dict, List
 
-from imaginary_agents.tg_bots.bot import TelegramAgentBot
+from imaginary_agents.tg_bots.bot import (
+    TelegramAgentBot,
+    close_telegram_session
+)
+from imaginary_agents.tg_bots.dispatcher import UpdateDispatcher, update_chat_id
 from imaginary_agents.tg_bots.db import (
     bot_registry_collection,
     bot_users_collection
@@ -21,6 +26,8 @@ class BotManager:
         self.bot_configs: Dict[str, dict] = {}
         self.collection = bot_registry_collection
         self.users_collection = bot_users_collection
+        # Webhook updates are processed in the background by these workers
+        self.dispatcher = UpdateDispatcher(self.process_update)
         self._load_registry()
 
     def _load_registry(self):
@@ -39,6 +46,7 @@ class BotManager:
                     llm_provider = doc.get("llm_provider")
                     model = doc.get("model")
                     self.bot_configs[token] = {
+                        "bot_id": doc["_id"],
                         "agent_id": agent_id,
                         "agent_name": agent_name,
                         "background": background,
@@ -97,7 +105,7 @@ class BotManager:
             raise ValueError("PUBLIC_URL must be set in .env file")
         return f"{public_url}/api/v1/bots/telegram/webhook/{token}"
 
-    def start_bot(
+    async def start_bot(
         self,
         agent_id: str,
         token: str,
@@ -123,7 +131,8 @@ class BotManager:
                 output_instructions,
                 llm_api_key,
                 llm_provider,
-                model
+                model,
+                agent_id=agent_id
             )
             self.bot_registry[token] = bot_instance
             self.bot_configs[token] = {
@@ -136,24 +145,28 @@ class BotManager:
                 "llm_provider": llm_provider,
                 "model": model
             }
-            self._save_registry(True)
+            await asyncio.to_thread(self._save_registry, True)
+            bot_instance.bot_id = self.bot_configs[token].get("bot_id")
             webhook_url = self.get_webhook_url(token)
-            bot_instance.set_webhook(webhook_url)
+            await bot_instance.set_webhook(webhook_url)
             return {
                 "message": f"Bot started with webhook set to {webhook_url}"
             }
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
-    def stop_bot(self, agent_id: str):
-        bot = self.collection.find_one({"agent_id": agent_id})
+    async def stop_bot(self, agent_id: str):
+        bot = await asyncio.to_thread(
+            self.collection.find_one, {"agent_id": agent_id}
+        )
         token = bot.get("token")
         if token not in self.bot_registry or self.bot_registry[token] is None:
             raise HTTPException(status_code=404, detail="Bot not found.")
         try:
-            self._save_registry(False)  # Update isRunning before del registry
+            # Update isRunning before del registry
+            await asyncio.to_thread(self._save_registry, False)
             bot_instance = self.bot_registry[token]
-            bot_instance.remove_webhook()
+            await bot_instance.remove_webhook()
             del self.bot_registry[token]
             del self.bot_configs[token]
         except Exception as e:
@@ -177,6 +190,21 @@ class BotManager:
         else:
             return {"running": False}
 
+    async def process_update(self, token: str, update: Dict[str, Any]):
+        """Processes a webhook update queued by the dispatcher"""
+        if token not in self.bot_configs:
+            # The bot was stopped while the update was queued
+            return
+        bot_instance = self.get_bot_instance(token)
+        chat_id = update_chat_id(update)
+        if chat_id:
+            await asyncio.to_thread(bot_instance.register_chat, chat_id)
+        await bot_instance.process_webhook(update)
+
+    async def aclose(self):
+        """Closes the Telegram API session shared by the bots"""
+        await close_telegram_session()
+
     def get_bot_instance(self, token: str) -> TelegramAgentBot:
         if token not in self.bot_configs:
             raise HTTPException(
@@ -192,7 +220,9 @@ class BotManager:
                 config["output_instructions"],
                 config["llm_api_key"],
                 config["llm_provider"],
-                config["model"]
+                config["model"],
+                bot_id=config.get("bot_id"),
+                agent_id=config.get("agent_id")
             )
         return self.bot_registry[token]
 
@@ -1,6 +1,4 @@
-import telebot
 import logging
-from .utils.process_AI_agent_response import process_AI_agent_response
 
 # Logger setup
 logger = logging.getLogger(__name__)
@@ -8,52 +6,57 @@ logger = logging.getLogger(__name__)
 CHANNEL_ID = "-1002402928244"
 
 
-def get_channel_name(bot):
+async def get_channel_name(bot):
     """Fetches the channel name using bot.get_chat()."""
     try:
-        chat = bot.get_chat(CHANNEL_ID)  # Fetches chat info
+        chat = await bot.get_chat(CHANNEL_ID)  # Fetches chat info
         return chat.title  # Returns the channel name
     except Exception as e:
         logger.error(f"Failed to fetch channel name: {e}")
         return "Unknown Channel"  # Fallback if error occurs
 
 
-def register_commands(bot: telebot.TeleBot):
+def register_commands(agent_bot):
     """Registers custom bot commands."""
+    bot = agent_bot.bot
+    # Chats whose next message is posted to the channel
+    awaiting_post = set()
 
     @bot.message_handler(commands=['post'])
-    def ask_for_message(message):
+    async def ask_for_message(message):
         """Step 1: Ask user what to post."""
         user_id = message.chat.id
-        channel_name = get_channel_name(bot)
-        bot.send_message(
+        channel_name = await get_channel_name(bot)
+        await bot.send_message(
             user_id,
             f"Send the message you want me to reply in *{channel_name}*."
         )
-        bot.register_next_step_handler(
-            message,
-            post_to_channel,
-            bot
-        )
+        awaiting_post.add(user_id)
+
+    @bot.message_handler(func=lambda message: message.chat.id in awaiting_post)
+    async def post_message(message):
+        awaiting_post.discard(message.chat.id)
+        await post_to_channel(message, agent_bot)
 
 
-def post_to_channel(message, bot):
+async def post_to_channel(message, agent_bot):
     """Step 2: Post user message to channel."""
+    bot = agent_bot.bot
     user_message = message.text
     user_id = message.chat.id
 
     if not user_message:  # Ensure the message is not empty
-        bot.send_message(user_id, "❌ Invalid message. Please try again.")
+        await bot.send_message(user_id, "❌ Invalid message. Please try again.")
         return
 
     try:
         logger.info("Posting to channel")
-        response = process_AI_agent_response(bot, user_id, user_message)
-        bot.send_message(CHANNEL_ID, response)
-        bot.send_message(
+        response = await agent_bot.reply(user_id, user_message)
+        await bot.send_message(CHANNEL_ID, response["reply"])
+        await bot.send_message(
             user_id,
             "✅ A response has been posted successfully!"
         )
     except Exception as e:
         logger.error(f"Error posting to channel: {e}")
-        bot.send_message(user_id, "❌ Failed to post in the channel.")
+        await bot.send_message(user_id, "❌ Failed to post in the channel.")
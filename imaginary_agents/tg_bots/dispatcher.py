@@ -0,0 +1,159 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Updates processed at the same time (each from a different chat)
+TELEGRAM_UPDATE_WORKERS = int(os.getenv("TELEGRAM_UPDATE_WORKERS", 16))
+# Updates waiting to be processed before the webhook pushes back
+TELEGRAM_UPDATE_QUEUE_SIZE = int(os.getenv("TELEGRAM_UPDATE_QUEUE_SIZE", 10000))
+# Seconds queued updates are given to finish on shutdown
+TELEGRAM_UPDATE_DRAIN_TIMEOUT = float(
+    os.getenv("TELEGRAM_UPDATE_DRAIN_TIMEOUT", 10)
+)
+
+CHAT_UPDATE_FIELDS = (
+    "message", "edited_message", "channel_post", "edited_channel_post"
+)
+
+UpdateHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+def update_chat_id(update: Dict[str, Any]) -> Optional[int]:
+    """Chat an update belongs to, if any"""
+    for field in CHAT_UPDATE_FIELDS:
+        chat_id = (update.get(field) or {}).get("chat", {}).get("id")
+        if chat_id is not None:
+            return chat_id
+    callback_query = update.get("callback_query") or {}
+    return (callback_query.get("message") or {}).get("chat", {}).get("id")
+
+
+class UpdateDispatcher:
+    """
+    Queue of incoming Telegram updates processed by a pool of async workers.
+
+    Updates of the same chat are processed one at a time, in the order they
+    were received; updates of different chats are processed in parallel.
+    Chats with pending updates take turns, so a busy chat can't starve the
+    others. Updates without a chat have no ordering constraint.
+    """
+
+    def __init__(
+        self,
+        handler: UpdateHandler,
+        workers: int = TELEGRAM_UPDATE_WORKERS,
+        max_size: int = TELEGRAM_UPDATE_QUEUE_SIZE
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_size = max_size
+        self._chats: Dict[Hashable, Deque[Tuple[str, Dict[str, Any], float]]] = {}
+        self._ready: Optional["asyncio.Queue[Hashable]"] = None
+        self._tasks = []
+        self.queued = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, token: str, update: Dict[str, Any]) -> bool:
+        """
+        Queues an update, returns False when the queue is full or the
+        workers aren't running
+        """
+        if not self._tasks or self.queued >= self.max_size:
+            self.rejected += 1
+            return False
+        chat_id = update_chat_id(update)
+        if chat_id is not None:
+            key = (token, chat_id)
+        else:
+            key = (token, None, update.get("update_id"))
+        pending = self._chats.get(key)
+        if pending is None:
+            # Not queued nor being processed: the chat is ready
+            pending = self._chats[key] = deque()
+            self._ready.put_nowait(key)
+        pending.append((token, update, time.monotonic()))
+        self.queued += 1
+        return True
+
+    async def _work(self):
+        while True:
+            key = await self._ready.get()
+            token, update, queued_at = self._chats[key].popleft()
+            self.queued -= 1
+            self.in_flight += 1
+            wait = time.monotonic() - queued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            try:
+                await self.handler(token, update)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error processing Telegram update: {e}")
+            finally:
+                self.in_flight -= 1
+                if self._chats[key]:
+                    # Next update of the chat, behind the other ready chats
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chats[key]
+                self._ready.task_done()
+
+    def start(self):
+        if not self._tasks:
+            self._chats = {}
+            self._ready = asyncio.Queue()
+            self.queued = 0
+            self._tasks = [
+                asyncio.create_task(self._work()) for _ in range(self.workers)
+            ]
+
+    async def join(self):
+        """Waits until every queued update is processed"""
+        if self._ready is not None:
+            await self._ready.join()
+
+    async def stop(self, timeout: float = TELEGRAM_UPDATE_DRAIN_TIMEOUT):
+        """Lets queued updates finish for up to timeout, then stops the workers"""
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Stopped with {self.queued + self.in_flight} Telegram updates pending"
+            )
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.processed + self.failed
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queued,
+            "max_size": self.max_size,
+            "chats": len(self._chats),
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.total_wait / started * 1000 if started else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
@@ -0,0 +1,240 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+from pymongo import UpdateOne
+from atomic_agents.lib.components.agent_memory import AgentMemory
+from dotenv import load_dotenv
+
+from imaginary_agents.helpers.encription_helper import (
+    decrypt_secret,
+    encrypt_secret
+)
+from imaginary_agents.tg_bots.db import bot_users_collection
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Chats whose decrypted memory is kept in memory
+TELEGRAM_MEMORY_CACHE_SIZE = int(os.getenv("TELEGRAM_MEMORY_CACHE_SIZE", 10000))
+# Seconds between write-behind flushes, and memories written per bulk_write
+TELEGRAM_MEMORY_FLUSH_INTERVAL = float(
+    os.getenv("TELEGRAM_MEMORY_FLUSH_INTERVAL", 2)
+)
+TELEGRAM_MEMORY_FLUSH_BATCH = int(os.getenv("TELEGRAM_MEMORY_FLUSH_BATCH", 500))
+
+
+@dataclass
+class ChatMemory:
+    """Decrypted agent memory of a chat and the key it's stored with"""
+    memory: AgentMemory
+    key: str
+    dirty: bool = False
+
+
+class ChatMemoryCache:
+    """
+    Bounded LRU of the decrypted agent memories of active chats, keyed by
+    (bot_id, telegram_user_id).
+
+    Updated memories are written behind: a background task encrypts the
+    dirty ones and writes them to bot_users in bulk_write batches. Dirty
+    memories evicted from the cache are kept (and still served) until the
+    next flush, and everything dirty is flushed on stop. While the task
+    isn't running updates are written through.
+    """
+
+    def __init__(
+        self,
+        collection=bot_users_collection,
+        max_size: int = TELEGRAM_MEMORY_CACHE_SIZE,
+        flush_interval: float = TELEGRAM_MEMORY_FLUSH_INTERVAL,
+        batch_size: int = TELEGRAM_MEMORY_FLUSH_BATCH
+    ):
+        self.collection = collection
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._entries: "OrderedDict[Hashable, ChatMemory]" = OrderedDict()
+        # Dirty memories evicted before being flushed
+        self._evicted: Dict[Hashable, ChatMemory] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.writes = 0
+        self.failed_writes = 0
+
+    def _store(self, chat: Hashable, entry: ChatMemory):
+        self._entries[chat] = entry
+        self._entries.move_to_end(chat)
+        while len(self._entries) > self.max_size:
+            evicted_chat, evicted = self._entries.popitem(last=False)
+            self.evictions += 1
+            if evicted.dirty:
+                self._evicted[evicted_chat] = evicted
+
+    def get(self, bot_id: Any, chat_id: Any) -> Optional[ChatMemory]:
+        """
+        Returns the memory of a chat, loading and decrypting it from
+        bot_users on a miss. None when the chat has no record yet.
+        """
+        chat = (bot_id, chat_id)
+        with self._lock:
+            entry = self._entries.get(chat) or self._evicted.pop(chat, None)
+            if entry is not None:
+                self.hits += 1
+                self._store(chat, entry)
+                return entry
+            self.misses += 1
+
+        record = self.collection.find_one(
+            {"bot_id": bot_id, "telegram_user_id": chat_id},
+            {"encryption_key": True, "bot_memory": True}
+        )
+        if record is None or not record.get("encryption_key"):
+            return None
+        memory = AgentMemory()
+        if record.get("bot_memory") is not None:
+            memory.load(
+                json.loads(
+                    decrypt_secret(record["encryption_key"], record["bot_memory"])
+                )
+            )
+
+        with self._lock:
+            entry = self._entries.get(chat)
+            if entry is None:
+                entry = ChatMemory(memory, record["encryption_key"])
+                self._store(chat, entry)
+            return entry
+
+    def put(self, bot_id: Any, chat_id: Any, memory: AgentMemory, key: str):
+        """Sets the memory of a chat, to be written on the next flush"""
+        if not key:
+            raise ValueError(
+                f"No encryption key for the memory of chat {chat_id}"
+            )
+        chat = (bot_id, chat_id)
+        with self._lock:
+            entry = self._entries.get(chat) or self._evicted.pop(chat, None)
+            if entry is None:
+                entry = ChatMemory(memory, key)
+            else:
+                entry.memory = memory
+                entry.key = key
+            entry.dirty = True
+            self._store(chat, entry)
+        if self._task is None:
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes the dirty memories to bot_users, returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                dirty = dict(self._evicted)
+                self._evicted.clear()
+                for chat, entry in self._entries.items():
+                    if entry.dirty:
+                        dirty[chat] = entry
+                snapshot = []
+                for chat, entry in dirty.items():
+                    entry.dirty = False
+                    snapshot.append((chat, entry, entry.memory.dump(), entry.key))
+
+            written = 0
+            for start in range(0, len(snapshot), self.batch_size):
+                batch = snapshot[start:start + self.batch_size]
+                try:
+                    # Encrypted here, so a failure queues the batch again
+                    requests = [
+                        UpdateOne(
+                            {"bot_id": bot_id, "telegram_user_id": chat_id},
+                            {
+                                "$set": {
+                                    "bot_memory": encrypt_secret(
+                                        key, json.dumps(dump)
+                                    )
+                                }
+                            },
+                            upsert=True
+                        )
+                        for (bot_id, chat_id), _, dump, key in batch
+                    ]
+                    self.collection.bulk_write(requests, ordered=False)
+                    written += len(batch)
+                except Exception as e:
+                    logger.error(
+                        f"Failed to write {len(batch)} chat memories: {e}"
+                    )
+                    self.failed_writes += len(batch)
+                    self._mark_dirty(batch)
+            self.flushes += 1
+            self.writes += written
+            return written
+
+    def _mark_dirty(self, batch):
+        """Queues memories whose write failed for the next flush"""
+        with self._lock:
+            for chat, entry, _, _ in batch:
+                entry.dirty = True
+                if self._entries.get(chat) is not entry:
+                    self._evicted.setdefault(chat, entry)
+
+    def start(self):
+        """Starts flushing dirty memories in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_forever())
+
+    async def stop(self):
+        """Stops the background flushes and writes what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    async def _flush_forever(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Failed to flush chat memories: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._evicted.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "dirty": sum(entry.dirty for entry in list(self._entries.values()))
+            + len(self._evicted),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "flushes": self.flushes,
+            "writes": self.writes,
+            "failed_writes": self.failed_writes,
+        }
+
+
+chat_memory_cache = ChatMemoryCache()
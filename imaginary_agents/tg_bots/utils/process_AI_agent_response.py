@@ -1,81 +1,44 @@
-import json
-import os
-from imaginary_agents.helpers.encription_helper import (
-    decrypt_secret,
-    encrypt_secret
-)
-import telebot
+import logging
+from typing import TYPE_CHECKING
 from imaginary_agents.agents.chatbot_agent import ChatbotAgent
-from dotenv import load_dotenv
-from imaginary_agents.tg_bots.db import (
-    bot_registry_collection,
-    bot_users_collection
-)
-from atomic_agents.agents.base_agent import (
-    BaseAgentInputSchema,
-    # AgentMemory
-)
+from imaginary_agents.tg_bots.db import bot_users_collection
+from imaginary_agents.tg_bots.memory_cache import chat_memory_cache
+from atomic_agents.agents.base_agent import BaseAgentInputSchema
 
-load_dotenv()
+if TYPE_CHECKING:
+    from imaginary_agents.tg_bots.bot import TelegramAgentBot
 
-DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL")
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 
-def process_AI_agent_response(bot: telebot.TeleBot, chat_id, user_message):
+def process_AI_agent_response(bot: "TelegramAgentBot", chat_id, user_message):
     """Handles AI-based message processing."""
 
-    # # Determine bot_id by either fetching directly from the DB in
-    # # development or using in-memory config
-    # # (the latter would be managed by bot_manager)
-    # if os.getenv("DEVELOPMENT", "false").lower() in ("true", "1", "yes"):
-    #     # In development mode, query the DB directly.
-    #     config_doc = bot_registry_collection.find_one({"token": bot.token})
-    #     bot_id = config_doc.get("_id") if config_doc else None
-    #     logger.info(
-    #         f"Fetched bot_id from DB in development mode: {bot_id}"
-    #     )
-    # else:
-    #     from imaginary_agents.tg_bots.bot_manager_v2 import bot_manager
-    #     # Attempt to get bot_id from in-memory registry first.
-    #     bot_config = bot_manager.bot_configs.get(bot.token, {})
-    #     bot_id = bot_config.get("bot_id")
-    #     if not bot_id:
-    #         # Fallback to querying the DB if bot_id is not found in memory.
-    #         config_doc = bot_registry_collection.find_one(
-    #             {"token": bot.token}
-    #         )
-    #         bot_id = config_doc.get("_id") if config_doc else None
-
-    # Initialize AI agent, possibly passing bot_memory if desired.
-    user_agent = ChatbotAgent(
-        background=bot.background,
-        steps=bot.steps,
-        output_instructions=bot.output_instructions,
-        llm_api_key=bot.llm_api_key,
-        llm_provider=bot.llm_provider,
-        model=bot.model
-    )
+    # Fork of the bot's long-lived agent, with its own memory for this chat
+    user_agent = bot.get_agent().fork()
+
+    # Resolved when the bot was registered
+    bot_id = bot.bot_id
 
     # Run AI agent
     try:
-        config_doc = bot_registry_collection.find_one({"token": bot.token})
-        bot_id = config_doc.get("_id") if config_doc else None
-
         bot_memory = retrieve_agent_memory(user_agent, chat_id, bot_id)
 
         if bot_memory is not None:
-            user_agent.memory.load(bot_memory)
-            print(f"Memory loaded for user {chat_id}")
+            # The cached memory only changes when the run is saved with
+            # agent_memory_update, replies like /post's aren't
+            user_agent.memory = bot_memory.copy()
+            logger.info(f"Memory loaded for user {chat_id}")
 
-        print("running agent")
         reply = user_agent.run(
             BaseAgentInputSchema(chat_message=user_message)
         )
         bot_reply = reply.chat_message
     except Exception as e:
-        print(f"AI Error: {e}")
+        logger.error(f"AI Error: {e}")
         bot_reply = (
-            "I'm having trouble processing your request. ",
+            "I'm having trouble processing your request. "
             "Please try again later."
         )
 
@@ -83,41 +46,31 @@ def process_AI_agent_response(bot: telebot.TeleBot, chat_id, user_message):
 
 
 def retrieve_agent_memory(user_agent: ChatbotAgent, chat_id, bot_id):
-    """Retrieves the agent memory from the database."""
-
-    # Fetch bot_memory from the bot_users collection for this user
-    record = bot_users_collection.find_one({
-        "bot_id": bot_id,
-        "telegram_user_id": chat_id
-    })
-    key = record.get("encryption_key")
-    memory = record.get("bot_memory")
-    if memory is None:
-        return None
-    bot_memories = decrypt_secret(key, memory)
-    return json.loads(bot_memories)
-
-
-def agent_memory_update(user_agent: ChatbotAgent, chat_id, bot_id):
-    """Updates the agent memory in the database."""
-
-    # Store updated memory
-    memory_dump = user_agent.memory.dump()
-
-    # Gets user's key and encrypts the memory
-    key = get_user_key(user_agent, chat_id, bot_id)
-    json_str = json.dumps(memory_dump)
-    memory = encrypt_secret(key, json_str)
-
-    # Update the bot_memory in the database for this user
-    bot_users_collection.update_one(
-        {"bot_id": bot_id, "telegram_user_id": chat_id},
-        {"$set": {"bot_memory": memory}},
-        upsert=True
-    )
+    """
+    Retrieves the agent memory, from the chat memory cache or, for chats
+    that aren't in it, from the database.
+    """
+    chat_memory = chat_memory_cache.get(bot_id, chat_id)
+    return chat_memory.memory if chat_memory is not None else None
+
+
+def agent_memory_update(user_agent: ChatbotAgent, chat_id, bot_id, key=None):
+    """
+    Updates the agent memory, written to the database in the background.
+    key is the user's encryption key when the caller already knows it
+    """
+
+    if key is None:
+        chat_memory = chat_memory_cache.get(bot_id, chat_id)
+        if chat_memory is not None:
+            key = chat_memory.key
+        else:
+            key = get_user_key(user_agent, chat_id, bot_id)
+    if key is None:
+        logger.warning(f"No encryption key for user {chat_id}, memory not saved")
+        return
 
-    # # Reset agent memory for future interactions
-    # user_agent.memory = AgentMemory(max_messages=20)
+    chat_memory_cache.put(bot_id, chat_id, user_agent.memory, key)
 
 
 def get_user_key(user_agent: ChatbotAgent, chat_id, bot_id):
@@ -128,5 +81,4 @@ def get_user_key(user_agent: ChatbotAgent, chat_id, bot_id):
         {"bot_id": bot_id, "telegram_user_id": chat_id},
         {"encryption_key"}
     )
-    key = user["encryption_key"]
-    return key if user and user["encryption_key"] else None
+    return user.get("encryption_key") if user else None
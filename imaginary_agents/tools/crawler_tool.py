@@ -4,7 +4,7 @@ import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
 from typing import Dict, Any, Optional
-from pydantic import Field, BaseModel, create_model
+from pydantic import Field, BaseModel
 from crawl4ai import (
     AsyncWebCrawler,
     CrawlerRunConfig,
@@ -17,6 +17,8 @@ from crawl4ai.extraction_strategy import JsonCssExtractionStrategy, LLMExtractio
 from atomic_agents.agents.base_agent import BaseIOSchema
 from atomic_agents.lib.base.base_tool import BaseTool
 
+from imaginary_agents.helpers.schema_compiler import schema_compiler
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -106,33 +108,23 @@ class CrawlerTool(BaseTool):
                 verbose=True
             )
         else:
-            # Create dynamic schema
-            LlmExtractionSchema = create_model(
+            # Get (cached) dynamic schema
+            LlmExtractionSchema = schema_compiler.compile(
                 'LlmExtractionSchema',
-                __base__=BaseModel,
-                __doc__="LLM extraction schema.",
-                **{
-                    name: (field_def['type'], Field(
-                        ...,
-                        description=field_def['description']
-                    ))
-                    for name, field_def in params.llm_extraction_schema.items()
-                }
+                params.llm_extraction_schema,
+                base=BaseModel,
+                doc="LLM extraction schema."
             )
 
-            # Rebuild the model to fully define it
-            LlmExtractionSchema.model_rebuild()
-
             provider = f"{params.llm_provider}/{params.llm_model}"
             print(f"Using provider: {provider}")
-            print("api_key:", params.api_key)
 
             extraction_strategy = LLMExtractionStrategy(
                 llm_config=LLMConfig(
                     provider=provider,
                     api_token=params.api_key
                 ),
-                schema=LlmExtractionSchema.model_json_schema(),
+                schema=schema_compiler.json_schema(LlmExtractionSchema),
                 extraction_type="schema",
                 instruction=params.crawl_instruction,
                 extra_args=params.llm_extraction_extra_args,
@@ -0,0 +1,230 @@
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from dotenv import load_dotenv
+
+from imaginary_agents.tools.crawler_tool import CrawlerTool
+from imaginary_agents.tools.browser_use_tool import (
+    BrowserUseTool,
+    BrowserUseToolConfig
+)
+from imaginary_agents.tools.pump_dot_fun_trends_tool import PumpDotFunTrendsTool
+from imaginary_agents.tools.memecoin_descriptions_tool import (
+    MemecoinDescriptionsTool
+)
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds a single tool run may take
+TOOL_RUN_TIMEOUT = float(os.getenv("TOOL_RUN_TIMEOUT", 120))
+# Tools run at the same time by a single fan-out
+TOOL_RUN_CONCURRENCY = int(os.getenv("TOOL_RUN_CONCURRENCY", 4))
+
+STEEL_API_KEY = os.getenv("STEEL_API_KEY")
+STEEL_BASE_URL = "wss://connect.steel.dev"
+
+
+@dataclass
+class ToolContext:
+    """Credentials of the run, for tools that call an LLM themselves"""
+    llm_api_key: Optional[str] = None
+    llm_provider: Optional[str] = None
+    llm_model: Optional[str] = None
+
+
+@dataclass
+class ToolResult:
+    tool: str
+    parameters: Dict[str, Any]
+    output: Any = None
+    error: Optional[str] = None
+    duration_ms: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tool": self.tool,
+            "parameters": self.parameters,
+            "output": self.output,
+            "error": self.error,
+            "duration_ms": self.duration_ms,
+        }
+
+
+ToolHandler = Callable[[Dict[str, Any], ToolContext], Awaitable[Any]]
+
+
+class ToolRuntime:
+    """
+    Registry of async tool handlers used by orchestrator agents.
+
+    Handlers receive the tool parameters chosen by the agent and the run's
+    ToolContext. Tools with an async implementation are awaited natively;
+    blocking tools are run in a worker thread so they don't stall the loop.
+    """
+
+    def __init__(self, timeout: float = TOOL_RUN_TIMEOUT):
+        self.timeout = timeout
+        self._handlers: Dict[str, ToolHandler] = {}
+
+    def register(self, name: str, handler: ToolHandler):
+        self._handlers[name] = handler
+
+    def unregister(self, name: str):
+        self._handlers.pop(name, None)
+
+    def has_tool(self, name: str) -> bool:
+        return name in self._handlers
+
+    async def run(
+        self,
+        name: str,
+        parameters: Optional[Dict[str, Any]],
+        context: ToolContext,
+        timeout: Optional[float] = None
+    ) -> ToolResult:
+        """
+        Runs a registered tool, errors are returned in the result
+
+        Args:
+            name: Name of the registered tool
+            parameters: Parameters chosen by the agent
+            context: Credentials of the run
+            timeout: Seconds the tool may take (defaults to self.timeout)
+
+        Returns:
+            ToolResult: The tool output or error, and its duration
+        """
+        parameters = parameters or {}
+        result = ToolResult(tool=name, parameters=parameters)
+        handler = self._handlers.get(name)
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                raise ValueError(f"Tool '{name}' is not available")
+            output = await asyncio.wait_for(
+                handler(parameters, context),
+                timeout=self.timeout if timeout is None else timeout
+            )
+            if isinstance(output, BaseModel):
+                output = output.model_dump()
+            result.output = output
+        except asyncio.TimeoutError:
+            result.error = f"Tool '{name}' timed out"
+        except Exception as e:
+            logger.error(f"Error running tool '{name}': {e}")
+            result.error = str(e)
+        result.duration_ms = (time.perf_counter() - start) * 1000
+        return result
+
+    async def run_many(
+        self,
+        calls: List[Tuple[str, Optional[Dict[str, Any]]]],
+        context: ToolContext,
+        concurrency: int = TOOL_RUN_CONCURRENCY,
+        timeout: Optional[float] = None
+    ) -> List[ToolResult]:
+        """
+        Runs independent tool calls concurrently within a shared budget
+
+        Args:
+            calls: List of (tool name, parameters)
+            context: Credentials of the run
+            concurrency: Maximum number of tools run at the same time
+            timeout: Seconds the whole fan-out may take, calls still waiting
+                or running when it runs out time out
+
+        Returns:
+            One ToolResult per call, in order
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.timeout if timeout is None else timeout)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_call(name, parameters):
+            async with semaphore:
+                return await self.run(
+                    name,
+                    parameters,
+                    context,
+                    timeout=max(deadline - loop.time(), 0)
+                )
+
+        return await asyncio.gather(*[
+            run_call(name, parameters) for name, parameters in calls
+        ])
+
+
+############################################
+# Built-in tools
+############################################
+
+
+async def run_crawler(parameters: Dict[str, Any], context: ToolContext):
+    # Credentials come last, so parameters chosen by the LLM can't replace them
+    crawler_parameters = {
+        "config": {},
+        **parameters,
+        "api_key": context.llm_api_key,
+        "llm_provider": context.llm_provider,
+        "llm_model": context.llm_model,
+    }
+    if not crawler_parameters.get("schema") and not crawler_parameters.get(
+        "llm_extraction_schema"
+    ):
+        crawler_parameters["llm_extraction_schema"] = {
+            "result": {
+                "type": str,
+                "description": "Information requested by the crawl instruction"
+            }
+        }
+    params = CrawlerTool.input_schema(**crawler_parameters)
+    result = await CrawlerTool().run_crawler(params)
+    return CrawlerTool.output_schema(result=result or "No data found")
+
+
+async def run_browser_use(parameters: Dict[str, Any], context: ToolContext):
+    local_browser = parameters.get("local_browser", False)
+    config = BrowserUseToolConfig(
+        STEEL_API_KEY=None if local_browser else STEEL_API_KEY,
+        STEEL_BASE_URL=None if local_browser else STEEL_BASE_URL,
+        llm_api_key=context.llm_api_key,
+        llm_provider=context.llm_provider,
+        llm_model=context.llm_model,
+    )
+    # Creating the tool opens a (blocking) Steel session
+    browser_use_tool = await asyncio.to_thread(BrowserUseTool, config)
+    params = BrowserUseTool.input_schema(task=parameters["task"])
+    result = await browser_use_tool.run_browser_use(params)
+    return BrowserUseTool.output_schema(result=result or "No result")
+
+
+async def run_pump_fun_trends(parameters: Dict[str, Any], context: ToolContext):
+    return await asyncio.to_thread(PumpDotFunTrendsTool().run)
+
+
+async def run_memecoin_descriptions(
+    parameters: Dict[str, Any],
+    context: ToolContext
+):
+    tool = MemecoinDescriptionsTool()
+    params = MemecoinDescriptionsTool.input_schema(**parameters)
+    return await asyncio.to_thread(tool.run, params)
+
+
+tool_runtime = ToolRuntime()
+tool_runtime.register("crawler", run_crawler)
+tool_runtime.register("browser_use", run_browser_use)
+tool_runtime.register("pump_fun_trends", run_pump_fun_trends)
+tool_runtime.register("memecoin_descriptions", run_memecoin_descriptions)